@@ -6,19 +6,47 @@ import cv2
 import signal
 import logging
 import logging.config
+import datetime
+import ast
+import json
+import tempfile
+import numpy
 from opencv_home_cam import OpenCvHomeCam, OpenCvHomeCamException
+from opencv_home_cam.event_store import query_events, EventStoreException
+from opencv_home_cam.overlay import annotate_recording, OverlayException
+from opencv_home_cam.video_codec import benchmark_codecs
+from opencv_home_cam.config import HomeCamConfig, ConfigException
+from opencv_home_cam.detector_factory import create_detector, DetectorFactoryException
+from opencv_home_cam.tiled_detector import TiledDetector, TilingConfig, benchmark_tiling
+from opencv_home_cam.dnn_detector import DnnDetector, benchmark_batching
+from opencv_home_cam.analyzer import analyze_files, AnalyzerException
+from opencv_home_cam.camera import Camera, CameraException
+from opencv_home_cam.frame_archive import capture_to_archive, FrameArchiveException
+from opencv_home_cam.orchestrator import Orchestrator
+from opencv_home_cam.black_box import export_black_box, BlackBoxException
+from opencv_home_cam.frame_index import export_clip, export_event_clip, FrameIndexException
+from opencv_home_cam.publisher import Subscriber, benchmark_publisher, PublisherException
+from opencv_home_cam.replay import replay_archive, save_baseline, load_baseline, compare_replay, ReplayException
 
 description = "OpenCV home cam. See README.rst for full documentation"
 
 
 def signal_handler(signal, frame):
 
-    global hcm
-
     sys.stderr.write('Signal received!')
     hcm.stop()
 
 
+def reload_handler(signal, frame):
+
+    hcm.reload()
+
+
+def profiling_handler(signal, frame):
+
+    hcm.toggle_profiling()
+
+
 def load_options():
 
     global parsed_args
@@ -34,17 +62,573 @@ def load_options():
                              "facility. See the Python documentation "
                              "for more details.")
 
+    parser.add_argument('--asyncio', action='store_true',
+                        help="Run on an asyncio event loop. Actions are "
+                             "run concurrently with the frame processing.")
+
+    subparsers = parser.add_subparsers(dest='command')
+
+    events_parser = subparsers.add_parser('events',
+                                          help="Query the detection event "
+                                               "database.")
+    events_parser.add_argument('-d', '--db', required=True,
+                               help="Path to the event database (the "
+                                    "db_path option of the event_store "
+                                    "config section).")
+    events_parser.add_argument('--camera',
+                               help="Only list events from this camera.")
+    events_parser.add_argument('--detector',
+                               help="Only list events from this detector.")
+    events_parser.add_argument('--start',
+                               help="Only list events after this time. "
+                                    "Format: YYYY-MM-DD HH:MM:SS or seconds "
+                                    "since the epoch.")
+    events_parser.add_argument('--end',
+                               help="Only list events before this time. "
+                                    "Format: YYYY-MM-DD HH:MM:SS or seconds "
+                                    "since the epoch.")
+
+    annotate_parser = subparsers.add_parser('annotate',
+                                            help="Draw the rectangles from "
+                                                 "the sidecar file of a "
+                                                 "recording into a copy of "
+                                                 "the recording.")
+    annotate_parser.add_argument('-i', '--input', required=True,
+                                 help="Recording file. The sidecar file "
+                                      "must be located in the same "
+                                      "directory.")
+    annotate_parser.add_argument('-o', '--output', required=True,
+                                 help="Annotated output file.")
+
+    benchmark_parser = subparsers.add_parser('benchmark-codecs',
+                                             help="Measure the encoding "
+                                                  "speed and file size of "
+                                                  "the video codecs "
+                                                  "supported on this host.")
+    benchmark_parser.add_argument('--fps', type=float, default=20.0,
+                                  help="Frame rate used for the bytes per "
+                                       "minute calculation.")
+    benchmark_parser.add_argument('--width', type=int, default=400,
+                                  help="Frame width (synthetic frames only).")
+    benchmark_parser.add_argument('--height', type=int, default=300,
+                                  help="Frame height (synthetic frames only).")
+    benchmark_parser.add_argument('--frames', type=int, default=200,
+                                  help="Number of frames to encode per codec.")
+    benchmark_parser.add_argument('--quality', type=float,
+                                  help="Encoder quality (0-100). Only "
+                                       "supported by some codecs.")
+    benchmark_parser.add_argument('-i', '--input',
+                                  help="Video file used as input instead of "
+                                       "synthetic frames.")
+
+    tiling_parser = subparsers.add_parser('benchmark-tiling',
+                                          help="Compare single call "
+                                               "detection with tiled "
+                                               "detection for a detector "
+                                               "in the config file.")
+    tiling_parser.add_argument('-d', '--detector', required=True,
+                               help="The detector (section name) to "
+                                    "benchmark.")
+    tiling_parser.add_argument('-i', '--input',
+                               help="Image or video file used as input. "
+                                    "Default is a synthetic 1080p frame.")
+    tiling_parser.add_argument('--frames', type=int, default=20,
+                               help="Number of frames to process.")
+    tiling_parser.add_argument('--tile-size', default='(256, 256)',
+                               help="Tile size used if the detector has no "
+                                    "tiling options in the config file.")
+    tiling_parser.add_argument('--workers', type=int, default=4,
+                               help="Number of worker threads used if the "
+                                    "detector has no tiling options in the "
+                                    "config file.")
+
+    dnn_parser = subparsers.add_parser('benchmark-dnn',
+                                       help="Measure the per frame latency "
+                                            "of a dnn detector in the "
+                                            "config file for different "
+                                            "batch sizes.")
+    dnn_parser.add_argument('-d', '--detector', required=True,
+                            help="The dnn detector (section name) to "
+                                 "benchmark.")
+    dnn_parser.add_argument('-i', '--input',
+                            help="Image or video file used as input. "
+                                 "Default is a synthetic 1080p frame.")
+    dnn_parser.add_argument('--frames', type=int, default=32,
+                            help="Number of frames to process per batch "
+                                 "size.")
+    dnn_parser.add_argument('--batch-sizes', default='(1, 2, 4, 8)',
+                            help="The batch sizes to measure.")
+
+    analyze_parser = subparsers.add_parser('analyze',
+                                           help="Run the detectors of the "
+                                                "config file on recorded "
+                                                "video files.")
+    analyze_parser.add_argument('files', nargs='+',
+                                help="Video files to analyze.")
+    analyze_parser.add_argument('-o', '--output',
+                                help="Output file. Default is stdout.")
+    analyze_parser.add_argument('-f', '--format', choices=['json', 'csv'],
+                                default='json',
+                                help="Output format: JSON lines (one line "
+                                     "per frame and detector) or CSV (one "
+                                     "row per rectangle).")
+    analyze_parser.add_argument('-w', '--workers', type=int,
+                                help="Number of worker processes. Default "
+                                     "is the number of CPUs.")
+    analyze_parser.add_argument('--chunk-frames', type=int, default=0,
+                                help="Split the files into chunks of this "
+                                     "many frames (0 means one chunk per "
+                                     "file).")
+
+    capture_parser = subparsers.add_parser('capture',
+                                           help="Capture frames from the "
+                                                "first camera in the config "
+                                                "file to a frame archive.")
+    capture_parser.add_argument('-o', '--output', required=True,
+                                help="Frame archive file.")
+    capture_parser.add_argument('--frames', type=int, default=100,
+                                help="Number of frames to capture.")
+
+    replay_parser = subparsers.add_parser('replay',
+                                          help="Replay a frame archive "
+                                               "through the detectors of "
+                                               "the config file and compare "
+                                               "the result with a baseline.")
+    replay_parser.add_argument('-i', '--input', required=True,
+                               help="Frame archive file.")
+    replay_parser.add_argument('-b', '--baseline',
+                               help="Baseline file to compare the result "
+                                    "with.")
+    replay_parser.add_argument('-s', '--save-baseline',
+                               help="Save the result as baseline to this "
+                                    "file.")
+    replay_parser.add_argument('--max-slowdown', type=float,
+                               help="Report a regression if any processing "
+                                    "stage is slower than the baseline by "
+                                    "more than this fraction (e.g. 0.2).")
+
+    black_box_parser = subparsers.add_parser('export-black-box',
+                                             help="Export the frames of a "
+                                                  "black box ring file to a "
+                                                  "video file.")
+    black_box_parser.add_argument('-i', '--input', required=True,
+                                  help="Black box ring file (the path "
+                                       "option of the black_box config "
+                                       "section, or the .prev file).")
+    black_box_parser.add_argument('-o', '--output', required=True,
+                                  help="Output video file (AVI). The "
+                                       "rectangles are written to a "
+                                       "sidecar file.")
+
+    clip_parser = subparsers.add_parser('export-clip',
+                                        help="Export the recorded frames of "
+                                             "a time range (or around an "
+                                             "event) to a video file "
+                                             "without re-encoding. Only "
+                                             "MJPEG recordings are "
+                                             "supported.")
+    clip_parser.add_argument('-o', '--output', required=True,
+                             help="Output video file (MJPEG AVI).")
+    clip_parser.add_argument('-r', '--recordings',
+                             help="Recording directory (the directory "
+                                  "option of the recorder config section). "
+                                  "Required for time range exports.")
+    clip_parser.add_argument('--file-base',
+                             help="Only recordings with this file base (the "
+                                  "file_base option of the recorder config "
+                                  "section).")
+    clip_parser.add_argument('--start',
+                             help="Start of the clip. Format: YYYY-MM-DD "
+                                  "HH:MM:SS or seconds since the epoch.")
+    clip_parser.add_argument('--end',
+                             help="End of the clip. Format: YYYY-MM-DD "
+                                  "HH:MM:SS or seconds since the epoch.")
+    clip_parser.add_argument('-d', '--db',
+                             help="Export a clip around the first event at "
+                                  "or after --start in this event database "
+                                  "instead of a time range.")
+    clip_parser.add_argument('--camera',
+                             help="Only events from this camera.")
+    clip_parser.add_argument('--detector',
+                             help="Only events from this detector.")
+    clip_parser.add_argument('--before', type=float, default=10.0,
+                             help="Seconds of the clip before the event.")
+    clip_parser.add_argument('--after', type=float, default=10.0,
+                             help="Seconds of the clip after the event.")
+
+    subscribe_parser = subparsers.add_parser('subscribe',
+                                             help="Print the detection "
+                                                  "stream of a publisher "
+                                                  "(one JSON line per "
+                                                  "frame).")
+    subscribe_parser.add_argument('-s', '--socket', required=True,
+                                  help="Publisher socket (the socket_path "
+                                       "option of the publisher config "
+                                       "section).")
+    subscribe_parser.add_argument('--camera', action='append',
+                                  help="Only frames from this camera. Can "
+                                       "be given several times.")
+    subscribe_parser.add_argument('--detector', action='append',
+                                  help="Only this detector. Can be given "
+                                       "several times.")
+
+    pub_benchmark_parser = subparsers.add_parser('benchmark-publisher',
+                                                 help="Measure the message "
+                                                      "rate of the detection "
+                                                      "publisher.")
+    pub_benchmark_parser.add_argument('--messages', type=int, default=100000,
+                                      help="Number of messages to publish.")
+    pub_benchmark_parser.add_argument('--subscribers', type=int, default=2,
+                                      help="Number of subscribers.")
+
     parsed_args = parser.parse_args()
 
 
+def parse_time(s):
+
+    if s is None:
+        return None
+
+    try:
+        return float(s)
+    except ValueError:
+        pass
+
+    try:
+        return datetime.datetime.strptime(s, '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        raise OpenCvHomeCamException("Bad time value: {}".format(s))
+
+
+def list_events():
+
+    events = query_events(db_path=parsed_args.db,
+                          camera=parsed_args.camera,
+                          detector=parsed_args.detector,
+                          start=parse_time(parsed_args.start),
+                          end=parse_time(parsed_args.end))
+
+    for event in events:
+        ts_date = datetime.datetime.fromtimestamp(event.timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')
+        print("{} {} {} track={} file={} frame={} rects={}".format(ts_date,
+                                                                  event.camera,
+                                                                  event.detector,
+                                                                  event.track_id,
+                                                                  event.recording_file,
+                                                                  event.frame_index,
+                                                                  event.rectangles))
+
+
+def run_codec_benchmark():
+
+    results = benchmark_codecs(fps=parsed_args.fps,
+                               resolution=(parsed_args.width, parsed_args.height),
+                               nbr_of_frames=parsed_args.frames,
+                               input_file=parsed_args.input,
+                               quality=parsed_args.quality)
+
+    print("{:<6} {:<9} {:>12} {:>16}".format("fourcc", "container",
+                                            "encode fps", "MB/minute"))
+    for (fourcc, container, supported, encode_fps, bytes_per_minute) in results:
+        if not supported:
+            print("{:<6} {:<9} {:>12}".format(fourcc, container, "unsupported"))
+            continue
+        print("{:<6} {:<9} {:>12.1f} {:>16.2f}".format(fourcc, container,
+                                                      encode_fps,
+                                                      bytes_per_minute / 1e6))
+
+
+def read_benchmark_frames(input_file, nbr_of_frames):
+
+    if input_file is None:
+        # Synthetic 1080p frame with some structure
+        frame = numpy.random.RandomState(0).randint(0, 256, (135, 240), numpy.uint8)
+        frame = cv2.resize(frame, (1920, 1080), interpolation=cv2.INTER_LINEAR)
+        return [frame] * nbr_of_frames
+
+    image = cv2.imread(input_file, cv2.IMREAD_GRAYSCALE)
+    if image is not None:
+        return [image] * nbr_of_frames
+
+    frames = []
+    video_capture = cv2.VideoCapture(input_file)
+    while len(frames) < nbr_of_frames:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    video_capture.release()
+    if len(frames) == 0:
+        raise OpenCvHomeCamException("Unable to read frames from {}".format(input_file))
+    return frames
+
+
+def run_tiling_benchmark():
+
+    if not parsed_args.config_file:
+        raise OpenCvHomeCamException("Missing input config file")
+
+    config = HomeCamConfig(parsed_args.config_file)
+    detector_cfg = config.get_detectors().get(parsed_args.detector)
+    if detector_cfg is None:
+        raise OpenCvHomeCamException("Unknown detector: {}".format(parsed_args.detector))
+
+    tiling_cfg = config.get_detector_tilings().get(parsed_args.detector)
+    if tiling_cfg is None:
+        tile_size = ast.literal_eval(parsed_args.tile_size)
+        tiling_cfg = TilingConfig(tile_size=tile_size,
+                                  overlap=min(tile_size) // 4,
+                                  workers=parsed_args.workers,
+                                  iou_threshold=0.5)
+
+    frames = read_benchmark_frames(parsed_args.input, parsed_args.frames)
+    detector = create_detector(parsed_args.detector, detector_cfg)
+    tiled_detector = TiledDetector(detector, tiling_cfg)
+
+    print("Frame size: {}x{}, tiling: {}".format(frames[0].shape[1],
+                                                 frames[0].shape[0],
+                                                 tiling_cfg))
+    results = benchmark_tiling(detector, tiled_detector, frames)
+    print("single: {:.1f} ms/frame, {:.1f} rects/frame".format(results['single_ms'],
+                                                              results['single_rects']))
+    print("tiled:  {:.1f} ms/frame, {:.1f} rects/frame".format(results['tiled_ms'],
+                                                              results['tiled_rects']))
+    print("speedup: {:.2f}".format(results['speedup']))
+
+
+def run_dnn_benchmark():
+
+    if not parsed_args.config_file:
+        raise OpenCvHomeCamException("Missing input config file")
+
+    config = HomeCamConfig(parsed_args.config_file)
+    detector_cfg = config.get_detectors().get(parsed_args.detector)
+    if detector_cfg is None:
+        raise OpenCvHomeCamException("Unknown detector: {}".format(parsed_args.detector))
+
+    detector = create_detector(parsed_args.detector, detector_cfg)
+    if not isinstance(detector, DnnDetector):
+        raise OpenCvHomeCamException("{} is not a dnn detector".format(parsed_args.detector))
+
+    frames = read_benchmark_frames(parsed_args.input, parsed_args.frames)
+    batch_sizes = ast.literal_eval(parsed_args.batch_sizes)
+    if isinstance(batch_sizes, int):
+        batch_sizes = (batch_sizes,)
+
+    print("{:>10} {:>12} {:>12}".format("batch size", "ms/frame", "ms/batch"))
+    for (batch_size, frame_ms, batch_ms) in benchmark_batching(detector, frames, batch_sizes):
+        print("{:>10} {:>12.1f} {:>12.1f}".format(batch_size, frame_ms, batch_ms))
+    print("Note: ms/batch is the latency of each frame in a batch. Batching "
+          "only pays off with several submitting threads (e.g. tiles); a "
+          "single stream gets the ms/batch latency, not ms/frame.")
+
+
+def run_analyze():
+
+    if not parsed_args.config_file:
+        raise OpenCvHomeCamException("Missing input config file")
+
+    if parsed_args.log_config_file:
+        logging.config.fileConfig(parsed_args.log_config_file)
+    else:
+        logging.basicConfig(stream=sys.stderr,
+                            level=logging.INFO,
+                            format='%(asctime)s %(message)s')
+
+    if parsed_args.output:
+        output = open(parsed_args.output, 'w', newline='')
+    else:
+        output = sys.stdout
+
+    try:
+        stats = analyze_files(config_file=parsed_args.config_file,
+                              video_files=parsed_args.files,
+                              output=output,
+                              output_format=parsed_args.format,
+                              workers=parsed_args.workers,
+                              chunk_frames=parsed_args.chunk_frames)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    summary = "Analyzed {} frames in {:.1f} s ({:.1f} fps".format(stats['frames'],
+                                                                 stats['elapsed_s'],
+                                                                 stats['fps'])
+    if 'realtime_factor' in stats:
+        summary += ", {:.1f} x real-time".format(stats['realtime_factor'])
+    sys.stderr.write(summary + ")\n")
+
+
+def run_capture():
+
+    if not parsed_args.config_file:
+        raise OpenCvHomeCamException("Missing input config file")
+
+    camera_cfg = HomeCamConfig(parsed_args.config_file).get_cameras()[0]
+    camera = Camera(camera_cfg.cam_id, camera_cfg.max_width)
+    try:
+        capture_to_archive(camera, parsed_args.output, parsed_args.frames, camera_cfg.fps)
+    finally:
+        camera.close()
+
+
+# Returns True if the replay result matches the baseline
+def run_replay():
+
+    if not parsed_args.config_file:
+        raise OpenCvHomeCamException("Missing input config file")
+
+    result = replay_archive(parsed_args.config_file, parsed_args.input)
+    print("Replayed {} frames: {} frames with detections, {} transitions, "
+          "{:.2f} ms/frame".format(result['frames'],
+                                   len(set(r[0] for r in result['rectangles'])),
+                                   len(result['transitions']),
+                                   result['total_ms']))
+
+    if parsed_args.save_baseline:
+        save_baseline(result, parsed_args.save_baseline)
+
+    if not parsed_args.baseline:
+        return True
+
+    report = compare_replay(load_baseline(parsed_args.baseline), result,
+                            parsed_args.max_slowdown)
+    print("{:<20} {:>12} {:>12} {:>8}".format("stage", "baseline ms", "ms", "delta"))
+    for stage, (baseline_ms, result_ms, delta) in sorted(report['stage_deltas'].items()):
+        delta_str = "{:+.0%}".format(delta) if delta is not None else "-"
+        print("{:<20} {:>12.3f} {:>12.3f} {:>8}".format(stage, baseline_ms, result_ms, delta_str))
+    for (frame, detector) in report['rectangle_diffs']:
+        print("Rectangles differ: frame {} detector {}".format(frame, detector))
+    for (frame, detector, status) in report['transition_diffs']:
+        print("Transition differs: frame {} detector {} status {}".format(frame, detector, status))
+    for stage in report['slow_stages']:
+        print("Too slow: {}".format(stage))
+    print("Regression" if report['regression'] else "No regression")
+    return not report['regression']
+
+
+def run_clip_export():
+
+    if parsed_args.db is not None:
+        events = query_events(db_path=parsed_args.db,
+                              camera=parsed_args.camera,
+                              detector=parsed_args.detector,
+                              start=parse_time(parsed_args.start))
+        if len(events) == 0:
+            raise OpenCvHomeCamException("No matching event found")
+        (nbr_of_frames, (start, end)) = export_event_clip(events[0],
+                                                          parsed_args.before,
+                                                          parsed_args.after,
+                                                          parsed_args.output)
+    else:
+        if parsed_args.recordings is None or parsed_args.start is None or parsed_args.end is None:
+            raise OpenCvHomeCamException("Time range exports require --recordings, --start and --end")
+        (nbr_of_frames, (start, end)) = export_clip(parsed_args.recordings,
+                                                    parse_time(parsed_args.start),
+                                                    parse_time(parsed_args.end),
+                                                    parsed_args.output,
+                                                    file_base=parsed_args.file_base)
+
+    print("Exported {} frames ({} - {})".format(nbr_of_frames,
+                                                datetime.datetime.fromtimestamp(start),
+                                                datetime.datetime.fromtimestamp(end)))
+
+
+def run_subscribe():
+
+    subscriber = Subscriber(parsed_args.socket,
+                            cameras=parsed_args.camera,
+                            detectors=parsed_args.detector)
+    try:
+        while True:
+            message = subscriber.receive()
+            if message is None:
+                break
+            print(json.dumps(message), flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.close()
+
+
+def run_publisher_benchmark():
+
+    (fd, socket_path) = tempfile.mkstemp(prefix='opencv-home-cam-pub-')
+    os.close(fd)
+    try:
+        results = benchmark_publisher(socket_path,
+                                      nbr_of_messages=parsed_args.messages,
+                                      nbr_of_subscribers=parsed_args.subscribers)
+    finally:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+    print("publish: {:.0f} messages/s".format(results['publish_rate']))
+    print("receive: {:.0f} messages/s (all subscribers)".format(results['receive_rate']))
+    print("slow subscriber disconnects: {}".format(results['slow_disconnects']))
+
+
 def main():
     global parsed_args
     global hcm
     load_options()
     hcm = None
+    exit_code = 0
 
     try:
 
+        if parsed_args.command == 'events':
+            list_events()
+            return
+
+        if parsed_args.command == 'annotate':
+            annotate_recording(parsed_args.input, parsed_args.output)
+            return
+
+        if parsed_args.command == 'benchmark-codecs':
+            run_codec_benchmark()
+            return
+
+        if parsed_args.command == 'benchmark-tiling':
+            run_tiling_benchmark()
+            return
+
+        if parsed_args.command == 'benchmark-dnn':
+            run_dnn_benchmark()
+            return
+
+        if parsed_args.command == 'analyze':
+            run_analyze()
+            return
+
+        if parsed_args.command == 'export-black-box':
+            (nbr_of_frames, (start, end)) = export_black_box(parsed_args.input,
+                                                             parsed_args.output)
+            print("Exported {} frames ({} - {})".format(nbr_of_frames,
+                                                        datetime.datetime.fromtimestamp(start),
+                                                        datetime.datetime.fromtimestamp(end)))
+            return
+
+        if parsed_args.command == 'export-clip':
+            run_clip_export()
+            return
+
+        if parsed_args.command == 'subscribe':
+            run_subscribe()
+            return
+
+        if parsed_args.command == 'benchmark-publisher':
+            run_publisher_benchmark()
+            return
+
+        if parsed_args.command == 'capture':
+            run_capture()
+            return
+
+        if parsed_args.command == 'replay':
+            if not run_replay():
+                exit_code = 1
+            return
+
         if not parsed_args.config_file:
             sys.stderr.write('Missing input config file\n')
             exit(1)
@@ -65,6 +649,15 @@ def main():
 
         hcm = OpenCvHomeCam(config_file=parsed_args.config_file)
 
+        if parsed_args.asyncio:
+            logger.info("Running OpenCvHomeCam on an asyncio event loop\n")
+            Orchestrator(hcm).run()
+            logger.info("OpenCvHomeCam finished\n")
+            return
+
+        signal.signal(signal.SIGHUP, reload_handler)
+        signal.signal(signal.SIGUSR1, profiling_handler)
+
         hcm.start()
         logger.info("Waiting for OpenCvHomeCam to finish\n")
         hcm.wait()
@@ -74,8 +667,33 @@ def main():
         sys.stderr.write('{}\n'.format(err))
     except OpenCvHomeCamException as err:
         sys.stderr.write('{}\n'.format(err))
+    except EventStoreException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except OverlayException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except ConfigException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except DetectorFactoryException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except AnalyzerException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except CameraException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except FrameArchiveException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except ReplayException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except BlackBoxException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except PublisherException as err:
+        sys.stderr.write('{}\n'.format(err))
+    except FrameIndexException as err:
+        sys.stderr.write('{}\n'.format(err))
     except:
         traceback.print_exc()
+    finally:
+        if exit_code != 0:
+            exit(exit_code)
 
 if __name__ == "__main__":
     main()
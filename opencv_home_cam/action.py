@@ -1,4 +1,5 @@
 import cv2
+import asyncio
 import subprocess
 from collections import namedtuple
 import tempfile
@@ -33,56 +34,110 @@ class Action:
         self._cool_down_time = config.cool_down_time
         self._last_detection_time = 0.0
 
-    def invoke(self, detection, detector_name, frame):
+    def saves_frame(self):
+
+        return self._save_frame
+
+    # Check if the action shall be invoked for a detection status change
+    # of a detector. Updates the cool-down state.
+    def _should_invoke(self, detection, detector_name):
 
         if ((not self._trigger_detection and detection) or
             (not self._trigger_no_detection and not detection)):
-            return
+            return False
 
         detection_time = time.time()
         if (self._last_detection_time + self._cool_down_time) > detection_time:
             self._logger.info("Action skipped due to cool-down")
-            return
+            return False
 
         self._last_detection_time  = detection_time
-        for action_detector in self._detectors:
-            if action_detector == detector_name:
-                if self._save_frame:
-                    # Create a temporary file for the current frame
-                    image = tempfile.NamedTemporaryFile(suffix='.jpg',
-                                                        prefix='opencv-home-cam-',
-                                                        dir=self._save_frame_dir)
-                    image_path = image.name
-                    cv2.imwrite(image_path, frame)
-                else:
-                    image_path = "No image"
-                # It is time to invoke the action script
-                self._invoke_command(detection,
-                                     detector_name,
-                                     self._command,
-                                     image_path)
-                if self._save_frame:
-                    # Remove the temporary file.
-                    image.close()
-                break
+        return detector_name in self._detectors
 
-    def _invoke_command(self, detection, detector_name, command, image_path):
+    # Save the frame to a temporary file (if enabled).
+    # Returns the temporary file (None if the frame is not saved) and the
+    # image path passed to the command.
+    def _save_frame_file(self, frame):
+
+        if not self._save_frame:
+            return (None, "No image")
+
+        # Create a temporary file for the current frame
+        image = tempfile.NamedTemporaryFile(suffix='.jpg',
+                                            prefix='opencv-home-cam-',
+                                            dir=self._save_frame_dir)
+        cv2.imwrite(image.name, frame)
+        return (image, image.name)
+
+    def invoke(self, detection, detector_name, frame):
+
+        if not self._should_invoke(detection, detector_name):
+            return
+
+        (image, image_path) = self._save_frame_file(frame)
+        # It is time to invoke the action script
+        self._invoke_command(detection,
+                             detector_name,
+                             self._command,
+                             image_path)
+        if image is not None:
+            # Remove the temporary file.
+            image.close()
+
+    # Same as invoke, but the command is run as an asyncio subprocess.
+    # The event loop is not blocked while the frame is saved (the JPEG
+    # encoding runs in the default executor) or while the command runs.
+    async def invoke_async(self, detection, detector_name, frame):
+
+        if not self._should_invoke(detection, detector_name):
+            return
+
+        loop = asyncio.get_event_loop()
+        (image, image_path) = await loop.run_in_executor(None, self._save_frame_file, frame)
+        try:
+            process = await asyncio.create_subprocess_exec(self._command,
+                                                           env=self._create_env(detection,
+                                                                                detector_name,
+                                                                                image_path))
+            try:
+                returncode = await process.wait()
+            except asyncio.CancelledError:
+                # Shutdown: don't leave the command running
+                process.kill()
+                await process.wait()
+                raise
+            if returncode != 0:
+                self._logger.warning("Command {} returned non-zero exitcode ({})".format(self._command, returncode))
+        except OSError as err:
+            self._logger.warning("Command {} failed: {}".format(self._command, err))
+        finally:
+            if image is not None:
+                image.close()
+
+    # Returns the environment of the action command
+    def _create_env(self, detection, detector_name, image_path):
 
-        # Setup environment variables that will be passed to the child
-        # (action command)
         ts_raw = self._last_detection_time
         ts_date = datetime.datetime.fromtimestamp(ts_raw).strftime('%Y-%m-%d %H:%M:%S')
 
-        os.environ["TIME_STAMP_RAW"] = str(ts_raw)
-        os.environ["TIME_STAMP_DATE"] = ts_date
-        os.environ["DETECTOR"] = detector_name
+        env = dict(os.environ)
+        env["TIME_STAMP_RAW"] = str(ts_raw)
+        env["TIME_STAMP_DATE"] = ts_date
+        env["DETECTOR"] = detector_name
         if detection:
-            os.environ["TRIGGER"] = "detect"
+            env["TRIGGER"] = "detect"
         else:
-            os.environ["TRIGGER"] = "no-detect"
-        os.environ["IMAGE_PATH"] = image_path
+            env["TRIGGER"] = "no-detect"
+        env["IMAGE_PATH"] = image_path
+        return env
+
+    def _invoke_command(self, detection, detector_name, command, image_path):
+
+        # Setup environment variables that will be passed to the child
+        # (action command)
+        env = self._create_env(detection, detector_name, image_path)
 
         # Launch command and wait for it to complete.
-        res = subprocess.run(command)
+        res = subprocess.run(command, env=env)
         if res.returncode != 0:
             self._logger.warning("Command {} returned non-zero exitcode ({})".format(command, res.returncode))
@@ -0,0 +1,272 @@
+import cv2
+import os
+import csv
+import json
+import time
+import logging
+import imutils
+import multiprocessing
+from .cam_controller import CamController
+from .config import HomeCamConfig
+from .detector_factory import create_detector
+from .zones import create_detection_zones
+
+
+class AnalyzerException(Exception):
+
+    pass
+
+
+# A video file used as camera by the analyzer.
+# Reads the frames start_frame up to (but not including) end_frame of the
+# file. The frames are resized the same way as the frames of a Camera.
+class VideoFile:
+
+    def __init__(self, file_name, max_width, start_frame=0, end_frame=None):
+
+        self._video_capture = cv2.VideoCapture(file_name)
+        if not self._video_capture.isOpened():
+            raise AnalyzerException("Unable to open video file {}".format(file_name))
+
+        if start_frame > 0:
+            self._video_capture.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+        width = self._video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = self._video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        self._max_width = max_width
+        rec_width = min(max_width, width)
+        rec_height = rec_width * height / width
+        self._resolution = (int(rec_width), int(rec_height))
+
+        self._fps = self._video_capture.get(cv2.CAP_PROP_FPS)
+        self._frame_index = start_frame
+        self._end_frame = end_frame
+
+    def get_resolution(self):
+
+        return self._resolution
+
+    # Returns the frame rate of the file (0 if unknown).
+    def get_fps(self):
+
+        return self._fps
+
+    # Returns the index (in the file) of the next frame to be captured.
+    def get_frame_index(self):
+
+        return self._frame_index
+
+    def capture_frame(self):
+
+        if self._end_frame is not None and self._frame_index >= self._end_frame:
+            return None
+
+        ret, frame = self._video_capture.read()
+        if not ret:
+            return None
+        self._frame_index += 1
+
+        if frame.shape[1] > self._max_width:
+            frame = imutils.resize(frame, width=self._max_width)
+
+        return frame
+
+    def close(self):
+
+        self._video_capture.release()
+
+
+# Returns a list of (file name, start frame, end frame) jobs covering the
+# video files. If chunk_frames is 0, each file is one job. Otherwise the
+# files are split into chunks of chunk_frames frames (end frame is None for
+# the last chunk of each file).
+# Also returns the total number of frames and the total duration (seconds)
+# of the files.
+def split_files(video_files, chunk_frames):
+
+    jobs = []
+    total_frames = 0
+    total_duration = 0.0
+    for video_file in video_files:
+        video_capture = cv2.VideoCapture(video_file)
+        if not video_capture.isOpened():
+            raise AnalyzerException("Unable to open video file {}".format(video_file))
+        nbr_of_frames = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = video_capture.get(cv2.CAP_PROP_FPS)
+        video_capture.release()
+
+        total_frames += nbr_of_frames
+        if fps > 0:
+            total_duration += nbr_of_frames / fps
+
+        if chunk_frames <= 0 or nbr_of_frames <= chunk_frames:
+            jobs.append((video_file, 0, None))
+            continue
+        for start_frame in range(0, nbr_of_frames, chunk_frames):
+            end_frame = start_frame + chunk_frames
+            if end_frame >= nbr_of_frames:
+                end_frame = None
+            jobs.append((video_file, start_frame, end_frame))
+
+    return (jobs, total_frames, total_duration)
+
+
+# Create a CamController for offline processing of the frames from camera
+# (e.g. a VideoFile). The detectors, zones, non-maximum suppression and
+# fusion of the first camera in config (a HomeCamConfig) are used. Nothing
+# is recorded, and there is no idle monitor (all frames are processed).
+def create_cam_controller(config, camera):
+
+    cameras = config.get_cameras()
+    if len(cameras) == 0:
+        raise AnalyzerException("No cameras specified. Add at least one camera section")
+    camera_cfg = cameras[0]
+
+    detectors = []
+    detector_tilings = config.get_detector_tilings()
+    for camera_detector in camera_cfg.detectors:
+        detectors.append(create_detector(name=camera_detector,
+                                         config=config.get_detectors()[camera_detector],
+                                         tiling_cfg=detector_tilings.get(camera_detector)))
+
+    zones = create_detection_zones(camera_cfg, camera.get_resolution(),
+                                   config.get_detector_zones())
+    return CamController(camera=camera,
+                         detectors=detectors,
+                         recorder=None,
+                         annotate_frames=False,
+                         zones=zones,
+                         nms_thresholds=config.get_detector_nms_thresholds(),
+                         fusion=config.get_fusion())
+
+
+# Run the detectors of the first camera in config (a HomeCamConfig) on the
+# frames of one job (see split_files).
+# Returns a (job, events, number of frames, elapsed seconds) tuple. Each
+# event is a dict with the file, the frame index and time offset within the
+# file, the detector name, and the rectangles and scores of the detections.
+def analyze_job(config, job):
+
+    (video_file, start_frame, end_frame) = job
+    start = time.perf_counter()
+
+    cameras = config.get_cameras()
+    if len(cameras) == 0:
+        raise AnalyzerException("No cameras specified. Add at least one camera section")
+    camera_cfg = cameras[0]
+
+    video = VideoFile(video_file, camera_cfg.max_width, start_frame, end_frame)
+    fps = video.get_fps()
+    cam_controller = create_cam_controller(config, video)
+
+    events = []
+    nbr_of_frames = 0
+    while True:
+        frame_index = video.get_frame_index()
+        detection_data = cam_controller.read_and_process_frame()
+        if detection_data.frame is None:
+            break
+        nbr_of_frames += 1
+        for detector_name, status in detection_data.detector_status.items():
+            if not status:
+                continue
+            events.append({'file': video_file,
+                           'frame': frame_index,
+                           'offset': frame_index / fps if fps > 0 else None,
+                           'detector': detector_name,
+                           'rectangles': [[int(v) for v in rect] for rect in detection_data.rectangles[detector_name]],
+                           'scores': [float(score) for score in detection_data.scores[detector_name]]})
+
+    cam_controller.close()
+    return (job, events, nbr_of_frames, time.perf_counter() - start)
+
+
+# The config of the worker processes (parsed once per process)
+_worker_config = None
+
+
+def _init_worker(config_file):
+
+    global _worker_config
+
+    # Each worker process runs one job at a time, so OpenCV's own threads
+    # would only compete with the other workers.
+    cv2.setNumThreads(1)
+    logging.getLogger('opencv_home_cam.config').setLevel(logging.WARNING)
+    _worker_config = HomeCamConfig(config_file)
+
+
+def _analyze_job(job):
+
+    return analyze_job(_worker_config, job)
+
+
+# Analyze video files with the detectors of the first camera in
+# config_file.
+# The files (or chunks of chunk_frames frames) are processed in parallel by
+# a pool of worker processes. The events are written to output (a file
+# object) as JSON lines or CSV rows (one row per rectangle), in file and
+# frame order.
+# Progress and the frame rate of each job are logged.
+# Returns a dict with the total number of frames, the elapsed time, the
+# overall frame rate and the speed relative to real-time.
+def analyze_files(config_file, video_files, output, output_format='json',
+                  workers=None, chunk_frames=0):
+
+    logger = logging.getLogger(__name__)
+
+    if output_format not in ('json', 'csv'):
+        raise AnalyzerException("Unknown output format: {}".format(output_format))
+
+    # Parse the config once here, so errors are reported before any worker
+    # is started.
+    HomeCamConfig(config_file)
+
+    video_files = sorted(video_files)
+    (jobs, total_frames, total_duration) = split_files(video_files, chunk_frames)
+    if workers is None:
+        workers = os.cpu_count()
+    workers = max(1, min(workers, len(jobs)))
+    logger.info("Analyzing {} files ({} frames, {} jobs) with {} workers".format(len(video_files),
+                                                                                total_frames,
+                                                                                len(jobs),
+                                                                                workers))
+
+    start = time.perf_counter()
+    results = {}
+    nbr_of_frames = 0
+    with multiprocessing.Pool(processes=workers,
+                              initializer=_init_worker,
+                              initargs=(config_file,)) as pool:
+        for (job, events, job_frames, job_time) in pool.imap_unordered(_analyze_job, jobs):
+            results[job] = events
+            nbr_of_frames += job_frames
+            elapsed = time.perf_counter() - start
+            logger.info("[{}/{}] {} frames {}-{}: {:.1f} fps (worker), {} events. "
+                        "Total {:.1f} fps".format(len(results), len(jobs),
+                                                  job[0], job[1],
+                                                  job[1] + job_frames - 1,
+                                                  job_frames / job_time if job_time > 0 else 0.0,
+                                                  len(events),
+                                                  nbr_of_frames / elapsed))
+
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(['file', 'frame', 'offset', 'detector',
+                         'x', 'y', 'width', 'height', 'score'])
+    for job in jobs:
+        for event in results[job]:
+            if output_format == 'json':
+                output.write(json.dumps(event) + '\n')
+                continue
+            for rect, score in zip(event['rectangles'], event['scores']):
+                writer.writerow([event['file'], event['frame'], event['offset'],
+                                 event['detector']] + rect + [score])
+
+    elapsed = time.perf_counter() - start
+    stats = {'frames': nbr_of_frames,
+             'elapsed_s': elapsed,
+             'fps': nbr_of_frames / elapsed if elapsed > 0 else 0.0}
+    if total_duration > 0 and elapsed > 0:
+        stats['realtime_factor'] = total_duration / elapsed
+    return stats
@@ -0,0 +1,267 @@
+import cv2
+import numpy
+import os
+import mmap
+import json
+import struct
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+from . import metrics
+from .video_codec import open_video_writer
+from .overlay import SidecarWriter
+
+
+# path          - The ring file. A ring file left by a previous run is
+#                 renamed to path + '.prev' at startup.
+# duration      - The length (in seconds) of the ring. The number of slots
+#                 is duration * fps.
+# slot_size     - The size (in bytes) of each slot. Frames (JPEG + metadata)
+#                 larger than a slot are dropped.
+# jpeg_quality  - The JPEG quality (0-100) of the frames.
+# sync_interval - The ring is synced to disk (msync) with this interval (in
+#                 seconds). 0 means never. The ring survives a crash of the
+#                 process without syncing (the page cache is written back by
+#                 the kernel), syncing is only needed to survive a power
+#                 loss.
+BlackBoxConfig = namedtuple('BlackBoxConfig',
+                            ['path',
+                             'duration',
+                             'slot_size',
+                             'jpeg_quality',
+                             'sync_interval'],
+                            verbose=False)
+
+
+# Ring file layout:
+#
+#   header - HEADER_SIZE bytes: magic, version, number of slots, slot size,
+#            fps and the length of a JSON blob (detector colors) that
+#            follows the fixed part.
+#   slots  - Each slot starts with a slot header (sequence number, capture
+#            time, JPEG length and metadata length) followed by the JPEG
+#            frame and the metadata (JSON rectangles).
+#
+# Sequence number 0 marks an empty (or partially written) slot. A slot is
+# invalidated before it is overwritten, and the sequence number is written
+# last, so a crash never leaves a slot with mixed contents.
+RING_MAGIC = b'OHCBLBOX'
+RING_VERSION = 1
+HEADER_FORMAT = '<8sIIIdI'
+HEADER_SIZE = 4096
+SLOT_HEADER_FORMAT = '<QdII'
+SLOT_HEADER_SIZE = struct.calcsize(SLOT_HEADER_FORMAT)
+
+# The maximum number of frames waiting to be encoded. Frames added while
+# the queue is full are dropped.
+QUEUE_SIZE = 8
+
+
+class BlackBoxException(Exception):
+
+    pass
+
+
+# The black box keeps the last seconds of frames (with the detection
+# rectangles) in a memory mapped ring file, so the frames leading up to a
+# crash or an incident can be exported afterwards.
+# Frames are written with plain memory copies into the mapping (no write
+# system calls). The frames are encoded and written by a separate thread,
+# so the frame processing is never blocked by the JPEG encoding.
+class BlackBox:
+
+    def __init__(self, config, fps, colors):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._slot_count = max(1, int(config.duration * fps))
+        self._slot_size = config.slot_size
+        self._jpeg_quality = config.jpeg_quality
+        self._sync_interval = config.sync_interval
+        self._last_sync = time.time()
+        self._sequence = 0
+        # Frames too large for a slot, and frames added while the queue was
+        # full
+        self._nbr_of_dropped_frames = 0
+        self._nbr_of_skipped_frames = 0
+
+        if self._slot_size <= SLOT_HEADER_SIZE:
+            raise BlackBoxException("Black box slot size too small")
+
+        if os.path.exists(config.path):
+            # Keep the ring of the previous run (it might contain the
+            # frames leading up to a crash).
+            os.replace(config.path, config.path + '.prev')
+            self._logger.info("Black box: previous ring saved as {}".format(config.path + '.prev'))
+
+        size = HEADER_SIZE + self._slot_count * self._slot_size
+        try:
+            fd = os.open(config.path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.ftruncate(fd, size)
+                self._mmap = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+        except OSError as err:
+            raise BlackBoxException(err)
+
+        colors_json = json.dumps({name: list(color) for name, color in colors.items()}).encode()
+        header = struct.pack(HEADER_FORMAT, RING_MAGIC, RING_VERSION,
+                             self._slot_count, self._slot_size, fps,
+                             len(colors_json))
+        if len(header) + len(colors_json) > HEADER_SIZE:
+            raise BlackBoxException("Black box header too large")
+        self._mmap[0:len(header)] = header
+        self._mmap[len(header):len(header) + len(colors_json)] = colors_json
+
+        self._logger.info("Black box: {} slots of {} bytes ({} MB)".format(self._slot_count,
+                                                                         self._slot_size,
+                                                                         size // 1000000))
+
+        # The queue holds (frame, timestamp, rectangles) tuples. None tells
+        # the writer thread to stop.
+        self._queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self._writer_thread = threading.Thread(target=self._write_frames)
+        self._writer_thread.start()
+
+    # Add a frame (without drawn rectangles) and the rectangles of its
+    # detections. The frame is copied, so the caller may draw into it
+    # afterwards.
+    # This function is called from the frame processing thread and never
+    # blocks on the encoding.
+    def add_frame(self, frame, timestamp, rectangles):
+
+        rects = {}
+        for detector_name, detector_rects in rectangles.items():
+            if detector_rects is not None and len(detector_rects) > 0:
+                rects[detector_name] = [list(map(int, r)) for r in detector_rects]
+
+        try:
+            self._queue.put_nowait((frame.copy(), timestamp, rects))
+        except queue.Full:
+            self._nbr_of_skipped_frames += 1
+            metrics.inc_counter('black_box_dropped_frames')
+
+    def _write_frames(self):
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            (frame, timestamp, rects) = item
+            self._write_frame(frame, timestamp, rects)
+
+    def _write_frame(self, frame, timestamp, rects):
+
+        ret, jpeg = cv2.imencode('.jpg', frame,
+                                 [int(cv2.IMWRITE_JPEG_QUALITY), self._jpeg_quality])
+        if not ret:
+            return
+
+        meta = json.dumps(rects, separators=(',', ':')).encode()
+
+        if SLOT_HEADER_SIZE + jpeg.size + len(meta) > self._slot_size:
+            self._nbr_of_dropped_frames += 1
+            metrics.inc_counter('black_box_dropped_frames')
+            if self._nbr_of_dropped_frames == 1:
+                self._logger.warning("Black box: frame size {} bytes exceeds the slot size. "
+                                     "Increase slot_size or lower jpeg_quality".format(jpeg.size + len(meta)))
+            return
+
+        self._sequence += 1
+        offset = HEADER_SIZE + (self._sequence % self._slot_count) * self._slot_size
+        data_offset = offset + SLOT_HEADER_SIZE
+
+        # Invalidate the slot, write the data and finally the slot header
+        self._mmap[offset:offset + 8] = b'\0' * 8
+        self._mmap[data_offset:data_offset + jpeg.size] = jpeg.tobytes()
+        self._mmap[data_offset + jpeg.size:data_offset + jpeg.size + len(meta)] = meta
+        self._mmap[offset:offset + SLOT_HEADER_SIZE] = struct.pack(SLOT_HEADER_FORMAT,
+                                                                   self._sequence,
+                                                                   timestamp,
+                                                                   jpeg.size,
+                                                                   len(meta))
+
+        if self._sync_interval > 0 and timestamp - self._last_sync > self._sync_interval:
+            self._mmap.flush()
+            self._last_sync = timestamp
+
+    def close(self):
+
+        if self._mmap is None:
+            return
+
+        self._queue.put(None)
+        self._writer_thread.join()
+        self._mmap.flush()
+        self._mmap.close()
+        self._mmap = None
+        if self._nbr_of_dropped_frames > 0:
+            self._logger.info("Black box: {} frames dropped".format(self._nbr_of_dropped_frames))
+        if self._nbr_of_skipped_frames > 0:
+            self._logger.info("Black box: {} frames dropped (encoding too slow)".format(self._nbr_of_skipped_frames))
+
+
+# Read a ring file.
+# Returns a (fps, colors, frames) tuple. frames is a list of (timestamp,
+# JPEG bytes, rectangles) tuples in capture order.
+def read_black_box(path):
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except IOError as err:
+        raise BlackBoxException(err)
+
+    fixed_size = struct.calcsize(HEADER_FORMAT)
+    if len(data) < HEADER_SIZE:
+        raise BlackBoxException("{}: not a black box file".format(path))
+    (magic, version, slot_count, slot_size, fps, colors_len) = struct.unpack(HEADER_FORMAT, data[:fixed_size])
+    if magic != RING_MAGIC or version != RING_VERSION:
+        raise BlackBoxException("{}: not a black box file (or unsupported version)".format(path))
+    colors = json.loads(data[fixed_size:fixed_size + colors_len].decode())
+
+    slots = []
+    for slot in range(slot_count):
+        offset = HEADER_SIZE + slot * slot_size
+        (sequence, timestamp, jpeg_len, meta_len) = struct.unpack(SLOT_HEADER_FORMAT,
+                                                                  data[offset:offset + SLOT_HEADER_SIZE])
+        if sequence == 0 or SLOT_HEADER_SIZE + jpeg_len + meta_len > slot_size:
+            continue
+        data_offset = offset + SLOT_HEADER_SIZE
+        jpeg = data[data_offset:data_offset + jpeg_len]
+        meta = json.loads(data[data_offset + jpeg_len:data_offset + jpeg_len + meta_len].decode())
+        slots.append((sequence, timestamp, jpeg, meta))
+
+    slots.sort()
+    frames = [(timestamp, jpeg, meta) for (sequence, timestamp, jpeg, meta) in slots]
+    return (fps, colors, frames)
+
+
+# Export a ring file to a video file (MJPEG AVI by default) with a sidecar
+# file (see overlay.py) containing the rectangles.
+# Returns the number of exported frames and the (first, last) timestamps.
+def export_black_box(path, output_file, fourcc='MJPG'):
+
+    (fps, colors, frames) = read_black_box(path)
+    if len(frames) == 0:
+        raise BlackBoxException("{}: no frames in the black box".format(path))
+
+    writer = None
+    sidecar = SidecarWriter(output_file, {name: tuple(color) for name, color in colors.items()})
+    for (frame_index, (timestamp, jpeg, rects)) in enumerate(frames):
+        frame = cv2.imdecode(numpy.frombuffer(jpeg, numpy.uint8), cv2.IMREAD_COLOR)
+        if writer is None:
+            writer = open_video_writer(output_file, fourcc, fps,
+                                       (frame.shape[1], frame.shape[0]))
+            if not writer.isOpened():
+                sidecar.close()
+                raise BlackBoxException("Unable to open {}".format(output_file))
+        writer.write(frame)
+        sidecar.write(frame_index, rects)
+    writer.release()
+    sidecar.close()
+
+    return (len(frames), (frames[0][0], frames[-1][0]))
@@ -4,9 +4,12 @@ import imutils
 import os
 import re
 import logging
+import time
 from collections import namedtuple
 from .detector import Detector
 from .recorder import Recorder
+from .overlay import draw_rectangles
+from .nms import nms_indices, fuse
 
 
 # frame          - The current frame (image)
@@ -16,10 +19,25 @@ from .recorder import Recorder
 # rectangles     - A dict of (x, y, width, height) tuples forming a rectangle
 #                  of each match in the current frame. The current detector
 #                  name is the dict key.
+# scores         - A dict of arrays with the confidence of each rectangle
+#                  in rectangles. The current detector name is the dict key.
+# timestamp      - The capture time of the frame (seconds since the epoch).
+# recording_file - The recording file the frame was written to (None if the
+#                  frame was not recorded).
+# frame_index    - The index of the frame within recording_file (None if
+#                  the frame was not recorded).
+# detectors_run  - True if the detectors were run on the frame, False if
+#                  they were skipped (idle mode, unchanged frame) or there
+#                  was no frame.
 DetectionData = namedtuple('DetectionData',
                            ['frame',
                             'detector_status',
-                            'rectangles'],
+                            'rectangles',
+                            'scores',
+                            'timestamp',
+                            'recording_file',
+                            'frame_index',
+                            'detectors_run'],
                            verbose=False)
 
 
@@ -30,7 +48,46 @@ class CamControllerException(Exception):
 
 class CamController:
 
-    def __init__(self, camera, detectors, recorder):
+    # annotate_frames - If True, the rectangles of all detections are drawn
+    #                   into the frame returned in the DetectionData (used by
+    #                   actions saving frames etc.). The rectangles drawn
+    #                   into recorded frames are controlled by the recorder.
+    # idle_monitor    - An (optional) IdleMonitor. While the monitor is
+    #                   idle, only its motion check is made on the frames.
+    # zones           - A dict of DetectionZones (detector name is the dict
+    #                   key). Detectors without a zone process the whole
+    #                   frame.
+    # nms_thresholds  - A dict of IoU thresholds for the non-maximum
+    #                   suppression of each detector (detector name is the
+    #                   dict key). Detectors without a threshold report all
+    #                   rectangles.
+    # fusion          - An (optional) FusionConfig. Overlapping rectangles
+    #                   of the fused detectors are merged into single
+    #                   objects.
+    # priorities      - A dict of scheduler priority classes (detector name
+    #                   is the dict key). Detectors without a priority get
+    #                   priority 0.
+    # scheduler       - An (optional) DetectionScheduler. If set, the
+    #                   detectors are run by the scheduler workers
+    #                   (otherwise one by one in the calling thread).
+    # camera_name     - The name of the camera (used by the scheduler).
+    # timelapse       - An (optional) Timelapse. All captured frames are
+    #                   passed to it (before any rectangles are drawn).
+    # illumination_monitor - An (optional) IlluminationMonitor. After a
+    #                   lighting change, the motion detectors are skipped
+    #                   (and reset) for a short while.
+    # detection_cache - An (optional) DetectionCache. The detectors are
+    #                   skipped on frames unchanged since the last full
+    #                   detection, and the cached results are reported.
+    # frame_budget    - The time (in seconds) available for processing one
+    #                   frame (1 / fps). Used by the scheduler to tell when
+    #                   a frame is late. None means frames are never late.
+    def __init__(self, camera, detectors, recorder, annotate_frames=True,
+                 idle_monitor=None, zones=None, nms_thresholds=None,
+                 fusion=None, priorities=None, scheduler=None,
+                 camera_name='camera0', timelapse=None,
+                 illumination_monitor=None, detection_cache=None,
+                 frame_budget=None):
 
         self._logger = logging.getLogger(__name__)
 
@@ -41,9 +98,72 @@ class CamController:
             raise CamControllerException("Missing detector(s)")
 
         self._camera = camera
+        self._camera_name = camera_name
+        self._scheduler = scheduler
+        self._save_frame = False
+        # Accumulated processing time (in seconds) of each processing stage
+        self._stage_times = {}
+        # Number of runs of each detector (used to estimate the time saved
+        # by skipped runs)
+        self._detector_runs = {}
+        self._black_box = None
+        self.reconfigure(detectors=detectors,
+                         recorder=recorder,
+                         annotate_frames=annotate_frames,
+                         idle_monitor=idle_monitor,
+                         zones=zones,
+                         nms_thresholds=nms_thresholds,
+                         fusion=fusion,
+                         priorities=priorities,
+                         timelapse=timelapse,
+                         illumination_monitor=illumination_monitor,
+                         detection_cache=detection_cache,
+                         frame_budget=frame_budget)
+
+    # Replace the detectors, the recorder and the detection settings (see
+    # the constructor for a description of the arguments).
+    # The camera is left untouched. Must be called from the thread calling
+    # read_and_process_frame (i.e. between two frames).
+    def reconfigure(self, detectors, recorder, annotate_frames=True,
+                    idle_monitor=None, zones=None, nms_thresholds=None,
+                    fusion=None, priorities=None, timelapse=None,
+                    illumination_monitor=None, detection_cache=None,
+                    frame_budget=None):
+
+        if detectors is None:
+            raise CamControllerException("Missing detector(s)")
+
         self._recorder = recorder
         self._detectors = detectors
-        self._save_frame = False
+        self._annotate_frames = annotate_frames
+        self._idle_monitor = idle_monitor
+        if zones is None:
+            zones = {}
+        self._zones = zones
+        if nms_thresholds is None:
+            nms_thresholds = {}
+        self._nms_thresholds = nms_thresholds
+        self._fusion = fusion
+        if priorities is None:
+            priorities = {}
+        self._priorities = priorities
+        self._timelapse = timelapse
+        self._illumination_monitor = illumination_monitor
+        self._frame_budget = frame_budget
+        self._detection_cache = detection_cache
+        if detection_cache is not None:
+            # The cached results may be from other detectors
+            detection_cache.invalidate()
+
+        # The last (unfused) detections of each detector (detector name is
+        # the dict key), reported for detectors shed by the scheduler
+        self._last_detections = {}
+
+        self._colors = {}
+        for detector in self._detectors:
+            self._colors.update(detector.get_output_colors())
+        if self._recorder is not None:
+            self._recorder.set_detector_colors(self._colors)
 
     # Read one frame from the cam and process it.
     # Returns a DetectionData named tuple containing all detection
@@ -53,41 +173,277 @@ class CamController:
         # Initialize the detection data
         detector_status = {}
         rectangles = {}
-        for detector in self._detectors:
-            detector_status[detector.get_name()] = False
-            rectangles[detector.get_name()] = None
+        scores = {}
+        for detector_name in self._colors:
+            detector_status[detector_name] = False
+            rectangles[detector_name] = None
+            scores[detector_name] = None
 
         # Capture frame
+        stage_start = time.perf_counter()
+        if self._frame_budget is not None:
+            deadline = stage_start + self._frame_budget
+        else:
+            deadline = None
         frame = self._camera.capture_frame()
+        timestamp = time.time()
+        stage_start = self._add_stage_time('capture', stage_start)
         if frame is None:
             return DetectionData(frame=None,
                                  detector_status=detector_status,
-                                 rectangles=rectangles)
+                                 rectangles=rectangles,
+                                 scores=scores,
+                                 timestamp=timestamp,
+                                 recording_file=None,
+                                 frame_index=None,
+                                 detectors_run=False)
+
+        if self._timelapse is not None:
+            self._timelapse.add_frame(frame, timestamp)
+            stage_start = self._add_stage_time('timelapse', stage_start)
+
+        lighting_change = False
+        if self._illumination_monitor is not None:
+            lighting_change = self._illumination_monitor.check(frame, timestamp)
+            stage_start = self._add_stage_time('illumination', stage_start)
+
+        if (lighting_change and
+            self._idle_monitor is not None and
+            self._idle_monitor.is_idle()):
+            # Don't wake up on a lighting change, just move the reference
+            # of the motion check to the new lighting.
+            self._idle_monitor.rebaseline(frame)
+            self._add_stage_time('idle_check', stage_start)
+            if self._black_box is not None:
+                self._black_box.add_frame(frame, timestamp, rectangles)
+            return DetectionData(frame=frame,
+                                 detector_status=detector_status,
+                                 rectangles=rectangles,
+                                 scores=scores,
+                                 timestamp=timestamp,
+                                 recording_file=None,
+                                 frame_index=None,
+                                 detectors_run=False)
+
+        if (self._idle_monitor is not None and
+            self._idle_monitor.is_idle() and
+            not self._idle_monitor.check_motion(frame)):
+            # Static scene: skip the detectors.
+            self._add_stage_time('idle_check', stage_start)
+            if self._black_box is not None:
+                self._black_box.add_frame(frame, timestamp, rectangles)
+            return DetectionData(frame=frame,
+                                 detector_status=detector_status,
+                                 rectangles=rectangles,
+                                 scores=scores,
+                                 timestamp=timestamp,
+                                 recording_file=None,
+                                 frame_index=None,
+                                 detectors_run=False)
+
+        if self._idle_monitor is not None:
+            stage_start = self._add_stage_time('idle_check', stage_start)
+
+        # A frame with a lighting change is never unchanged
+        use_cache = self._detection_cache is not None and not lighting_change
+        if use_cache:
+            cached = self._detection_cache.lookup(frame, timestamp)
+            stage_start = self._add_stage_time('detection_cache', stage_start)
+            if cached is not None:
+                (cached_status, cached_rectangles, cached_scores) = cached
+                detector_status.update(cached_status)
+                rectangles.update(cached_rectangles)
+                scores.update(cached_scores)
+                # There is no motion in an unchanged frame
+                for detector in self._detectors:
+                    if not detector.is_motion_detector():
+                        continue
+                    for detector_name in detector.get_output_colors():
+                        detector_status[detector_name] = False
+                        rectangles[detector_name] = None
+                        scores[detector_name] = None
+                return self._finish_frame(frame, timestamp, detector_status,
+                                          rectangles, scores, stage_start,
+                                          detectors_run=False)
+        detection_start = stage_start
 
         frame_gs = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        stage_start = self._add_stage_time('grayscale', stage_start)
+
+        detectors = self._detectors
+        if lighting_change:
+            # The motion detectors would report the whole frame. Skip them
+            # and let them start over from the new lighting.
+            detectors = []
+            for detector in self._detectors:
+                if not detector.is_motion_detector():
+                    detectors.append(detector)
+                    continue
+                detector.reset()
+                for detector_name in detector.get_output_colors():
+                    self._last_detections.pop(detector_name, None)
+                self._illumination_monitor.add_saved_time(self._get_average_run_time(detector.get_name()))
 
         # Check detections for each detector
-        for detector in self._detectors:
-            obj = detector.detect(frame_gs)
+        shed = False
+        if self._scheduler is not None:
+            detections = self._detect_scheduled(detectors, frame, frame_gs, deadline)
+            stage_start = time.perf_counter()
+        else:
+            detections = []
+            for detector in detectors:
+                detections.append((detector, self._detect(detector, frame, frame_gs)))
+                stage_start = self._add_stage_time(detector.get_name(), stage_start)
+                self._add_detector_run(detector.get_name())
+
+        for (detector, named_detections) in detections:
+            if named_detections is None:
+                # Shed by the scheduler. The last known detections are
+                # reported, so the detection status doesn't change.
+                shed = True
+                named_detections = {}
+                for detector_name in detector.get_output_colors():
+                    if detector_name in self._last_detections:
+                        named_detections[detector_name] = self._last_detections[detector_name]
+            else:
+                self._last_detections.update(named_detections)
+            for (detector_name, (obj, obj_scores)) in named_detections.items():
+                if len(obj) > 0:
+                    rectangles[detector_name] = obj
+                    scores[detector_name] = obj_scores
+
+        if self._fusion is not None:
+            (rectangles, scores) = fuse(rectangles, scores, self._fusion)
+            stage_start = self._add_stage_time('fusion', stage_start)
+
+        for detector_name, obj in rectangles.items():
+            detector_status[detector_name] = obj is not None and len(obj) > 0
 
-            if len(obj) == 0:
-                continue
+        if use_cache and not shed:
+            self._detection_cache.store(timestamp, dict(detector_status),
+                                        dict(rectangles), dict(scores),
+                                        time.perf_counter() - detection_start)
 
-            detector_status[detector.get_name()] = True
-            rectangles[detector.get_name()] = obj
+        return self._finish_frame(frame, timestamp, detector_status,
+                                  rectangles, scores, stage_start,
+                                  detectors_run=True)
 
-            for (x, y, w, h) in obj:
-                cv2.rectangle(frame, (x, y),
-                              (x+w, y+h),
-                              detector.get_rgb_tuple(),
-                              2)
+    # Update the idle monitor, record and annotate the frame.
+    # Returns the DetectionData of the frame.
+    def _finish_frame(self, frame, timestamp, detector_status, rectangles,
+                      scores, stage_start, detectors_run):
 
+        if self._idle_monitor is not None:
+            self._idle_monitor.update(True in detector_status.values())
+
+        if self._black_box is not None:
+            self._black_box.add_frame(frame, timestamp, rectangles)
+
+        # The rectangles are only drawn if someone is going to consume
+        # the annotated frame.
+        recording_file = None
+        frame_index = None
+        annotated = False
         if self._save_frame and self._recorder is not None:
-            self._recorder.record_frame(frame)
+            if self._recorder.draws_rectangles():
+                draw_rectangles(frame, rectangles, self._colors)
+                annotated = True
+            (recording_file, frame_index) = self._recorder.record_frame(frame, rectangles, timestamp)
+
+        if self._annotate_frames and not annotated:
+            draw_rectangles(frame, rectangles, self._colors)
+        self._add_stage_time('record', stage_start)
 
         return DetectionData(frame=frame,
                              detector_status=detector_status,
-                             rectangles=rectangles)
+                             rectangles=rectangles,
+                             scores=scores,
+                             timestamp=timestamp,
+                             recording_file=recording_file,
+                             frame_index=frame_index,
+                             detectors_run=detectors_run)
+
+    # Run a detector (including zone filtering and NMS) on a frame.
+    # Returns a dict of (rects, scores) tuples (see
+    # Detector.detect_named_with_scores). The zone of the detector applies
+    # to all its rectangles, the NMS threshold is looked up by the name the
+    # rectangles are reported under.
+    # Rectangles reported under another name (the cascades of a haar-multi
+    # detector) are also filtered by the zone of that name. The frame is
+    # shared by all names, so those zones don't limit the processed area.
+    def _detect(self, detector, frame, frame_gs):
+
+        detector_frame = frame if detector.uses_color_frames() else frame_gs
+        zone = self._zones.get(detector.get_name())
+        if zone is not None:
+            named_detections = detector.detect_named_with_scores(zone.crop(detector_frame))
+        else:
+            named_detections = detector.detect_named_with_scores(detector_frame)
+
+        for (detector_name, (obj, obj_scores)) in named_detections.items():
+            if zone is not None:
+                (obj, obj_scores) = zone.filter_rects(obj, obj_scores)
+            if detector_name != detector.get_name():
+                output_zone = self._zones.get(detector_name)
+                if output_zone is not None:
+                    (obj, obj_scores) = output_zone.filter_frame_rects(obj, obj_scores)
+
+            nms_threshold = self._nms_thresholds.get(detector_name)
+            if nms_threshold is not None and len(obj) > 0:
+                keep = nms_indices(obj, obj_scores, nms_threshold)
+                obj = numpy.asarray(obj).reshape(-1, 4)[keep]
+                obj_scores = numpy.asarray(obj_scores).reshape(-1)[keep]
+            named_detections[detector_name] = (obj, obj_scores)
+        return named_detections
+
+    # Run all detectors as jobs of the (shared) detection scheduler and
+    # wait for the results.
+    # Returns a list of (detector, detections) tuples (see _detect). The
+    # detections are None for detectors shed by the scheduler.
+    def _detect_scheduled(self, detectors, frame, frame_gs, deadline):
+
+        jobs = []
+        for detector in detectors:
+            jobs.append((detector,
+                         self._scheduler.submit(self._camera_name,
+                                                self._priorities.get(detector.get_name(), 0),
+                                                deadline,
+                                                self._detect, detector, frame, frame_gs)))
+
+        detections = []
+        for (detector, job) in jobs:
+            detections.append((detector, job.result()))
+            if job.run_time is not None:
+                detector_name = detector.get_name()
+                self._stage_times[detector_name] = self._stage_times.get(detector_name, 0.0) + job.run_time
+                self._add_detector_run(detector_name)
+        return detections
+
+    def _add_detector_run(self, detector_name):
+
+        self._detector_runs[detector_name] = self._detector_runs.get(detector_name, 0) + 1
+
+    # Returns the average time (in seconds) of one run of a detector
+    def _get_average_run_time(self, detector_name):
+
+        nbr_of_runs = self._detector_runs.get(detector_name, 0)
+        if nbr_of_runs == 0:
+            return 0.0
+        return self._stage_times.get(detector_name, 0.0) / nbr_of_runs
+
+    def _add_stage_time(self, stage, stage_start):
+
+        now = time.perf_counter()
+        self._stage_times[stage] = self._stage_times.get(stage, 0.0) + now - stage_start
+        return now
+
+    # Returns a dict with the accumulated processing time (in seconds) of
+    # each processing stage: capture, timelapse, illumination, idle_check,
+    # detection_cache, grayscale, one stage per detector (including zone
+    # filtering and NMS), fusion and record (recording and annotation).
+    def get_stage_times(self):
+
+        return dict(self._stage_times)
 
     def enable_frame_saving(self):
 
@@ -97,9 +453,41 @@ class CamController:
 
         self._save_frame = False
 
+    # Returns a dict with the BGR color of each detector (detector name is
+    # the dict key).
+    def get_colors(self):
+
+        return self._colors
+
+    # Set an (optional) BlackBox. All captured frames are passed to it
+    # (before any rectangles are drawn) with the rectangles of their
+    # detections.
+    def set_black_box(self, black_box):
+
+        self._black_box = black_box
+
+    def get_recorder(self):
+
+        return self._recorder
+
+    def get_timelapse(self):
+
+        return self._timelapse
+
+    def get_illumination_monitor(self):
+
+        return self._illumination_monitor
+
+    def get_detection_cache(self):
+
+        return self._detection_cache
+
     def close(self):
 
         self._camera.close()
 
         if self._recorder is not None:
             self._recorder.close()
+
+        if self._timelapse is not None:
+            self._timelapse.close()
@@ -1,17 +1,52 @@
 import cv2
+import numpy
 from collections import namedtuple
 import logging
 import imutils
+import threading
+import time
+from . import metrics
+
+# Samples with a smaller intensity range than this (black frames, saturated
+# frames, a covered lens) are never counted as frozen, since a static
+# uniform scene gives identical frames as well.
+FROZEN_MIN_RANGE = 8
 
 
 CameraConfig = namedtuple('CameraConfig',
                           ['cam_id',
                            'fps',
                            'recorder',
-                           'detectors'],
+                           'detectors',
+                           'max_width',
+                           'include_zones',
+                           'exclude_zones',
+                           'priority',
+                           'timelapse',
+                           'timelapse_interval'],
                           verbose=False)
 
 
+# max_failures  - The number of consecutive failed (or too slow) reads
+#                 after which the camera is considered stalled.
+# frozen_frames - The number of consecutive identical frames after which
+#                 the camera is considered stalled. 0 disables the frozen
+#                 frame check.
+# max_read_time - Reads taking longer than this (in seconds) are counted as
+#                 latency spikes (and as failed reads).
+# min_backoff   - The delay (in seconds) before the first reconnect
+#                 attempt. The delay is doubled after each failed attempt.
+# max_backoff   - The maximum delay (in seconds) between two reconnect
+#                 attempts.
+CameraWatchdogConfig = namedtuple('CameraWatchdogConfig',
+                                  ['max_failures',
+                                   'frozen_frames',
+                                   'max_read_time',
+                                   'min_backoff',
+                                   'max_backoff'],
+                                  verbose=False)
+
+
 class CameraException(Exception):
 
     pass
@@ -19,22 +54,38 @@ class CameraException(Exception):
 
 class Camera:
 
-    def __init__(self, cam_id):
+    # max_width - Captured frames wider than this are resized to this
+    #             width.
+    # watchdog  - An (optional) CameraWatchdogConfig. If set, stalled
+    #             cameras (failed reads, frozen frames, slow reads) are
+    #             reopened.
+    def __init__(self, cam_id, max_width=400, watchdog=None):
 
         self._logger = logging.getLogger(__name__)
 
+        self._cam_id = cam_id
         self._video_capture = cv2.VideoCapture(int(cam_id))
         if not self._video_capture.isOpened():
             raise CameraException("Unable to open camera")
 
+        self._watchdog = watchdog
+        self._nbr_of_failures = 0
+        self._nbr_of_frozen_frames = 0
+        self._prev_sample = None
+        self._stall_time = None
+        self._reconnect_thread = None
+        self._reconnected_capture = None
+        self._closing = threading.Event()
+
         # Get the resolution of the capture device
         width = self._video_capture.get(3)
         height = self._video_capture.get(4)
 
-        # We are going to resize all captured frames to a width of max 400 pixels,
-        # so we must make sure the recording resolution matches the rescaled
-        # frames.
-        rec_width = min(400, width)
+        # We are going to resize all captured frames to a width of max
+        # max_width pixels, so we must make sure the recording resolution
+        # matches the rescaled frames.
+        self._max_width = max_width
+        rec_width = min(max_width, width)
         rec_height = rec_width * height / width
         self._resolution = (int(rec_width), int(rec_height))
 
@@ -44,10 +95,18 @@ class Camera:
 
     def capture_frame(self):
 
+        if self._stall_time is not None and not self._check_reconnect():
+            # Reconnecting
+            return None
+
         if not self._video_capture.isOpened():
             return None
 
+        read_start = time.perf_counter()
         ret, frame = self._video_capture.read()
+        if self._watchdog is not None and self._check_stall(ret, frame,
+                                                            time.perf_counter() - read_start):
+            return None
         if not ret:
             return None
 
@@ -56,12 +115,115 @@ class Camera:
         # http://www.pyimagesearch.com/2015/11/09/pedestrian-detection-opencv/
         # load the image and resize it to (1) reduce detection time
         # and (2) improve detection accuracy
-        frame = imutils.resize(frame, width=min(400, frame.shape[1]))
+        if frame.shape[1] > self._max_width:
+            frame = imutils.resize(frame, width=self._max_width)
+        # The capture device may come back with another resolution after a
+        # reconnect. The recorder, the zone masks etc. expect the frames to
+        # keep the resolution reported at startup.
+        if (frame.shape[1], frame.shape[0]) != self._resolution:
+            frame = cv2.resize(frame, self._resolution)
 
         return frame
 
+    # Check a read for signs of a stalled camera.
+    # Returns True if the camera is considered stalled (and a reconnect has
+    # been started).
+    def _check_stall(self, ret, frame, read_time):
+
+        if read_time > self._watchdog.max_read_time:
+            metrics.inc_counter('camera_read_latency_spikes')
+            self._logger.warning("Camera: slow read ({:.0f} ms)".format(read_time * 1e3))
+
+        if not ret or read_time > self._watchdog.max_read_time:
+            self._nbr_of_failures += 1
+            if self._nbr_of_failures >= self._watchdog.max_failures:
+                self._stall("{} failed or slow reads".format(self._nbr_of_failures))
+                return True
+            return False
+        self._nbr_of_failures = 0
+
+        if self._watchdog.frozen_frames == 0:
+            return False
+
+        # Compare a sparse sample of the pixels with the previous frame
+        sample = frame[::16, ::16].copy()
+        if (self._prev_sample is not None and
+            numpy.array_equal(sample, self._prev_sample) and
+            int(sample.max()) - int(sample.min()) >= FROZEN_MIN_RANGE):
+            self._nbr_of_frozen_frames += 1
+            if self._nbr_of_frozen_frames >= self._watchdog.frozen_frames:
+                self._stall("{} identical frames".format(self._nbr_of_frozen_frames))
+                return True
+        else:
+            self._nbr_of_frozen_frames = 0
+        self._prev_sample = sample
+        return False
+
+    # Release the stalled capture device and start reconnecting in a
+    # background thread (the frame processing continues without frames).
+    def _stall(self, reason):
+
+        self._logger.warning("Camera: stalled ({}). Reconnecting".format(reason))
+        metrics.inc_counter('camera_stalls')
+        metrics.set_gauge('camera_stalled', 1)
+        self._stall_time = time.time()
+        self._nbr_of_failures = 0
+        self._nbr_of_frozen_frames = 0
+        self._prev_sample = None
+        self._video_capture.release()
+        self._reconnected_capture = None
+        self._reconnect_thread = threading.Thread(target=self._reconnect, daemon=True)
+        self._reconnect_thread.start()
+
+    def _reconnect(self):
+
+        backoff = self._watchdog.min_backoff
+        attempt = 0
+        while not self._closing.wait(backoff):
+            attempt += 1
+            video_capture = cv2.VideoCapture(int(self._cam_id))
+            if video_capture.isOpened() and video_capture.read()[0]:
+                self._reconnected_capture = video_capture
+                return
+            video_capture.release()
+            backoff = min(backoff * 2, self._watchdog.max_backoff)
+            self._logger.info("Camera: reconnect attempt {} failed. "
+                              "Next attempt in {:.1f} s".format(attempt, backoff))
+
+    # Returns True if the reconnect is finished (the new capture device is
+    # then used).
+    def _check_reconnect(self):
+
+        if self._reconnected_capture is None:
+            return False
+
+        self._video_capture = self._reconnected_capture
+        self._reconnected_capture = None
+        self._reconnect_thread = None
+        recover_time = time.time() - self._stall_time
+        self._stall_time = None
+        metrics.inc_counter('camera_reconnects')
+        metrics.set_gauge('camera_stalled', 0)
+        metrics.set_gauge('camera_recover_time_s', recover_time)
+        self._logger.info("Camera: reconnected after {:.1f} s".format(recover_time))
+
+        width = self._video_capture.get(3)
+        height = self._video_capture.get(4)
+        rec_width = min(self._max_width, width)
+        if width > 0 and (int(rec_width), int(rec_width * height / width)) != self._resolution:
+            self._logger.warning("Camera: resolution changed after reconnect ({}x{}). The frames "
+                                 "are resized to {}x{}".format(int(width), int(height),
+                                                               self._resolution[0], self._resolution[1]))
+        return True
+
     def close(self):
 
+        self._closing.set()
+        if self._reconnect_thread is not None:
+            self._reconnect_thread.join()
+        if self._reconnected_capture is not None:
+            self._reconnected_capture.release()
+
         if self._video_capture is not None:
             self._logger.info("Closing video capture device")
             self._video_capture.release()
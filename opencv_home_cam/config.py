@@ -0,0 +1,1425 @@
+import configparser
+import ast
+import os
+import tempfile
+import logging
+from .camera import CameraConfig, CameraWatchdogConfig
+from .recorder import RecorderConfig
+from .haar_cascade_detector import HaarCascadeDetectorConfig, MultiCascadeDetectorConfig
+from .hog_detector import HogPeopleDetectorConfig
+from .simple_motion_detector import SimpleMotionDetectorConfig
+from .dnn_detector import DnnDetectorConfig
+from .action import ActionConfig
+from .event_store import EventStoreConfig
+from .governor import GovernorConfig
+from .idle_monitor import IdleMonitorConfig
+from .illumination import IlluminationMonitorConfig
+from .detection_cache import DetectionCacheConfig
+from .tiled_detector import TilingConfig
+from .nms import FusionConfig
+from .black_box import BlackBoxConfig
+from .publisher import PublisherConfig
+from .profiler import ProfilingConfig
+from .scheduler import SchedulerConfig
+
+
+def cast_string_to_float(s):
+    try:
+        return float(s)
+    except ValueError:
+        return None
+
+
+def cast_string_to_int(s):
+    try:
+        return int(s)
+    except ValueError:
+        return None
+
+
+def cast_string_to_bool(s):
+    if (s.lower() == 'true' or
+        s.lower() == '1' or
+        s.lower() == 'on'):
+        return True
+    elif (s.lower() == 'false' or
+          s.lower() == '0' or
+          s.lower() == 'off'):
+        return False
+    else:
+        return None
+
+
+def cast_string_to_tuple(s):
+    try:
+        return ast.literal_eval(s)
+    except ValueError:
+        return None
+
+
+class ConfigException(Exception):
+
+    pass
+
+
+# The configuration of opencv-home-cam.
+# The config file is parsed into the config named tuples of all
+# components. No component objects (cameras, detectors etc.) are created.
+class HomeCamConfig:
+
+    def __init__(self, config_file):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._cp = configparser.ConfigParser()
+        self._cp.read(config_file)
+
+        self._read_cameras()
+        self._read_recorders()
+        self._read_detectors()
+        self._read_actions()
+        self._read_event_store()
+        self._read_preview()
+        self._read_governor()
+        self._read_idle_monitor()
+        self._read_illumination()
+        self._read_detection_cache()
+        self._read_fusion()
+        self._read_black_box()
+        self._read_publisher()
+        self._read_watchdog()
+        self._read_profiling()
+        self._read_scheduler()
+
+    # Returns a list of CameraConfigs
+    def get_cameras(self):
+
+        return self._cameras
+
+    # Returns a dict of RecorderConfigs (section name is the dict key)
+    def get_recorders(self):
+
+        return self._recorders
+
+    # Returns a dict of detector configs (section name is the dict key)
+    def get_detectors(self):
+
+        return self._detectors
+
+    # Returns a dict of (include polygons, exclude polygons) tuples
+    # (detector section name is the dict key)
+    def get_detector_zones(self):
+
+        return self._detector_zones
+
+    # Returns a dict of TilingConfigs (detector section name is the dict
+    # key). Detectors without tiling are not in the dict.
+    def get_detector_tilings(self):
+
+        return self._detector_tilings
+
+    # Returns a dict of non-maximum suppression IoU thresholds (detector
+    # section name is the dict key). Detectors without non-maximum
+    # suppression are not in the dict.
+    def get_detector_nms_thresholds(self):
+
+        return self._detector_nms_thresholds
+
+    # Returns a dict of detection scheduler priority classes (detector
+    # section name is the dict key). Detectors without a priority are not in
+    # the dict.
+    def get_detector_priorities(self):
+
+        return self._detector_priorities
+
+    # Returns a list of ActionConfigs
+    def get_actions(self):
+
+        return self._actions
+
+    # The getters below return None if the corresponding section is missing
+
+    def get_event_store(self):
+
+        return self._event_store_cfg
+
+    def get_preview(self):
+
+        return self._preview_cfg
+
+    def get_governor(self):
+
+        return self._governor_cfg
+
+    def get_idle_monitor(self):
+
+        return self._idle_monitor_cfg
+
+    def get_illumination(self):
+
+        return self._illumination_cfg
+
+    def get_detection_cache(self):
+
+        return self._detection_cache_cfg
+
+    def get_fusion(self):
+
+        return self._fusion_cfg
+
+    def get_black_box(self):
+
+        return self._black_box_cfg
+
+    def get_publisher(self):
+
+        return self._publisher_cfg
+
+    def get_watchdog(self):
+
+        return self._watchdog_cfg
+
+    def get_scheduler(self):
+
+        return self._scheduler_cfg
+
+    # Profiling is always available, so this getter never returns None
+    def get_profiling(self):
+
+        return self._profiling_cfg
+
+    def _read_cameras(self):
+
+        camera_nbr = 0
+        self._cameras = []
+
+        while True:
+            camera_section = 'camera' + str(camera_nbr)
+            if camera_section not in self._cp:
+                break
+
+            camera_cfg = self._read_camera_config(camera_section)
+            if camera_cfg is None:
+                break
+
+            self._cameras.append(camera_cfg)
+
+            camera_nbr += 1
+
+    def _read_recorders(self):
+
+        recorder_nbr = 0
+        self._recorders = {}
+
+        while True:
+            recorder_section = 'recorder' + str(recorder_nbr)
+            if recorder_section not in self._cp:
+                break
+
+            recorder_cfg = self._read_recorder_config(recorder_section)
+            if recorder_cfg is None:
+                break
+
+            self._recorders[recorder_section] = recorder_cfg
+
+            recorder_nbr += 1
+
+    def _read_actions(self):
+
+        action_nbr = 0
+        self._actions = []
+
+        while True:
+            action_section = 'action' + str(action_nbr)
+            if action_section not in self._cp:
+                break
+
+            action_cfg = self._read_action_config(action_section)
+            if action_cfg is None:
+                break
+
+            self._actions.append(action_cfg)
+
+            action_nbr += 1
+
+    def _read_detectors(self):
+
+        detector_nbr = 0
+        self._detectors = {}
+        self._detector_zones = {}
+        self._detector_tilings = {}
+        self._detector_nms_thresholds = {}
+        self._detector_priorities = {}
+
+        while True:
+            detector_section = 'detector' + str(detector_nbr)
+            if detector_section not in self._cp:
+                break
+
+            detector_cfg = self._read_detector_config(detector_section)
+            if detector_cfg is None:
+                break
+
+            self._detectors[detector_section] = detector_cfg
+            self._detector_zones[detector_section] = self._read_zones(detector_section)
+            tiling_cfg = self._read_tiling_config(detector_section)
+            if tiling_cfg is not None:
+                self._detector_tilings[detector_section] = tiling_cfg
+            if 'nms_threshold' in self._cp[detector_section]:
+                nms_threshold = cast_string_to_float(self._cp[detector_section]['nms_threshold'])
+                if nms_threshold is None:
+                    raise ConfigException("Config: bad nms_threshold value!")
+                self._detector_nms_thresholds[detector_section] = nms_threshold
+            if 'priority' in self._cp[detector_section]:
+                priority = cast_string_to_int(self._cp[detector_section]['priority'])
+                if priority is None or priority < 0:
+                    raise ConfigException("Config: bad priority value!")
+                self._detector_priorities[detector_section] = priority
+
+            detector_nbr += 1
+
+    def _read_event_store(self):
+
+        if 'event_store' not in self._cp:
+            self._event_store_cfg = None
+            return
+
+        event_store_cfg = self._cp['event_store']
+
+        if 'db_path' in event_store_cfg:
+            db_path = event_store_cfg['db_path']
+            if db_path is None:
+                raise ConfigException("Config: bad db_path value!")
+        else:
+            raise ConfigException("Config: Missing db_path value!")
+
+        if 'batch_size' in event_store_cfg:
+            batch_size = cast_string_to_int(event_store_cfg['batch_size'])
+            if batch_size is None:
+                raise ConfigException("Config: bad batch_size value!")
+        else:
+            batch_size = 100
+            self._logger.info("Config: Missing batch_size value, using default")
+
+        if 'flush_interval' in event_store_cfg:
+            flush_interval = cast_string_to_float(event_store_cfg['flush_interval'])
+            if flush_interval is None:
+                raise ConfigException("Config: bad flush_interval value!")
+        else:
+            flush_interval = 1.0
+            self._logger.info("Config: Missing flush_interval value, using default")
+
+        self._event_store_cfg = EventStoreConfig(db_path=db_path,
+                                                 batch_size=batch_size,
+                                                 flush_interval=flush_interval)
+
+    def _read_preview(self):
+
+        if 'preview' not in self._cp:
+            self._preview_cfg = None
+            return
+
+        # Not imported at module level, so http.server is only loaded when
+        # the preview is configured
+        from .preview_server import PreviewServerConfig
+
+        preview_cfg = self._cp['preview']
+
+        if 'address' in preview_cfg:
+            address = preview_cfg['address']
+            if address is None:
+                raise ConfigException("Config: bad address value!")
+        else:
+            address = '127.0.0.1'
+            self._logger.info("Config: Missing address value, using default")
+
+        if 'port' in preview_cfg:
+            port = cast_string_to_int(preview_cfg['port'])
+            if port is None:
+                raise ConfigException("Config: bad port value!")
+        else:
+            port = 8080
+            self._logger.info("Config: Missing port value, using default")
+
+        if 'fps' in preview_cfg:
+            fps = cast_string_to_float(preview_cfg['fps'])
+            if fps is None or fps <= 0.0:
+                raise ConfigException("Config: bad preview fps value!")
+        else:
+            fps = 2.0
+            self._logger.info("Config: Missing preview fps value, using default")
+
+        if 'jpeg_quality' in preview_cfg:
+            jpeg_quality = cast_string_to_int(preview_cfg['jpeg_quality'])
+            if jpeg_quality is None:
+                raise ConfigException("Config: bad jpeg_quality value!")
+        else:
+            jpeg_quality = 80
+            self._logger.info("Config: Missing jpeg_quality value, using default")
+
+        if 'client_timeout' in preview_cfg:
+            client_timeout = cast_string_to_float(preview_cfg['client_timeout'])
+            if client_timeout is None:
+                raise ConfigException("Config: bad client_timeout value!")
+        else:
+            client_timeout = 5.0
+            self._logger.info("Config: Missing client_timeout value, using default")
+
+        self._preview_cfg = PreviewServerConfig(address=address,
+                                                port=port,
+                                                fps=fps,
+                                                jpeg_quality=jpeg_quality,
+                                                client_timeout=client_timeout)
+
+    def _read_governor(self):
+
+        if 'governor' not in self._cp:
+            self._governor_cfg = None
+            return
+
+        governor_cfg = self._cp['governor']
+
+        if 'high_watermark' in governor_cfg:
+            high_watermark = cast_string_to_float(governor_cfg['high_watermark'])
+            if high_watermark is None:
+                raise ConfigException("Config: bad high_watermark value!")
+        else:
+            high_watermark = 1.0
+            self._logger.info("Config: Missing high_watermark value, using default")
+
+        if 'low_watermark' in governor_cfg:
+            low_watermark = cast_string_to_float(governor_cfg['low_watermark'])
+            if low_watermark is None:
+                raise ConfigException("Config: bad low_watermark value!")
+        else:
+            low_watermark = 0.6
+            self._logger.info("Config: Missing low_watermark value, using default")
+
+        if low_watermark >= high_watermark:
+            raise ConfigException("Config: low_watermark must be less than high_watermark!")
+
+        if 'window' in governor_cfg:
+            window = cast_string_to_int(governor_cfg['window'])
+            if window is None or window < 1:
+                raise ConfigException("Config: bad window value!")
+        else:
+            window = 10
+            self._logger.info("Config: Missing window value, using default")
+
+        self._governor_cfg = GovernorConfig(high_watermark=high_watermark,
+                                            low_watermark=low_watermark,
+                                            window=window)
+
+    def _read_idle_monitor(self):
+
+        if 'idle' not in self._cp:
+            self._idle_monitor_cfg = None
+            return
+
+        idle_cfg = self._cp['idle']
+
+        if 'quiet_period' in idle_cfg:
+            quiet_period = cast_string_to_float(idle_cfg['quiet_period'])
+            if quiet_period is None:
+                raise ConfigException("Config: bad quiet_period value!")
+        else:
+            quiet_period = 60.0
+            self._logger.info("Config: Missing quiet_period value, using default")
+
+        if 'idle_fps' in idle_cfg:
+            idle_fps = cast_string_to_float(idle_cfg['idle_fps'])
+            if idle_fps is None or idle_fps <= 0.0:
+                raise ConfigException("Config: bad idle_fps value!")
+        else:
+            idle_fps = 1.0
+            self._logger.info("Config: Missing idle_fps value, using default")
+
+        if 'motion_threshold' in idle_cfg:
+            motion_threshold = cast_string_to_float(idle_cfg['motion_threshold'])
+            if motion_threshold is None:
+                raise ConfigException("Config: bad motion_threshold value!")
+        else:
+            motion_threshold = 1.0
+            self._logger.info("Config: Missing motion_threshold value, using default")
+
+        if 'pixel_threshold' in idle_cfg:
+            pixel_threshold = cast_string_to_int(idle_cfg['pixel_threshold'])
+            if pixel_threshold is None:
+                raise ConfigException("Config: bad pixel_threshold value!")
+        else:
+            pixel_threshold = 25
+            self._logger.info("Config: Missing pixel_threshold value, using default")
+
+        if 'thumbnail_width' in idle_cfg:
+            thumbnail_width = cast_string_to_int(idle_cfg['thumbnail_width'])
+            if thumbnail_width is None or thumbnail_width < 1:
+                raise ConfigException("Config: bad thumbnail_width value!")
+        else:
+            thumbnail_width = 80
+            self._logger.info("Config: Missing thumbnail_width value, using default")
+
+        self._idle_monitor_cfg = IdleMonitorConfig(quiet_period=quiet_period,
+                                                   idle_fps=idle_fps,
+                                                   motion_threshold=motion_threshold,
+                                                   pixel_threshold=pixel_threshold,
+                                                   thumbnail_width=thumbnail_width)
+
+    def _read_illumination(self):
+
+        if 'illumination' not in self._cp:
+            self._illumination_cfg = None
+            return
+
+        illumination_cfg = self._cp['illumination']
+
+        if 'thumbnail_width' in illumination_cfg:
+            thumbnail_width = cast_string_to_int(illumination_cfg['thumbnail_width'])
+            if thumbnail_width is None or thumbnail_width < 1:
+                raise ConfigException("Config: bad thumbnail_width value!")
+        else:
+            thumbnail_width = 32
+            self._logger.info("Config: Missing thumbnail_width value, using default")
+
+        if 'mean_threshold' in illumination_cfg:
+            mean_threshold = cast_string_to_float(illumination_cfg['mean_threshold'])
+            if mean_threshold is None or mean_threshold < 0.0:
+                raise ConfigException("Config: bad mean_threshold value!")
+        else:
+            mean_threshold = 20.0
+            self._logger.info("Config: Missing mean_threshold value, using default")
+
+        if 'histogram_threshold' in illumination_cfg:
+            histogram_threshold = cast_string_to_float(illumination_cfg['histogram_threshold'])
+            if histogram_threshold is None or not 0.0 <= histogram_threshold <= 1.0:
+                raise ConfigException("Config: bad histogram_threshold value!")
+        else:
+            histogram_threshold = 0.3
+            self._logger.info("Config: Missing histogram_threshold value, using default")
+
+        if 'suppress_time' in illumination_cfg:
+            suppress_time = cast_string_to_float(illumination_cfg['suppress_time'])
+            if suppress_time is None or suppress_time < 0.0:
+                raise ConfigException("Config: bad suppress_time value!")
+        else:
+            suppress_time = 2.0
+            self._logger.info("Config: Missing suppress_time value, using default")
+
+        self._illumination_cfg = IlluminationMonitorConfig(thumbnail_width=thumbnail_width,
+                                                           mean_threshold=mean_threshold,
+                                                           histogram_threshold=histogram_threshold,
+                                                           suppress_time=suppress_time)
+
+    def _read_detection_cache(self):
+
+        if 'detection_cache' not in self._cp:
+            self._detection_cache_cfg = None
+            return
+
+        detection_cache_cfg = self._cp['detection_cache']
+
+        if 'thumbnail_width' in detection_cache_cfg:
+            thumbnail_width = cast_string_to_int(detection_cache_cfg['thumbnail_width'])
+            if thumbnail_width is None or thumbnail_width < 1:
+                raise ConfigException("Config: bad thumbnail_width value!")
+        else:
+            thumbnail_width = 32
+            self._logger.info("Config: Missing thumbnail_width value, using default")
+
+        if 'pixel_threshold' in detection_cache_cfg:
+            pixel_threshold = cast_string_to_int(detection_cache_cfg['pixel_threshold'])
+            if pixel_threshold is None or not 0 <= pixel_threshold <= 255:
+                raise ConfigException("Config: bad pixel_threshold value!")
+        else:
+            pixel_threshold = 8
+            self._logger.info("Config: Missing pixel_threshold value, using default")
+
+        if 'changed_threshold' in detection_cache_cfg:
+            changed_threshold = cast_string_to_float(detection_cache_cfg['changed_threshold'])
+            if changed_threshold is None or not 0.0 <= changed_threshold <= 100.0:
+                raise ConfigException("Config: bad changed_threshold value!")
+        else:
+            changed_threshold = 0.5
+            self._logger.info("Config: Missing changed_threshold value, using default")
+
+        if 'max_age' in detection_cache_cfg:
+            max_age = cast_string_to_float(detection_cache_cfg['max_age'])
+            if max_age is None or max_age < 0.0:
+                raise ConfigException("Config: bad max_age value!")
+        else:
+            max_age = 5.0
+            self._logger.info("Config: Missing max_age value, using default")
+
+        self._detection_cache_cfg = DetectionCacheConfig(thumbnail_width=thumbnail_width,
+                                                         pixel_threshold=pixel_threshold,
+                                                         changed_threshold=changed_threshold,
+                                                         max_age=max_age)
+
+    def _read_fusion(self):
+
+        if 'fusion' not in self._cp:
+            self._fusion_cfg = None
+            return
+
+        fusion_cfg = self._cp['fusion']
+
+        detectors = []
+        if 'detectors' in fusion_cfg:
+            for detector in fusion_cfg['detectors'].split(","):
+                detector = detector.strip()
+                if detector not in self._cp:
+                    raise ConfigException("Config: fusion: Missing section for detector {} in config file!".format(detector))
+                detectors.append(detector)
+        if len(detectors) < 2:
+            raise ConfigException("Config: fusion: at least two detectors must be fused!")
+
+        if 'iou_threshold' in fusion_cfg:
+            iou_threshold = cast_string_to_float(fusion_cfg['iou_threshold'])
+            if iou_threshold is None:
+                raise ConfigException("Config: bad iou_threshold value!")
+        else:
+            iou_threshold = 0.5
+            self._logger.info("Config: Missing iou_threshold value, using default")
+
+        self._fusion_cfg = FusionConfig(detectors=detectors,
+                                        iou_threshold=iou_threshold)
+
+    def _read_black_box(self):
+
+        if 'black_box' not in self._cp:
+            self._black_box_cfg = None
+            return
+
+        black_box_cfg = self._cp['black_box']
+
+        if 'path' in black_box_cfg:
+            path = black_box_cfg['path']
+            if path is None:
+                raise ConfigException("Config: bad path value!")
+        else:
+            raise ConfigException("Config: Missing path value!")
+
+        if 'duration' in black_box_cfg:
+            duration = cast_string_to_float(black_box_cfg['duration'])
+            if duration is None or duration <= 0.0:
+                raise ConfigException("Config: bad duration value!")
+        else:
+            duration = 10.0
+            self._logger.info("Config: Missing duration value, using default")
+
+        if 'slot_size' in black_box_cfg:
+            slot_size = cast_string_to_int(black_box_cfg['slot_size'])
+            if slot_size is None or slot_size < 1024:
+                raise ConfigException("Config: bad slot_size value!")
+        else:
+            slot_size = 65536
+            self._logger.info("Config: Missing slot_size value, using default")
+
+        if 'jpeg_quality' in black_box_cfg:
+            jpeg_quality = cast_string_to_int(black_box_cfg['jpeg_quality'])
+            if jpeg_quality is None or jpeg_quality < 0 or jpeg_quality > 100:
+                raise ConfigException("Config: bad jpeg_quality value!")
+        else:
+            jpeg_quality = 70
+            self._logger.info("Config: Missing jpeg_quality value, using default")
+
+        if 'sync_interval' in black_box_cfg:
+            sync_interval = cast_string_to_float(black_box_cfg['sync_interval'])
+            if sync_interval is None:
+                raise ConfigException("Config: bad sync_interval value!")
+        else:
+            sync_interval = 0.0
+            self._logger.info("Config: Missing sync_interval value, using default")
+
+        self._black_box_cfg = BlackBoxConfig(path=path,
+                                             duration=duration,
+                                             slot_size=slot_size,
+                                             jpeg_quality=jpeg_quality,
+                                             sync_interval=sync_interval)
+
+    def _read_publisher(self):
+
+        if 'publisher' not in self._cp:
+            self._publisher_cfg = None
+            return
+
+        publisher_cfg = self._cp['publisher']
+
+        if 'socket_path' in publisher_cfg:
+            socket_path = publisher_cfg['socket_path']
+            if socket_path is None:
+                raise ConfigException("Config: bad socket_path value!")
+        else:
+            raise ConfigException("Config: Missing socket_path value!")
+
+        if 'max_buffer' in publisher_cfg:
+            max_buffer = cast_string_to_int(publisher_cfg['max_buffer'])
+            if max_buffer is None or max_buffer < 0:
+                raise ConfigException("Config: bad max_buffer value!")
+        else:
+            max_buffer = 1048576
+            self._logger.info("Config: Missing max_buffer value, using default")
+
+        self._publisher_cfg = PublisherConfig(socket_path=socket_path,
+                                              max_buffer=max_buffer)
+
+    def _read_watchdog(self):
+
+        if 'watchdog' not in self._cp:
+            self._watchdog_cfg = None
+            return
+
+        watchdog_cfg = self._cp['watchdog']
+
+        if 'max_failures' in watchdog_cfg:
+            max_failures = cast_string_to_int(watchdog_cfg['max_failures'])
+            if max_failures is None or max_failures < 1:
+                raise ConfigException("Config: bad max_failures value!")
+        else:
+            max_failures = 10
+            self._logger.info("Config: Missing max_failures value, using default")
+
+        if 'frozen_frames' in watchdog_cfg:
+            frozen_frames = cast_string_to_int(watchdog_cfg['frozen_frames'])
+            if frozen_frames is None or frozen_frames < 0:
+                raise ConfigException("Config: bad frozen_frames value!")
+        else:
+            frozen_frames = 0
+            self._logger.info("Config: Missing frozen_frames value, using default")
+
+        if 'max_read_time' in watchdog_cfg:
+            max_read_time = cast_string_to_float(watchdog_cfg['max_read_time'])
+            if max_read_time is None or max_read_time <= 0.0:
+                raise ConfigException("Config: bad max_read_time value!")
+        else:
+            max_read_time = 2.0
+            self._logger.info("Config: Missing max_read_time value, using default")
+
+        if 'min_backoff' in watchdog_cfg:
+            min_backoff = cast_string_to_float(watchdog_cfg['min_backoff'])
+            if min_backoff is None or min_backoff <= 0.0:
+                raise ConfigException("Config: bad min_backoff value!")
+        else:
+            min_backoff = 1.0
+            self._logger.info("Config: Missing min_backoff value, using default")
+
+        if 'max_backoff' in watchdog_cfg:
+            max_backoff = cast_string_to_float(watchdog_cfg['max_backoff'])
+            if max_backoff is None or max_backoff < min_backoff:
+                raise ConfigException("Config: bad max_backoff value!")
+        else:
+            max_backoff = max(60.0, min_backoff)
+            self._logger.info("Config: Missing max_backoff value, using default")
+
+        self._watchdog_cfg = CameraWatchdogConfig(max_failures=max_failures,
+                                                  frozen_frames=frozen_frames,
+                                                  max_read_time=max_read_time,
+                                                  min_backoff=min_backoff,
+                                                  max_backoff=max_backoff)
+
+    def _read_scheduler(self):
+
+        if 'scheduler' not in self._cp:
+            self._scheduler_cfg = None
+            return
+
+        scheduler_cfg = self._cp['scheduler']
+
+        if 'workers' in scheduler_cfg:
+            workers = cast_string_to_int(scheduler_cfg['workers'])
+            if workers is None or workers < 1:
+                raise ConfigException("Config: bad workers value!")
+        else:
+            workers = os.cpu_count() or 1
+            self._logger.info("Config: Missing workers value, using default")
+
+        if 'max_queue_time' in scheduler_cfg:
+            max_queue_time = cast_string_to_float(scheduler_cfg['max_queue_time'])
+            if max_queue_time is None or max_queue_time <= 0.0:
+                raise ConfigException("Config: bad max_queue_time value!")
+        else:
+            max_queue_time = 0.2
+            self._logger.info("Config: Missing max_queue_time value, using default")
+
+        self._scheduler_cfg = SchedulerConfig(workers=workers,
+                                              max_queue_time=max_queue_time)
+
+    def _read_profiling(self):
+
+        # All options have defaults, and the section is optional
+        if 'profiling' in self._cp:
+            profiling_cfg = self._cp['profiling']
+        else:
+            profiling_cfg = {}
+
+        if 'report_dir' in profiling_cfg:
+            report_dir = profiling_cfg['report_dir']
+            if report_dir is None:
+                raise ConfigException("Config: bad report_dir value!")
+        else:
+            report_dir = tempfile.gettempdir()
+
+        if 'duration' in profiling_cfg:
+            duration = cast_string_to_float(profiling_cfg['duration'])
+            if duration is None or duration <= 0.0:
+                raise ConfigException("Config: bad duration value!")
+        else:
+            duration = 30.0
+
+        if 'top' in profiling_cfg:
+            top = cast_string_to_int(profiling_cfg['top'])
+            if top is None or top < 1:
+                raise ConfigException("Config: bad top value!")
+        else:
+            top = 25
+
+        self._profiling_cfg = ProfilingConfig(report_dir=report_dir,
+                                              duration=duration,
+                                              top=top)
+
+    # Read the (optional) include and exclude zones of a camera or detector
+    # section.
+    # Returns an (include polygons, exclude polygons) tuple.
+    def _read_zones(self, section):
+
+        cfg = self._cp[section]
+        zones = []
+        for option in ['include_zones', 'exclude_zones']:
+            polygons = []
+            if option in cfg:
+                polygons = cast_string_to_tuple(cfg[option])
+                if polygons is None or not isinstance(polygons, (list, tuple)):
+                    raise ConfigException("Config: {}: bad {} value!".format(section, option))
+                for polygon in polygons:
+                    if len(polygon) < 3:
+                        raise ConfigException("Config: {}: {}: a polygon must have at least 3 points!".format(section, option))
+                    for point in polygon:
+                        if (len(point) != 2 or
+                            not 0.0 <= point[0] <= 1.0 or
+                            not 0.0 <= point[1] <= 1.0):
+                            raise ConfigException("Config: {}: {}: bad point {}!".format(section, option, point))
+            zones.append(list(polygons))
+        return tuple(zones)
+
+    # Read the (optional) tiling options of a detector.
+    # Returns None if the detector does not use tiling.
+    def _read_tiling_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'tile_size' not in detection_cfg:
+            return None
+
+        tile_size = cast_string_to_tuple(detection_cfg['tile_size'])
+        if tile_size is None or len(tile_size) != 2:
+            raise ConfigException("Config: bad tile_size value!")
+
+        if 'tile_overlap' in detection_cfg:
+            overlap = cast_string_to_int(detection_cfg['tile_overlap'])
+            if overlap is None or overlap >= min(tile_size):
+                raise ConfigException("Config: bad tile_overlap value!")
+        else:
+            overlap = min(tile_size) // 4
+            self._logger.info("Config: Missing tile_overlap value, using default")
+
+        if 'tile_workers' in detection_cfg:
+            workers = cast_string_to_int(detection_cfg['tile_workers'])
+            if workers is None or workers < 1:
+                raise ConfigException("Config: bad tile_workers value!")
+        else:
+            workers = 4
+            self._logger.info("Config: Missing tile_workers value, using default")
+
+        if 'tile_iou_threshold' in detection_cfg:
+            iou_threshold = cast_string_to_float(detection_cfg['tile_iou_threshold'])
+            if iou_threshold is None:
+                raise ConfigException("Config: bad tile_iou_threshold value!")
+        else:
+            iou_threshold = 0.5
+            self._logger.info("Config: Missing tile_iou_threshold value, using default")
+
+        return TilingConfig(tile_size=tile_size,
+                            overlap=overlap,
+                            workers=workers,
+                            iou_threshold=iou_threshold)
+
+    # Read the (optional) parameter ladder of a detector.
+    # The ladder is a list of dicts with parameter names (any of
+    # valid_parameters) as keys.
+    def _read_parameter_ladder(self, detector_section, valid_parameters):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'parameter_ladder' not in detection_cfg:
+            return []
+
+        ladder = cast_string_to_tuple(detection_cfg['parameter_ladder'])
+        if ladder is None or not isinstance(ladder, (list, tuple)):
+            raise ConfigException("Config: bad parameter_ladder value!")
+
+        for step in ladder:
+            if not isinstance(step, dict):
+                raise ConfigException("Config: bad parameter_ladder value!")
+            for parameter in step:
+                if parameter not in valid_parameters:
+                    raise ConfigException("Config: {}: invalid parameter_ladder parameter: {}!".format(detector_section, parameter))
+
+        return list(ladder)
+
+    def _read_recorder_config(self, recorder_section):
+
+        rec_cfg = self._cp[recorder_section]
+
+        if 'file_limit' in rec_cfg:
+            file_limit = cast_string_to_int(rec_cfg['file_limit'])
+            if file_limit is None:
+                raise ConfigException("Config: bad file_limit value!")
+        else:
+            file_limit = 10
+            self._logger.info("Config: Missing file_limit value, using default")
+
+        if 'time_limit' in rec_cfg:
+            time_limit = cast_string_to_int(rec_cfg['time_limit'])
+            if time_limit is None:
+                raise ConfigException("Config: bad time_limit value!")
+        else:
+            time_limit = 60
+            self._logger.info("Config: Missing time_limit value, using default")
+
+        if 'recording_dir' in rec_cfg:
+            recording_dir = rec_cfg['recording_dir']
+            if recording_dir is None:
+                raise ConfigException("Config: Bad output directory path!")
+        else:
+            raise ConfigException("Config: Missing recording_dir value!")
+
+        if 'recording_file_base' in rec_cfg:
+            recording_file_base = rec_cfg['recording_file_base']
+            if recording_file_base is None:
+                raise ConfigException("Config: Bad output file base!")
+        else:
+            raise ConfigException("Config: Missing recording_file_base value!")
+
+        if 'draw_rectangles' in rec_cfg:
+            draw_rectangles = cast_string_to_bool(rec_cfg['draw_rectangles'])
+            if draw_rectangles is None:
+                raise ConfigException("Config: bad draw_rectangles value!")
+        else:
+            draw_rectangles = True
+            self._logger.info("Config: Missing draw_rectangles value, using default")
+
+        if 'fourcc' in rec_cfg:
+            fourcc = rec_cfg['fourcc']
+            if fourcc is None or len(fourcc) != 4:
+                raise ConfigException("Config: bad fourcc value!")
+        else:
+            fourcc = 'mjpa'
+            self._logger.info("Config: Missing fourcc value, using default")
+
+        if 'container' in rec_cfg:
+            container = rec_cfg['container']
+            if container is None:
+                raise ConfigException("Config: bad container value!")
+            container = container.lstrip('.')
+        else:
+            container = 'avi'
+            self._logger.info("Config: Missing container value, using default")
+
+        if 'quality' in rec_cfg:
+            quality = cast_string_to_float(rec_cfg['quality'])
+            if quality is None:
+                raise ConfigException("Config: bad quality value!")
+        else:
+            quality = None
+
+        recorder_config = RecorderConfig(file_limit=file_limit,
+                                         time_limit=time_limit,
+                                         directory=recording_dir,
+                                         file_base=recording_file_base,
+                                         draw_rectangles=draw_rectangles,
+                                         fourcc=fourcc,
+                                         container=container,
+                                         quality=quality)
+        return recorder_config
+
+    def _read_camera_config(self, camera_section):
+
+        camera_cfg = self._cp[camera_section]
+
+        if 'id' in camera_cfg:
+            cam_id = camera_cfg['id']
+            if cam_id is None:
+                raise ConfigException("Config: bad cam_id value!")
+        else:
+            cam_id = 0
+            self._logger.info("Config: Missing cam_id value, using default")
+
+        if 'fps' in camera_cfg:
+            fps = cast_string_to_float(camera_cfg['fps'])
+            if fps is None:
+                raise ConfigException("Config: bad fps value!")
+        else:
+            fps = 20.0
+            self._logger.info("Config: Missing fps value, using default")
+
+        if 'recorder' in camera_cfg:
+            recorder = camera_cfg['recorder']
+            if recorder is None:
+                raise ConfigException("Config: bad recorder!")
+            if recorder not in self._cp:
+                raise ConfigException("Config: {}: Missing section for {} in config file!".format(camera_section, recorder))
+        else:
+            recorder = None
+            self._logger.info("Config: No recorders for {}".format(camera_section))
+
+        detectors = []
+        if 'detectors' in camera_cfg:
+            detectors_str = camera_cfg['detectors']
+            if detectors_str is None:
+                raise ConfigException("Config: bad detectors!")
+            detectors_str_a = detectors_str.split(",")
+            for detector in detectors_str_a:
+                # Make sure the detector exists in the config file
+                if detector not in self._cp:
+                    raise ConfigException("Config: {}: Missing section for detector {} in config file!".format(camera_section, detector))
+                detectors.append(detector)
+        else:
+            self._logger.info("Missing detectors for {}".format(camera_section))
+            self._logger.info("No object detection will be performed for this camera.")
+
+        if 'max_width' in camera_cfg:
+            max_width = cast_string_to_int(camera_cfg['max_width'])
+            if max_width is None:
+                raise ConfigException("Config: bad max_width value!")
+        else:
+            max_width = 400
+            self._logger.info("Config: Missing max_width value, using default")
+
+        if 'priority' in camera_cfg:
+            priority = cast_string_to_int(camera_cfg['priority'])
+            if priority is None or priority < 0:
+                raise ConfigException("Config: bad priority value!")
+        else:
+            priority = 0
+
+        if 'timelapse' in camera_cfg:
+            timelapse = camera_cfg['timelapse']
+            if timelapse is None:
+                raise ConfigException("Config: bad timelapse!")
+            if timelapse not in self._cp:
+                raise ConfigException("Config: {}: Missing section for {} in config file!".format(camera_section, timelapse))
+            if timelapse == recorder:
+                raise ConfigException("Config: {}: the timelapse can't use the event recorder!".format(camera_section))
+        else:
+            timelapse = None
+
+        if 'timelapse_interval' in camera_cfg:
+            timelapse_interval = cast_string_to_float(camera_cfg['timelapse_interval'])
+            if timelapse_interval is None or timelapse_interval <= 0.0:
+                raise ConfigException("Config: bad timelapse_interval value!")
+        else:
+            timelapse_interval = 10.0
+            if timelapse is not None:
+                self._logger.info("Config: Missing timelapse_interval value, using default")
+
+        (include_zones, exclude_zones) = self._read_zones(camera_section)
+
+        camera_config = CameraConfig(cam_id=cam_id,
+                                     fps=fps,
+                                     recorder=recorder,
+                                     detectors=detectors,
+                                     max_width=max_width,
+                                     include_zones=include_zones,
+                                     exclude_zones=exclude_zones,
+                                     priority=priority,
+                                     timelapse=timelapse,
+                                     timelapse_interval=timelapse_interval)
+        return camera_config
+
+    def _read_detector_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'detector_type' in detection_cfg:
+            detector_type = detection_cfg['detector_type']
+            if detector_type is None:
+                raise ConfigException("Config: bad detector_type value!")
+            if (detector_type.lower() == 'haar'):
+                return self._read_haar_cascade_detector_config(detector_section)
+            elif (detector_type.lower() == 'haar-multi'):
+                return self._read_multi_cascade_detector_config(detector_section)
+            elif (detector_type.lower() == 'hog-people'):
+                return self._read_hog_people_detector_config(detector_section)
+            elif (detector_type.lower() == 'simple-motion'):
+                return self._read_simple_motion_detector_config(detector_section)
+            elif (detector_type.lower() == 'dnn'):
+                return self._read_dnn_detector_config(detector_section)
+            else:
+                raise ConfigException("Config: invalid detector_type: {}!".format(detector_type))
+        else:
+            raise ConfigException("Config: Missing detector_type for {}!".format(detector_section))
+
+    def _read_haar_cascade_detector_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'cascade' in detection_cfg:
+            cascade_str = detection_cfg['cascade']
+            if cascade_str is None:
+                raise ConfigException("Config: bad cascade!")
+        else:
+            raise ConfigException("Config: Missing cascade file!")
+
+        if 'scale_factor' in detection_cfg:
+            scale_factor = cast_string_to_float(detection_cfg['scale_factor'])
+            if scale_factor is None:
+                raise ConfigException("Config: bad scale_factor value!")
+        else:
+            scale_factor = 1.1
+            self._logger.info("Config: Missing scale_factor value, using default")
+
+        if 'min_neighbours' in detection_cfg:
+            min_neighbours = cast_string_to_int(detection_cfg['min_neighbours'])
+            if min_neighbours is None:
+                raise ConfigException("Config: bad min_neighbours value!")
+        else:
+            min_neighbours = 3
+            self._logger.info("Config: Missing min_neighbours value, using default")
+
+        if 'size' in detection_cfg:
+            min_size = cast_string_to_int(detection_cfg['size'])
+            if min_size is None:
+                raise ConfigException("Config: bad size value!")
+        else:
+            min_size = 3
+            self._logger.info("Config: Missing size value, using default")
+
+        parameter_ladder = self._read_parameter_ladder(detector_section,
+                                                       ['scale_factor',
+                                                        'min_neighbours',
+                                                        'min_size',
+                                                        'detection_scale'])
+
+        detector_config = HaarCascadeDetectorConfig(scale_factor=scale_factor,
+                                                    min_neighbours=min_neighbours,
+                                                    min_size=min_size,
+                                                    cascade_file=cascade_str,
+                                                    parameter_ladder=parameter_ladder)
+        return detector_config
+
+    def _read_multi_cascade_detector_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        cascades = []
+        if 'cascades' in detection_cfg:
+            for cascade_section in detection_cfg['cascades'].split(","):
+                cascade_section = cascade_section.strip()
+                if cascade_section not in self._cp:
+                    raise ConfigException("Config: {}: Missing section for detector {} in config file!".format(detector_section, cascade_section))
+                if self._cp[cascade_section].get('detector_type', '').lower() != 'haar':
+                    raise ConfigException("Config: {}: {} is not a haar detector!".format(detector_section, cascade_section))
+                # The cascades share the pyramid (and the parameters) of
+                # the multi detector
+                for option in ('parameter_ladder', 'tile_size'):
+                    if option in self._cp[cascade_section]:
+                        raise ConfigException("Config: {}: {} of {} is not supported, set it "
+                                              "on {}!".format(detector_section, option,
+                                                              cascade_section, detector_section))
+                cascades.append((cascade_section, self._read_haar_cascade_detector_config(cascade_section)))
+        if len(cascades) == 0:
+            raise ConfigException("Config: Missing cascades!")
+
+        if 'scale_factor' in detection_cfg:
+            scale_factor = cast_string_to_float(detection_cfg['scale_factor'])
+            if scale_factor is None or scale_factor <= 1.0:
+                raise ConfigException("Config: bad scale_factor value!")
+        else:
+            scale_factor = 1.1
+            self._logger.info("Config: Missing scale_factor value, using default")
+
+        if 'workers' in detection_cfg:
+            workers = cast_string_to_int(detection_cfg['workers'])
+            if workers is None or workers < 1:
+                raise ConfigException("Config: bad workers value!")
+        else:
+            workers = min(len(cascades), os.cpu_count() or 1)
+            self._logger.info("Config: Missing workers value, using default")
+
+        parameter_ladder = self._read_parameter_ladder(detector_section,
+                                                       ['scale_factor',
+                                                        'detection_scale'])
+
+        return MultiCascadeDetectorConfig(scale_factor=scale_factor,
+                                          workers=workers,
+                                          cascades=tuple(cascades),
+                                          parameter_ladder=parameter_ladder)
+
+    def _read_hog_people_detector_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'scale_factor' in detection_cfg:
+            scale_factor = cast_string_to_float(detection_cfg['scale_factor'])
+            if scale_factor is None:
+                raise ConfigException("Config: bad scale_factor value!")
+        else:
+            scale_factor = 1.05
+            self._logger.info("Config: Missing scale_factor value, using default")
+
+        if 'padding' in detection_cfg:
+            padding = cast_string_to_tuple(detection_cfg['padding'])
+            if padding is None:
+                raise ConfigException("Config: bad padding value!")
+        else:
+            padding = (8, 8)
+            self._logger.info("Config: Missing padding value, using default")
+
+        if 'win_stride' in detection_cfg:
+            win_stride = cast_string_to_tuple(detection_cfg['win_stride'])
+            if win_stride is None:
+                raise ConfigException("Config: bad win_stride value!")
+        else:
+            win_stride = (4, 4)
+            self._logger.info("Config: Missing win_stride value, using default")
+
+        parameter_ladder = self._read_parameter_ladder(detector_section,
+                                                       ['scale_factor',
+                                                        'padding',
+                                                        'win_stride',
+                                                        'detection_scale'])
+
+        detector_config = HogPeopleDetectorConfig(scale_factor=scale_factor,
+                                                  win_stride=win_stride,
+                                                  padding=padding,
+                                                  parameter_ladder=parameter_ladder)
+        return detector_config
+
+    def _read_simple_motion_detector_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'diff_threshold' in detection_cfg:
+            diff_threshold = cast_string_to_float(detection_cfg['diff_threshold'])
+            if diff_threshold is None:
+                raise ConfigException("Config: bad diff_threshold value!")
+        else:
+            diff_threshold = 5.0
+            self._logger.info("Config: Missing scale_factor value, using default")
+
+        if 'blurring_size' in detection_cfg:
+            blurring_size = cast_string_to_int(detection_cfg['blurring_size'])
+            if blurring_size is None:
+                raise ConfigException("Config: bad blurring_size value!")
+        else:
+            blurring_size = 21
+            self._logger.info("Config: Missing scale_factor value, using default")
+
+        if 'object_min_area' in detection_cfg:
+            object_min_area = cast_string_to_int(detection_cfg['object_min_area'])
+            if object_min_area is None:
+                raise ConfigException("Config: bad object_min_area value!")
+        else:
+            object_min_area = 100
+            self._logger.info("Config: Missing scale_factor value, using default")
+
+        if 'pixel_intensity_threshold' in detection_cfg:
+            pixel_intensity_threshold = cast_string_to_int(detection_cfg['pixel_intensity_threshold'])
+            if pixel_intensity_threshold is None:
+                raise ConfigException("Config: bad pixel_intensity_threshold value!")
+        else:
+            pixel_intensity_threshold = 25
+            self._logger.info("Config: Missing pixel intensity value, using default")
+
+        detector_config = SimpleMotionDetectorConfig(diff_threshold=diff_threshold,
+                                                     blurring_size=blurring_size,
+                                                     object_min_area=object_min_area,
+                                                     pixel_intensity_threshold=pixel_intensity_threshold)
+        return detector_config
+
+    def _read_dnn_detector_config(self, detector_section):
+
+        detection_cfg = self._cp[detector_section]
+
+        if 'model' in detection_cfg:
+            model_file = detection_cfg['model']
+            if model_file is None:
+                raise ConfigException("Config: bad model value!")
+        else:
+            raise ConfigException("Config: Missing model file!")
+
+        if 'model_config' in detection_cfg:
+            config_file = detection_cfg['model_config']
+            if config_file is None:
+                raise ConfigException("Config: bad model_config value!")
+        else:
+            config_file = None
+
+        if 'input_size' in detection_cfg:
+            input_size = cast_string_to_tuple(detection_cfg['input_size'])
+            if input_size is None or len(input_size) != 2:
+                raise ConfigException("Config: bad input_size value!")
+        else:
+            input_size = (300, 300)
+            self._logger.info("Config: Missing input_size value, using default")
+
+        if 'scale' in detection_cfg:
+            scale = cast_string_to_float(detection_cfg['scale'])
+            if scale is None:
+                raise ConfigException("Config: bad scale value!")
+        else:
+            scale = 1.0 / 127.5
+            self._logger.info("Config: Missing scale value, using default")
+
+        if 'mean' in detection_cfg:
+            mean = cast_string_to_tuple(detection_cfg['mean'])
+            if mean is None or len(mean) != 3:
+                raise ConfigException("Config: bad mean value!")
+        else:
+            mean = (127.5, 127.5, 127.5)
+            self._logger.info("Config: Missing mean value, using default")
+
+        if 'swap_rb' in detection_cfg:
+            swap_rb = cast_string_to_bool(detection_cfg['swap_rb'])
+            if swap_rb is None:
+                raise ConfigException("Config: bad swap_rb value!")
+        else:
+            swap_rb = False
+            self._logger.info("Config: Missing swap_rb value, using default")
+
+        if 'confidence_threshold' in detection_cfg:
+            confidence_threshold = cast_string_to_float(detection_cfg['confidence_threshold'])
+            if confidence_threshold is None:
+                raise ConfigException("Config: bad confidence_threshold value!")
+        else:
+            confidence_threshold = 0.5
+            self._logger.info("Config: Missing confidence_threshold value, using default")
+
+        if 'classes' in detection_cfg:
+            classes = cast_string_to_tuple(detection_cfg['classes'])
+            if isinstance(classes, int):
+                classes = (classes,)
+            if classes is None or not isinstance(classes, (list, tuple)):
+                raise ConfigException("Config: bad classes value!")
+        else:
+            classes = ()
+            self._logger.info("Config: Missing classes value, using default")
+
+        if 'max_batch' in detection_cfg:
+            max_batch = cast_string_to_int(detection_cfg['max_batch'])
+            if max_batch is None or max_batch < 1:
+                raise ConfigException("Config: bad max_batch value!")
+        else:
+            max_batch = 1
+            self._logger.info("Config: Missing max_batch value, using default")
+
+        if 'batch_wait' in detection_cfg:
+            batch_wait = cast_string_to_float(detection_cfg['batch_wait'])
+            if batch_wait is None or batch_wait < 0.0:
+                raise ConfigException("Config: bad batch_wait value!")
+        else:
+            batch_wait = 0.005
+            self._logger.info("Config: Missing batch_wait value, using default")
+
+        parameter_ladder = self._read_parameter_ladder(detector_section,
+                                                       ['confidence_threshold',
+                                                        'input_size'])
+
+        detector_config = DnnDetectorConfig(model_file=model_file,
+                                            config_file=config_file,
+                                            input_size=tuple(input_size),
+                                            scale=scale,
+                                            mean=tuple(mean),
+                                            swap_rb=swap_rb,
+                                            confidence_threshold=confidence_threshold,
+                                            classes=tuple(classes),
+                                            max_batch=max_batch,
+                                            batch_wait=batch_wait,
+                                            parameter_ladder=parameter_ladder)
+        return detector_config
+
+    def _read_action_config(self, action_section):
+
+        action_cfg = self._cp[action_section]
+
+        if 'command' in action_cfg:
+            command = action_cfg['command']
+            if command is None:
+                raise ConfigException("Bad command for section {}!".format(action_section))
+        else:
+            raise ConfigException("Missing command for section {}!".format(action_section))
+
+        detectors = []
+        if 'detectors' in action_cfg:
+            detectors_str = action_cfg['detectors']
+            if detectors_str is None:
+                raise ConfigException("Config: bad detectors!")
+            detectors_str_a = detectors_str.split(",")
+            for detector in detectors_str_a:
+                # Make sure the detector exists in the config file
+                if detector not in self._cp:
+                    raise ConfigException("Config: {}: Missing section for detector {} in config file!".format(action_section, detector))
+                detectors.append(detector)
+        else:
+            self._logger.info("Missing detectors for {}".format(action_section))
+            self._logger.info("Action will be invoked for all detectors.")
+
+        if 'triggers' in action_cfg:
+            triggers_str = action_cfg['triggers']
+            if triggers_str is None:
+                raise ConfigException("Config: bad trigger!")
+            trigger_detection = False
+            trigger_no_detection = False
+            triggers = triggers_str.split(",")
+            for trigger in triggers:
+                trigger.strip()
+                # We accept a few different string values for triggers.
+                # Detection triggers:
+                if (trigger.lower() == 'detect' or
+                    trigger.lower() == 'detection' or
+                    trigger.lower() == 'match'):
+                    trigger_detection = True
+                # Non-detection triggers:
+                elif (trigger.lower() == 'undetect' or
+                      trigger.lower() == 'no-detect' or
+                      trigger.lower() == 'no-match'):
+                    trigger_no_detection = True
+        else:
+            self._logger.info("Missing triggers for section {}".format(action_section))
+            self._logger.info("Using default triggers")
+            trigger_detection = True
+            trigger_no_detection = False
+
+        if 'save_frame' in action_cfg:
+            save_frame = cast_string_to_bool(action_cfg['save_frame'])
+            if save_frame is None:
+                raise ConfigException("Config: Bad save_frame option for section {}!".format(action_section))
+        else:
+            self._logger.info("Missing save_frame option for section {}".format(action_section))
+            self._logger.info("Skipping detection frame saving")
+            save_frame = False
+
+        if 'save_frame_dir' in action_cfg:
+            save_frame_dir = action_cfg['save_frame_dir']
+            if save_frame_dir is None:
+                raise ConfigException("Config: Bad save_frame_dir option for section {}!".format(action_section))
+        else:
+            save_frame_dir = "/tmp"
+            self._logger.info("Missing save_frame_dir option for section {}".format(action_section))
+            self._logger.info("Using default dir: {}".format(save_frame_dir))
+
+        if 'cool_down_time' in action_cfg:
+            cool_down_time = cast_string_to_float(action_cfg['cool_down_time'])
+            if cool_down_time is None:
+                raise ConfigException("Config: bad cool_down_time value!")
+        else:
+            cool_down_time = 0.0
+            self._logger.info("Config: Missing cool_down_time value, using default")
+
+        action_config = ActionConfig(command=command,
+                                     detectors=detectors,
+                                     trigger_detection=trigger_detection,
+                                     trigger_no_detection=trigger_no_detection,
+                                     save_frame=save_frame,
+                                     save_frame_dir=save_frame_dir,
+                                     cool_down_time=cool_down_time)
+        return action_config
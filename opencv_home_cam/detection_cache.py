@@ -0,0 +1,128 @@
+import cv2
+import time
+import logging
+from collections import namedtuple
+from . import metrics
+
+
+# thumbnail_width   - Width in pixels of the thumbnails (block means of the
+#                     frame) the frames are compared on.
+# pixel_threshold   - Pixel intensity diff for a thumbnail pixel to be
+#                     considered changed.
+# changed_threshold - A frame with at most this percentage of changed
+#                     thumbnail pixels is considered unchanged.
+# max_age           - Full detection is made at least this often (in
+#                     seconds), even if the frames are unchanged.
+DetectionCacheConfig = namedtuple('DetectionCacheConfig',
+                                  ['thumbnail_width',
+                                   'pixel_threshold',
+                                   'changed_threshold',
+                                   'max_age'],
+                                  verbose=False)
+
+
+# The detection cache lets CamController skip the detectors on frames that
+# are effectively unchanged since the last full detection (a fixed camera
+# and a static scene).
+#
+# The signature of a frame is a small grayscale thumbnail (each pixel is
+# the mean of a block of the frame). The frame is compared with the frame
+# of the last full detection (not with the previous frame, so slow changes
+# add up). If it is unchanged, and the last full detection is younger than
+# max_age, the cached detection results are reused.
+class DetectionCache:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._thumbnail_width = config.thumbnail_width
+        self._pixel_threshold = config.pixel_threshold
+        self._changed_threshold = config.changed_threshold
+        self._max_age = config.max_age
+
+        self._signature = None
+        self._entry = None
+        self._entry_time = None
+        # The signature of the last looked up frame (stored with its
+        # results)
+        self._pending_signature = None
+
+        # Statistics
+        self._nbr_of_hits = 0
+        self._nbr_of_misses = 0
+        self._nbr_of_expired = 0
+        self._nbr_of_stored = 0
+        self._check_time = 0.0
+        self._detection_time = 0.0
+
+    def _create_signature(self, frame):
+
+        height = int(frame.shape[0] * self._thumbnail_width / frame.shape[1])
+        thumbnail = cv2.resize(frame, (self._thumbnail_width, max(1, height)),
+                               interpolation=cv2.INTER_AREA)
+        if len(thumbnail.shape) == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return thumbnail
+
+    # Look up the detection results of a frame.
+    # Returns the cached (detector_status, rectangles, scores) tuple if the
+    # frame is unchanged since the last full detection, otherwise None (the
+    # frame must be fully processed and the results stored).
+    def lookup(self, frame, timestamp):
+
+        start = time.perf_counter()
+        signature = self._create_signature(frame)
+        entry = None
+        if self._entry is not None:
+            if timestamp - self._entry_time >= self._max_age:
+                self._nbr_of_expired += 1
+            else:
+                diff = cv2.absdiff(self._signature, signature)
+                changed = cv2.countNonZero(cv2.threshold(diff, self._pixel_threshold,
+                                                         255, cv2.THRESH_BINARY)[1])
+                if changed * 100.0 / diff.size <= self._changed_threshold:
+                    entry = self._entry
+
+        if entry is None:
+            self._pending_signature = signature
+            self._nbr_of_misses += 1
+        else:
+            self._nbr_of_hits += 1
+            metrics.inc_counter('detection_cache_hits')
+        metrics.set_gauge('detection_cache_hit_ratio',
+                          round(self._nbr_of_hits / float(self._nbr_of_hits + self._nbr_of_misses), 3))
+        self._check_time += time.perf_counter() - start
+        return entry
+
+    # Store the detection results of the last looked up frame.
+    # detection_time is the time (in seconds) the full detection took.
+    def store(self, timestamp, detector_status, rectangles, scores, detection_time):
+
+        self._signature = self._pending_signature
+        self._entry = (detector_status, rectangles, scores)
+        self._entry_time = timestamp
+        self._nbr_of_stored += 1
+        self._detection_time += detection_time
+
+    # Drop the cached results (e.g. when the detectors are replaced)
+    def invalidate(self):
+
+        self._entry = None
+        self._signature = None
+
+    # Returns a dict of statistics: hits, misses (full detections), misses
+    # due to max_age, the hit ratio, the cost of the check (ms per frame)
+    # and the estimated detection time saved by the hits (the average full
+    # detection time per hit).
+    def get_stats(self):
+
+        nbr_of_frames = max(1, self._nbr_of_hits + self._nbr_of_misses)
+        hit_ratio = self._nbr_of_hits / float(nbr_of_frames)
+        saved_time = self._nbr_of_hits * self._detection_time / max(1, self._nbr_of_stored)
+        return {'hits': self._nbr_of_hits,
+                'misses': self._nbr_of_misses,
+                'expired': self._nbr_of_expired,
+                'hit_ratio': round(hit_ratio, 3),
+                'check_ms_per_frame': round(self._check_time * 1e3 / nbr_of_frames, 3),
+                'saved_detection_ms': round(saved_time * 1e3, 1)}
@@ -1,3 +1,5 @@
+import cv2
+import numpy
 from abc import ABCMeta, abstractmethod
 
 
@@ -11,7 +13,7 @@ BGR_MAGENTA = (255, 0, 255)
 COLORS = [BGR_RED, BGR_GREEN, BGR_BLUE, BGR_YELLOW, BGR_CYAN, BGR_MAGENTA]
 
 
-class DetectorException:
+class DetectorException(Exception):
     pass
 
 
@@ -26,13 +28,93 @@ class Detector:
         self._rgb_tuple = COLORS[Detector._color_cnt % len(COLORS)]
         Detector._color_cnt += 1
         self._name = name
+        # Frames are scaled with this factor before detection (see
+        # _resize_frame and _rescale_rects).
+        self._detection_scale = 1.0
+        # The parameter ladder is a list of parameter dicts (see
+        # set_parameters) used by the governor to lower the detection
+        # cost step by step.
+        self._parameter_ladder = []
 
     @abstractmethod
     def detect(self, frame):
         pass
 
+    # Returns a (rects, scores) tuple where scores holds the confidence of
+    # each rectangle. Detectors without confidence values report 1.0 for
+    # all rectangles.
+    def detect_with_scores(self, frame):
+        rects = self.detect(frame)
+        return (rects, numpy.ones(len(rects)))
+
+    # Returns a dict of (rects, scores) tuples, one for each name the
+    # detector reports rectangles under (see get_output_colors).
+    def detect_named_with_scores(self, frame):
+        return {self.get_name(): self.detect_with_scores(frame)}
+
+    # Returns a list with a (rects, scores) tuple for each frame.
+    # Detectors that can process several frames at once (see DnnDetector)
+    # override this.
+    def detect_batch_with_scores(self, frames):
+        return [self.detect_with_scores(frame) for frame in frames]
+
+    # Detectors working on color (BGR) frames return True. The other
+    # detectors get grayscale frames.
+    def uses_color_frames(self):
+        return False
+
+    # Detectors that diff consecutive frames (and therefore report global
+    # lighting changes as motion) return True.
+    def is_motion_detector(self):
+        return False
+
+    # Forget the state built from previous frames (e.g. after a lighting
+    # change).
+    def reset(self):
+        pass
+
+    # Returns a dict of the current (tunable) detection parameters.
+    def get_parameters(self):
+        return {'detection_scale': self._detection_scale}
+
+    # Update the detection parameters.
+    # parameters is a dict with parameter names as keys.
+    # Sub classes handle their own parameters and call this function for
+    # the parameters common to all detectors.
+    def set_parameters(self, parameters):
+        if 'detection_scale' in parameters:
+            self._detection_scale = parameters['detection_scale']
+
+    def set_parameter_ladder(self, ladder):
+        self._parameter_ladder = ladder
+
+    def get_parameter_ladder(self):
+        return self._parameter_ladder
+
+    def _resize_frame(self, frame):
+        if self._detection_scale == 1.0:
+            return frame
+        return cv2.resize(frame, None,
+                          fx=self._detection_scale,
+                          fy=self._detection_scale,
+                          interpolation=cv2.INTER_AREA)
+
+    # Scale rectangles detected in a resized frame back to the original
+    # frame size.
+    def _rescale_rects(self, rects):
+        if self._detection_scale == 1.0 or len(rects) == 0:
+            return rects
+        return (numpy.asarray(rects) / self._detection_scale).astype(int)
+
     def get_rgb_tuple(self):
         return self._rgb_tuple
 
     def get_name(self):
         return self._name
+
+    # Returns a dict with the BGR color of each name the detector reports
+    # rectangles under. Most detectors report under their own name, but a
+    # detector combining several detectors (see MultiCascadeDetector)
+    # reports under the names of the combined detectors.
+    def get_output_colors(self):
+        return {self.get_name(): self.get_rgb_tuple()}
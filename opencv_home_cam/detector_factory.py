@@ -0,0 +1,58 @@
+from .haar_cascade_detector import HaarCascadeDetector, MultiCascadeDetector
+from .hog_detector import HogPeopleDetector
+from .simple_motion_detector import SimpleMotionDetector
+from .dnn_detector import DnnDetector
+from .tiled_detector import TiledDetector
+from .detector import DetectorException
+
+
+class DetectorFactoryException(Exception):
+
+    pass
+
+
+# Create a detector object from a detector config.
+# If tiling_cfg is not None, the detector is wrapped in a TiledDetector.
+def create_detector(name, config, tiling_cfg=None):
+
+    # Check what type of detector this is and create an object of
+    # the corresponding class.
+    if type(config).__name__ == 'HaarCascadeDetectorConfig':
+        try:
+            detector = HaarCascadeDetector(name=name,
+                                           config=config)
+        except DetectorException as err:
+            raise DetectorFactoryException(err)
+    elif type(config).__name__ == 'MultiCascadeDetectorConfig':
+        try:
+            detector = MultiCascadeDetector(name=name,
+                                            config=config)
+        except DetectorException as err:
+            raise DetectorFactoryException(err)
+    elif type(config).__name__ == 'HogPeopleDetectorConfig':
+        detector = HogPeopleDetector(name=name,
+                                     config=config)
+    elif type(config).__name__ == 'SimpleMotionDetectorConfig':
+        detector = SimpleMotionDetector(name=name,
+                                        config=config)
+    elif type(config).__name__ == 'DnnDetectorConfig':
+        try:
+            detector = DnnDetector(name=name,
+                                   config=config)
+        except DetectorException as err:
+            raise DetectorFactoryException(err)
+    else:
+        raise DetectorFactoryException("Unknown detector type: {}".format(type(config).__name__))
+
+    if tiling_cfg is not None:
+        if isinstance(detector, SimpleMotionDetector):
+            # The motion detector keeps the previous frame, so it can't be
+            # split into tiles.
+            raise DetectorFactoryException("{}: tiling is not supported by simple-motion detectors".format(name))
+        if isinstance(detector, MultiCascadeDetector):
+            # The tiles would not share the pyramid
+            raise DetectorFactoryException("{}: tiling is not supported by haar-multi detectors".format(name))
+        detector = TiledDetector(detector=detector,
+                                 config=tiling_cfg)
+
+    return detector
@@ -0,0 +1,316 @@
+import cv2
+import numpy
+import logging
+import threading
+import time
+from collections import namedtuple
+from .detector import Detector, DetectorException
+
+# Threads that haven't submitted a frame for this long (in seconds) are no
+# longer waited for by the batch leader (see DnnBatcher).
+SUBMITTER_TIMEOUT = 1.0
+
+# model_file           - The model weights (e.g. a Caffe .caffemodel, an
+#                        ONNX .onnx or a TensorFlow .pb file).
+# config_file          - The model description (e.g. a Caffe .prototxt or
+#                        a TensorFlow .pbtxt file). None for formats without
+#                        a separate description (e.g. ONNX).
+# input_size           - (width, height) of the network input.
+# scale                - The pixel values are multiplied with this value
+#                        (after subtracting the mean).
+# mean                 - The (B, G, R) mean subtracted from the pixels.
+# swap_rb              - Swap the red and blue channels (for models trained
+#                        on RGB images).
+# confidence_threshold - Detections with lower confidence are dropped.
+# classes              - The class ids to report. An empty tuple means all
+#                        classes.
+# max_batch            - The maximum number of frames processed by one
+#                        forward pass (see DnnBatcher).
+# batch_wait           - The time (in seconds) to wait for more frames
+#                        before a batch with less than max_batch frames is
+#                        processed.
+DnnDetectorConfig = namedtuple('DnnDetectorConfig',
+                               ['model_file',
+                                'config_file',
+                                'input_size',
+                                'scale',
+                                'mean',
+                                'swap_rb',
+                                'confidence_threshold',
+                                'classes',
+                                'max_batch',
+                                'batch_wait',
+                                'parameter_ladder'],
+                               verbose=False)
+
+
+class _BatchRequest:
+
+    def __init__(self, image, blob_params):
+
+        self.image = image
+        self.blob_params = blob_params
+        self.detections = None
+        self.error = None
+        self.done = False
+
+
+# A DnnBatcher owns a network and collects the frames of all detectors
+# (and threads) using the same model into batches, so each forward pass
+# processes several frames.
+# There is no batching thread. The first waiting thread becomes the batch
+# leader: it waits (at most batch_wait seconds) for more frames, runs the
+# forward pass for the whole batch and hands out the results. The leader
+# only waits for the frames of the other threads that have recently
+# submitted frames, so a single submitting thread (e.g. one untiled dnn
+# detector in the frame thread) is never delayed. Only frames
+# with the same preprocessing (input size, scale, mean, channel order) are
+# put in the same batch.
+# cv2.dnn networks are not thread safe, but only the leader uses the
+# network.
+class DnnBatcher:
+
+    def __init__(self, model_file, config_file):
+
+        self._logger = logging.getLogger(__name__)
+
+        try:
+            if config_file is None:
+                self._net = cv2.dnn.readNet(model_file)
+            else:
+                self._net = cv2.dnn.readNet(model_file, config_file)
+        except cv2.error as err:
+            raise DetectorException("Unable to load model {}: {}".format(model_file, err))
+        self._net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self._net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+        self._cond = threading.Condition()
+        self._pending = []
+        # The time of the last frame submitted by each thread (the
+        # (thread id, blob params) tuple is the dict key)
+        self._submitters = {}
+        self._busy = False
+        self._nbr_of_batches = 0
+        self._nbr_of_frames = 0
+
+    # Run one forward pass for a list of images.
+    # Returns a list with an (N, 6) array of (class id, confidence, x1, y1,
+    # x2, y2) detections for each image. The coordinates are relative to
+    # the image size (0.0 - 1.0).
+    # The caller must be the batch leader (or hold the batcher otherwise).
+    def _forward(self, images, blob_params):
+
+        (input_size, scale, mean, swap_rb) = blob_params
+        blob = cv2.dnn.blobFromImages(images, scale, input_size, mean,
+                                      swapRB=swap_rb, crop=False)
+        self._net.setInput(blob)
+        # SSD style output: (1, 1, N, 7) with rows of (image id, class id,
+        # confidence, x1, y1, x2, y2)
+        output = self._net.forward().reshape(-1, 7)
+        self._nbr_of_batches += 1
+        self._nbr_of_frames += len(images)
+
+        return [output[output[:, 0] == i, 1:] for i in range(len(images))]
+
+    # Process a batch of images directly (without waiting for other
+    # threads).
+    def forward_batch(self, images, blob_params):
+
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+            self._busy = True
+        try:
+            return self._forward(images, blob_params)
+        finally:
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    # Process one image, batched with the images of other threads.
+    def detect(self, image, blob_params, max_batch, batch_wait):
+
+        request = _BatchRequest(image, blob_params)
+        with self._cond:
+            now = time.perf_counter()
+            self._submitters[(threading.get_ident(), blob_params)] = now
+            for (key, submit_time) in list(self._submitters.items()):
+                if now - submit_time > SUBMITTER_TIMEOUT:
+                    del self._submitters[key]
+            self._pending.append(request)
+            self._cond.notify_all()
+            while not request.done and self._busy:
+                self._cond.wait()
+            if request.done:
+                if request.error is not None:
+                    raise request.error
+                return request.detections
+
+            # This thread is the batch leader. There is no point in waiting
+            # for more frames than there are submitting threads.
+            self._busy = True
+            nbr_of_submitters = len([key for key in self._submitters if key[1] == blob_params])
+            batch_size = min(max_batch, nbr_of_submitters)
+            deadline = time.perf_counter() + batch_wait
+            while True:
+                batch = [request] + [r for r in self._pending
+                                     if r is not request and r.blob_params == blob_params][:max_batch - 1]
+                remaining = deadline - time.perf_counter()
+                if len(batch) >= batch_size or remaining <= 0.0:
+                    break
+                self._cond.wait(remaining)
+            for r in batch:
+                self._pending.remove(r)
+
+        try:
+            results = self._forward([r.image for r in batch], blob_params)
+            for (r, detections) in zip(batch, results):
+                r.detections = detections
+        except cv2.error as err:
+            for r in batch:
+                r.error = DetectorException("Forward pass failed: {}".format(err))
+        finally:
+            with self._cond:
+                for r in batch:
+                    r.done = True
+                self._busy = False
+                self._cond.notify_all()
+
+        if request.error is not None:
+            raise request.error
+        return request.detections
+
+    # Returns the average number of frames per forward pass
+    def get_average_batch_size(self):
+
+        return self._nbr_of_frames / float(max(1, self._nbr_of_batches))
+
+
+# Cache of batchers (model files are the dict key), so all detectors using
+# the same model share one network and one batch queue.
+_cache_lock = threading.Lock()
+_batchers = {}
+
+
+def get_batcher(model_file, config_file):
+
+    key = (model_file, config_file)
+    with _cache_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = DnnBatcher(model_file, config_file)
+            _batchers[key] = batcher
+    return batcher
+
+
+class DnnDetector(Detector):
+
+    def __init__(self, name, config):
+
+        Detector.__init__(self,
+                          name=name)
+
+        self._input_size = tuple(config.input_size)
+        self._scale = config.scale
+        self._mean = tuple(config.mean)
+        self._swap_rb = config.swap_rb
+        self._confidence_threshold = config.confidence_threshold
+        self._classes = set(config.classes)
+        self._max_batch = config.max_batch
+        self._batch_wait = config.batch_wait
+        self.set_parameter_ladder(config.parameter_ladder)
+
+        self._batcher = get_batcher(config.model_file, config.config_file)
+
+    # The network input is a color image
+    def uses_color_frames(self):
+        return True
+
+    def detect(self, frame):
+
+        return self.detect_with_scores(frame)[0]
+
+    def detect_with_scores(self, frame):
+
+        detections = self._batcher.detect(self._prepare_frame(frame),
+                                          self._get_blob_params(),
+                                          self._max_batch,
+                                          self._batch_wait)
+        return self._to_rects(detections, frame)
+
+    # All frames are processed by one forward pass
+    def detect_batch_with_scores(self, frames):
+
+        outputs = self._batcher.forward_batch([self._prepare_frame(frame) for frame in frames],
+                                              self._get_blob_params())
+        return [self._to_rects(detections, frame)
+                for (detections, frame) in zip(outputs, frames)]
+
+    def _get_blob_params(self):
+
+        return (self._input_size, self._scale, self._mean, self._swap_rb)
+
+    def _prepare_frame(self, frame):
+
+        if frame.ndim == 2:
+            return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        return frame
+
+    # Convert relative detections to (x, y, w, h) rectangles in frame
+    # coordinates (and filter on confidence and class).
+    def _to_rects(self, detections, frame):
+
+        keep = detections[:, 1] >= self._confidence_threshold
+        if len(self._classes) > 0:
+            keep &= numpy.isin(detections[:, 0].astype(int), list(self._classes))
+        detections = detections[keep]
+        if len(detections) == 0:
+            return ([], numpy.zeros(0))
+
+        (height, width) = frame.shape[:2]
+        boxes = numpy.clip(detections[:, 2:6], 0.0, 1.0) * [width, height, width, height]
+        rects = numpy.empty((len(boxes), 4), dtype=numpy.int32)
+        rects[:, 0] = boxes[:, 0]
+        rects[:, 1] = boxes[:, 1]
+        rects[:, 2] = boxes[:, 2] - boxes[:, 0]
+        rects[:, 3] = boxes[:, 3] - boxes[:, 1]
+        return (rects, detections[:, 1].astype(float))
+
+    def get_parameters(self):
+
+        parameters = Detector.get_parameters(self)
+        parameters['confidence_threshold'] = self._confidence_threshold
+        parameters['input_size'] = self._input_size
+        return parameters
+
+    def set_parameters(self, parameters):
+
+        Detector.set_parameters(self, parameters)
+        if 'confidence_threshold' in parameters:
+            self._confidence_threshold = parameters['confidence_threshold']
+        if 'input_size' in parameters:
+            self._input_size = tuple(parameters['input_size'])
+
+
+# Measure the detection latency for different batch sizes.
+# frames is a list of frames (the same frames are used for all batch
+# sizes).
+# Returns a list of (batch size, ms per frame, ms per batch) tuples.
+def benchmark_batching(detector, frames, batch_sizes):
+
+    results = []
+    for batch_size in batch_sizes:
+        # Warm up (memory allocation for the new input shape)
+        detector.detect_batch_with_scores([frames[0]] * batch_size)
+        nbr_of_batches = 0
+        start = time.perf_counter()
+        for i in range(0, len(frames) - batch_size + 1, batch_size):
+            detector.detect_batch_with_scores(frames[i:i + batch_size])
+            nbr_of_batches += 1
+        elapsed = time.perf_counter() - start
+        if nbr_of_batches == 0:
+            continue
+        results.append((batch_size,
+                        elapsed * 1e3 / (nbr_of_batches * batch_size),
+                        elapsed * 1e3 / nbr_of_batches))
+    return results
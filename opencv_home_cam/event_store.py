@@ -0,0 +1,217 @@
+import threading
+import queue
+import json
+import logging
+from collections import namedtuple
+
+
+EventStoreConfig = namedtuple('EventStoreConfig',
+                              ['db_path',
+                               'batch_size',
+                               'flush_interval'],
+                              verbose=False)
+
+# camera         - The camera (section name) that captured the frame.
+# detector       - The detector (section name) that made the detection.
+# timestamp      - Capture time of the frame (seconds since the epoch).
+# rectangles     - A list of (x, y, width, height) tuples.
+# track_id       - The detection sequence number of the detector. All
+#                  events from the same detection (from a transition to
+#                  detection until the transition back to no detection)
+#                  share the same track ID.
+# recording_file - The recording the frame was written to (or None).
+# frame_index    - The index of the frame within recording_file (or None).
+Event = namedtuple('Event',
+                   ['camera',
+                    'detector',
+                    'timestamp',
+                    'rectangles',
+                    'track_id',
+                    'recording_file',
+                    'frame_index'],
+                   verbose=False)
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    camera TEXT NOT NULL,
+    detector TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    rectangles TEXT NOT NULL,
+    track_id INTEGER,
+    recording_file TEXT,
+    frame_index INTEGER
+)
+"""
+
+_CREATE_INDICES = [
+    "CREATE INDEX IF NOT EXISTS events_cam_det_ts ON events (camera, detector, timestamp)",
+    "CREATE INDEX IF NOT EXISTS events_ts ON events (timestamp)",
+    "CREATE INDEX IF NOT EXISTS events_recording ON events (recording_file)",
+]
+
+_INSERT = ("INSERT INTO events (camera, detector, timestamp, rectangles, "
+           "track_id, recording_file, frame_index) "
+           "VALUES (?, ?, ?, ?, ?, ?, ?)")
+
+
+class EventStoreException(Exception):
+
+    pass
+
+
+# sqlite3 is imported by the functions using it, so importing this module
+# (e.g. for the Event and config tuples) doesn't load it.
+def _open_db(db_path):
+
+    import sqlite3
+
+    try:
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(_CREATE_TABLE)
+        for index in _CREATE_INDICES:
+            db.execute(index)
+        db.commit()
+    except sqlite3.Error as err:
+        raise EventStoreException("Unable to open event database {}: {}".format(db_path, err))
+
+    return db
+
+
+# The event store keeps an index of all detections in an SQLite database.
+# Events are queued by the frame processing thread and written to the
+# database in batches by a separate writer thread, so the frame processing
+# is never blocked by disk I/O.
+class EventStore:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._db_path = config.db_path
+        self._batch_size = config.batch_size
+        self._flush_interval = config.flush_interval
+        self._db = _open_db(self._db_path)
+
+        # The queue holds either lists of Event tuples or names of removed
+        # recording files (str). None tells the writer thread to stop.
+        self._queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._write_events)
+        self._writer_thread.start()
+
+    # Add the events of one processed frame to the store.
+    # This function is called from the frame processing thread and will
+    # never block on the database.
+    def add_events(self, events):
+
+        if len(events) > 0:
+            self._queue.put(events)
+
+    # Remove all events referring to a recording file.
+    # Used as a file removed listener of the recorder in order to keep
+    # the index in sync with the retention of the recordings.
+    def remove_recording(self, recording_file):
+
+        self._queue.put(recording_file)
+
+    def _write_events(self):
+
+        import sqlite3
+
+        running = True
+        while running:
+            try:
+                item = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                continue
+
+            # Collect as many pending items as possible into one batch
+            items = [item]
+            while len(items) < self._batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = []
+            removed_files = []
+            for item in items:
+                if item is None:
+                    running = False
+                elif isinstance(item, str):
+                    removed_files.append((item,))
+                else:
+                    for event in item:
+                        rows.append((event.camera,
+                                     event.detector,
+                                     event.timestamp,
+                                     json.dumps([list(map(int, r)) for r in event.rectangles]),
+                                     event.track_id,
+                                     event.recording_file,
+                                     event.frame_index))
+
+            try:
+                with self._db:
+                    if len(rows) > 0:
+                        self._db.executemany(_INSERT, rows)
+                    if len(removed_files) > 0:
+                        self._db.executemany("DELETE FROM events WHERE recording_file = ?",
+                                             removed_files)
+            except sqlite3.Error as err:
+                self._logger.warning("Unable to write events: {}".format(err))
+
+    def close(self):
+
+        self._logger.info("Closing event store")
+        self._queue.put(None)
+        self._writer_thread.join()
+        self._db.close()
+
+
+# Query the event database.
+# All arguments except db_path are optional filters.
+# Returns a list of Event tuples sorted by time.
+def query_events(db_path, camera=None, detector=None, start=None, end=None):
+
+    conditions = []
+    args = []
+    if camera is not None:
+        conditions.append("camera = ?")
+        args.append(camera)
+    if detector is not None:
+        conditions.append("detector = ?")
+        args.append(detector)
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        args.append(start)
+    if end is not None:
+        conditions.append("timestamp <= ?")
+        args.append(end)
+
+    sql = ("SELECT camera, detector, timestamp, rectangles, track_id, "
+           "recording_file, frame_index FROM events")
+    if len(conditions) > 0:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY timestamp"
+
+    import sqlite3
+
+    try:
+        db = sqlite3.connect("file:{}?mode=ro".format(db_path), uri=True)
+        rows = db.execute(sql, args).fetchall()
+        db.close()
+    except sqlite3.Error as err:
+        raise EventStoreException("Unable to query event database {}: {}".format(db_path, err))
+
+    events = []
+    for row in rows:
+        events.append(Event(camera=row[0],
+                            detector=row[1],
+                            timestamp=row[2],
+                            rectangles=[tuple(r) for r in json.loads(row[3])],
+                            track_id=row[4],
+                            recording_file=row[5],
+                            frame_index=row[6]))
+    return events
@@ -0,0 +1,167 @@
+import numpy
+import struct
+import time
+import logging
+
+
+# File layout of a frame archive:
+#
+#   header     - HEADER_SIZE bytes: magic, version, frame width, height and
+#                number of channels, and the number of frames.
+#   frames     - The raw frames (uint8, height x width x channels) stored
+#                back to back.
+#   timestamps - One float64 capture time (seconds since the epoch) per
+#                frame.
+#
+# The frames can be memory mapped directly as a numpy array.
+ARCHIVE_MAGIC = b'OHCFRAME'
+ARCHIVE_VERSION = 1
+HEADER_FORMAT = '<8sIIIIQ'
+HEADER_SIZE = 64
+
+
+class FrameArchiveException(Exception):
+
+    pass
+
+
+# Writes captured frames to a frame archive.
+# All frames must have the same size (as the frames of a Camera).
+class FrameArchiveWriter:
+
+    def __init__(self, file_name):
+
+        self._file_name = file_name
+        self._file = open(file_name, 'wb')
+        # The header is written when the archive is closed
+        self._file.write(b'\0' * HEADER_SIZE)
+        self._shape = None
+        self._timestamps = []
+
+    def add_frame(self, frame, timestamp):
+
+        if self._shape is None:
+            self._shape = frame.shape
+        elif frame.shape != self._shape:
+            raise FrameArchiveException("Frame size {} differs from the first frame ({})".format(frame.shape,
+                                                                                               self._shape))
+
+        self._file.write(numpy.ascontiguousarray(frame, dtype=numpy.uint8).data)
+        self._timestamps.append(timestamp)
+
+    def close(self):
+
+        if self._file is None:
+            return
+
+        if self._shape is not None:
+            (height, width) = self._shape[:2]
+            channels = self._shape[2] if len(self._shape) == 3 else 1
+        else:
+            (height, width, channels) = (0, 0, 0)
+
+        self._file.write(numpy.array(self._timestamps, dtype='<f8').tobytes())
+        self._file.seek(0)
+        self._file.write(struct.pack(HEADER_FORMAT, ARCHIVE_MAGIC, ARCHIVE_VERSION,
+                                     width, height, channels,
+                                     len(self._timestamps)))
+        self._file.close()
+        self._file = None
+
+
+# A memory mapped frame archive.
+class FrameArchive:
+
+    def __init__(self, file_name):
+
+        try:
+            with open(file_name, 'rb') as f:
+                header = f.read(struct.calcsize(HEADER_FORMAT))
+        except IOError as err:
+            raise FrameArchiveException(err)
+
+        if len(header) < struct.calcsize(HEADER_FORMAT):
+            raise FrameArchiveException("{}: not a frame archive".format(file_name))
+        (magic, version, width, height, channels, nbr_of_frames) = struct.unpack(HEADER_FORMAT, header)
+        if magic != ARCHIVE_MAGIC or version != ARCHIVE_VERSION:
+            raise FrameArchiveException("{}: not a frame archive (or unsupported version)".format(file_name))
+        if nbr_of_frames == 0:
+            raise FrameArchiveException("{}: empty frame archive".format(file_name))
+
+        if channels == 1:
+            shape = (nbr_of_frames, height, width)
+        else:
+            shape = (nbr_of_frames, height, width, channels)
+        self._frames = numpy.memmap(file_name, dtype=numpy.uint8, mode='r',
+                                    offset=HEADER_SIZE, shape=shape)
+        self._timestamps = numpy.memmap(file_name, dtype='<f8', mode='r',
+                                        offset=HEADER_SIZE + self._frames.size,
+                                        shape=(nbr_of_frames,))
+        self._resolution = (width, height)
+
+    def __len__(self):
+
+        return len(self._frames)
+
+    # Returns the (width, height) of the frames.
+    def get_resolution(self):
+
+        return self._resolution
+
+    # Returns the frames as a (read-only) memory mapped array.
+    def get_frames(self):
+
+        return self._frames
+
+    def get_timestamps(self):
+
+        return self._timestamps
+
+
+# A frame archive used as camera (for replay).
+# The frames are returned in archive order, and None is returned when all
+# frames have been returned.
+class ArchiveCamera:
+
+    def __init__(self, archive):
+
+        self._archive = archive
+        self._frame_index = 0
+
+    def get_resolution(self):
+
+        return self._archive.get_resolution()
+
+    def capture_frame(self):
+
+        if self._frame_index >= len(self._archive):
+            return None
+
+        # Copy the frame, since the rectangles may be drawn into it
+        frame = numpy.array(self._archive.get_frames()[self._frame_index])
+        self._frame_index += 1
+        return frame
+
+    def close(self):
+
+        pass
+
+
+# Capture nbr_of_frames frames from camera (at fps frames per second) and
+# write them to a frame archive.
+def capture_to_archive(camera, file_name, nbr_of_frames, fps):
+
+    logger = logging.getLogger(__name__)
+
+    writer = FrameArchiveWriter(file_name)
+    try:
+        for i in range(nbr_of_frames):
+            frame_start = time.perf_counter()
+            frame = camera.capture_frame()
+            if frame is None:
+                logger.warning("Capture failed after {} frames".format(i))
+                break
+            writer.add_frame(frame, time.time())
+            time.sleep(max(0.0, 1.0 / fps - (time.perf_counter() - frame_start)))
+    finally:
+        writer.close()
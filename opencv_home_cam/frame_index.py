@@ -0,0 +1,324 @@
+import os
+import re
+import json
+import glob
+import time
+import struct
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .overlay import SidecarWriter, get_sidecar_name, read_sidecar
+
+
+# MJPEG recordings (in AVI containers) have a frame index file with the same
+# base name as the recording and this extension.
+# The index is a JSON-lines file. The first line is a header:
+#
+#   {"file": "cam0.avi", "fps": 20.0, "resolution": [640, 480]}
+#
+# Each following line holds the capture time of one recorded frame, and
+# the byte offset and size of the JPEG data of the frame in the recording:
+#
+#   [17, 1571234567.89, 123456, 23456]
+#
+# The timestamps are written while recording. The video writer buffers the
+# file, so the offsets are added when the recording file is closed (a
+# frame line without offset and size is a frame of a recording in progress,
+# or of a recording that was never closed, or of a recording that is still
+# being indexed).
+INDEX_EXT = '.idx'
+
+# Codecs with independently decodable frames, i.e. recordings that clips
+# can be cut from without re-encoding.
+MJPEG_FOURCCS = ('MJPG', 'MJPA')
+
+
+class FrameIndexException(Exception):
+
+    pass
+
+
+def get_index_name(recording_file):
+
+    return os.path.splitext(recording_file)[0] + INDEX_EXT
+
+
+# Returns True if clips can be cut from recordings made with the codec
+def is_indexable(fourcc, container):
+
+    return fourcc.upper() in MJPEG_FOURCCS and container.lower() == 'avi'
+
+
+# Scan an AVI file for the chunks of the video frames.
+# The sizes of the RIFF lists are not trusted (they are only set when the
+# file is closed), so the lists are descended into and the scan stops at
+# the first truncated chunk.
+# Returns a list of (offset, size) tuples of the frame data.
+def scan_avi_frames(avi_file):
+
+    frames = []
+    with open(avi_file, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        pos = 0
+        while pos + 8 <= file_size:
+            f.seek(pos)
+            (fourcc, size) = struct.unpack('<4sI', f.read(8))
+            if fourcc in (b'RIFF', b'LIST'):
+                list_type = f.read(4)
+                if fourcc == b'RIFF' or list_type == b'movi' or size == 0:
+                    # Descend into the list
+                    pos += 12
+                    continue
+            elif fourcc[2:] in (b'dc', b'db'):
+                if pos + 8 + size > file_size:
+                    break
+                frames.append((pos + 8, size))
+            pos += 8 + size + (size & 1)
+    return frames
+
+
+# Scanning a recording reads the whole file, so the offsets are indexed by
+# a worker thread, not by the thread closing the recording (the frame
+# thread at every segment rotation). One worker, so a recording is only
+# scanned at a time.
+_index_executor = ThreadPoolExecutor(max_workers=1)
+
+
+# Writes the frame index of one recording file (see INDEX_EXT).
+class FrameIndexWriter:
+
+    def __init__(self, recording_file, fps, resolution):
+
+        self._logger = logging.getLogger(__name__)
+        self._recording_file = recording_file
+        self._index_file = get_index_name(recording_file)
+        self._header = {'file': os.path.basename(recording_file),
+                        'fps': fps,
+                        'resolution': list(resolution)}
+        self._timestamps = []
+        # Line buffered, so exports see the frames of the recording in
+        # progress
+        self._file = open(self._index_file, 'w', buffering=1)
+        self._file.write(json.dumps(self._header) + '\n')
+
+    def add(self, frame_index, timestamp):
+
+        self._timestamps.append(timestamp)
+        self._file.write(json.dumps([frame_index, timestamp]) + '\n')
+
+    # Must be called after the recording file has been closed. The index
+    # is rewritten with the byte offset of each frame in the background.
+    # Returns a future that is done when the index has been rewritten.
+    def close(self):
+
+        self._file.close()
+        return _index_executor.submit(self._write_offsets)
+
+    def _write_offsets(self):
+
+        try:
+            self._index_offsets()
+        except OSError as err:
+            # E.g. the recording was removed due to the file limit
+            self._logger.error("{}: failed to index the frames: {}".format(self._recording_file, err))
+
+    def _index_offsets(self):
+
+        start = time.perf_counter()
+        offsets = scan_avi_frames(self._recording_file)
+        if len(offsets) != len(self._timestamps):
+            self._logger.error("{}: {} frames recorded, but {} frames found in the file, "
+                               "clips cut from the recording may contain the wrong "
+                               "frames".format(self._recording_file, len(self._timestamps), len(offsets)))
+
+        tmp_file = self._index_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(json.dumps(self._header) + '\n')
+            for (frame_index, (timestamp, (offset, size))) in enumerate(zip(self._timestamps, offsets)):
+                f.write(json.dumps([frame_index, timestamp, offset, size]) + '\n')
+        os.replace(tmp_file, self._index_file)
+        self._logger.debug("Indexed {} frames of {} in {:.1f} ms".format(len(offsets),
+                                                                        self._recording_file,
+                                                                        (time.perf_counter() - start) * 1e3))
+
+
+# Read a frame index file.
+# Returns a (header, frames) tuple where frames is a list of (timestamp,
+# offset, size) tuples. If the offsets are missing (see INDEX_EXT), they
+# are taken from the recording file, and frames not (yet) found in the
+# file are left out.
+def read_frame_index(index_file):
+
+    with open(index_file) as f:
+        header = json.loads(f.readline())
+        entries = []
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # The last line of an index being written
+                break
+
+    if any(len(entry) < 4 for entry in entries):
+        recording_file = os.path.join(os.path.dirname(index_file), header['file'])
+        try:
+            offsets = scan_avi_frames(recording_file)
+        except OSError:
+            offsets = []
+        if len(offsets) < len(entries):
+            logging.getLogger(__name__).warning("{}: {} frames not available (recording in "
+                                                "progress?)".format(recording_file,
+                                                                    len(entries) - len(offsets)))
+        frames = [(entry[1], offset, size) for (entry, (offset, size)) in zip(entries, offsets)]
+    else:
+        frames = [(entry[1], entry[2], entry[3]) for entry in entries]
+
+    return (header, frames)
+
+
+def _write_avi_header(f, fps, resolution, nbr_of_frames, movi_size, max_frame_size):
+
+    (width, height) = resolution
+    rate = int(round(fps * 1000))
+    avih = struct.pack('<14I',
+                       int(round(1e6 / fps)),      # microseconds per frame
+                       int(max_frame_size * fps),  # max bytes per second
+                       0,                          # padding granularity
+                       0x10,                       # AVIF_HASINDEX
+                       nbr_of_frames,
+                       0,                          # initial frames
+                       1,                          # streams
+                       max_frame_size,             # suggested buffer size
+                       width, height,
+                       0, 0, 0, 0)
+    strh = struct.pack('<4s4sIHHIIIIIIiI4h',
+                       b'vids', b'MJPG',
+                       0, 0, 0, 0,
+                       1000, rate,                 # scale, rate
+                       0, nbr_of_frames,           # start, length
+                       max_frame_size,
+                       -1, 0,                      # quality, sample size
+                       0, 0, width, height)
+    strf = struct.pack('<IiiHH4sIiiII',
+                       40, width, height, 1, 24, b'MJPG',
+                       width * height * 3, 0, 0, 0, 0)
+    strl = (b'strl' +
+            b'strh' + struct.pack('<I', len(strh)) + strh +
+            b'strf' + struct.pack('<I', len(strf)) + strf)
+    hdrl = (b'hdrl' +
+            b'avih' + struct.pack('<I', len(avih)) + avih +
+            b'LIST' + struct.pack('<I', len(strl)) + strl)
+    idx1_size = 16 * nbr_of_frames
+    riff_size = 4 + (8 + len(hdrl)) + (8 + 4 + movi_size) + (8 + idx1_size)
+
+    f.write(b'RIFF' + struct.pack('<I', riff_size) + b'AVI ')
+    f.write(b'LIST' + struct.pack('<I', len(hdrl)) + hdrl)
+    f.write(b'LIST' + struct.pack('<I', 4 + movi_size) + b'movi')
+
+
+# Write the frames of a clip to an MJPEG AVI file by copying the JPEG data
+# of each frame (no decoding or encoding).
+# frames is a list of (recording file, offset, size) tuples.
+def _write_mjpeg_avi(output_file, fps, resolution, frames):
+
+    movi_size = sum(8 + size + (size & 1) for (recording_file, offset, size) in frames)
+    max_frame_size = max(size for (recording_file, offset, size) in frames)
+
+    index = []
+    sources = {}
+    try:
+        with open(output_file, 'wb') as f:
+            _write_avi_header(f, fps, resolution, len(frames), movi_size, max_frame_size)
+            # The idx1 offsets are relative to the 'movi' fourcc
+            movi_offset = 4
+            for (recording_file, offset, size) in frames:
+                source = sources.get(recording_file)
+                if source is None:
+                    source = open(recording_file, 'rb')
+                    sources[recording_file] = source
+                source.seek(offset)
+                data = source.read(size)
+                if len(data) != size:
+                    raise FrameIndexException("{}: truncated frame at offset {}".format(recording_file, offset))
+                f.write(b'00dc' + struct.pack('<I', size) + data)
+                if size & 1:
+                    f.write(b'\0')
+                index.append(struct.pack('<4sIII', b'00dc', 0x10, movi_offset, size))
+                movi_offset += 8 + size + (size & 1)
+            f.write(b'idx1' + struct.pack('<I', 16 * len(index)) + b''.join(index))
+    finally:
+        for source in sources.values():
+            source.close()
+
+
+# Export the recorded frames captured between start and end (seconds since
+# the epoch) to an MJPEG AVI file. The clip may span several recording
+# files. The frames are copied, not re-encoded.
+# directory and file_base are the directory and file_base options of the
+# recorder (file_base None means all indexed recordings in the directory).
+# If the recordings have sidecar files, the rectangles of the clip are
+# written to a sidecar file of the clip.
+# Returns the number of exported frames and the (first, last) timestamps.
+def export_clip(directory, start, end, output_file, file_base=None):
+
+    logger = logging.getLogger(__name__)
+
+    if file_base is not None:
+        regex = re.compile(re.escape(file_base) + r'\d+$')
+    clip = []
+    header = None
+    for index_file in glob.glob(os.path.join(directory, '*' + INDEX_EXT)):
+        base = os.path.splitext(os.path.basename(index_file))[0]
+        if file_base is not None and regex.match(base) is None:
+            continue
+        (file_header, frames) = read_frame_index(index_file)
+        recording_file = os.path.join(directory, file_header['file'])
+        for (frame_index, (timestamp, offset, size)) in enumerate(frames):
+            if start <= timestamp <= end:
+                clip.append((timestamp, recording_file, frame_index, offset, size))
+        if len(frames) > 0 and start <= frames[-1][0] and frames[0][0] <= end:
+            if header is not None and file_header['resolution'] != header['resolution']:
+                raise FrameIndexException("The clip spans recordings with different resolutions")
+            header = file_header
+
+    if len(clip) == 0:
+        raise FrameIndexException("No recorded frames between {} and {}".format(start, end))
+    clip.sort()
+
+    _write_mjpeg_avi(output_file, header['fps'], header['resolution'],
+                     [(recording_file, offset, size) for (timestamp, recording_file, frame_index, offset, size) in clip])
+
+    sidecars = {}
+    for (timestamp, recording_file, frame_index, offset, size) in clip:
+        if recording_file not in sidecars:
+            sidecar_file = get_sidecar_name(recording_file)
+            sidecars[recording_file] = read_sidecar(sidecar_file) if os.path.exists(sidecar_file) else None
+    if any(sidecar is not None for sidecar in sidecars.values()):
+        colors = {}
+        for sidecar in sidecars.values():
+            if sidecar is not None:
+                colors.update(sidecar[0])
+        writer = SidecarWriter(output_file, colors)
+        for (clip_index, (timestamp, recording_file, frame_index, offset, size)) in enumerate(clip):
+            sidecar = sidecars[recording_file]
+            if sidecar is not None and frame_index in sidecar[1]:
+                writer.write(clip_index, sidecar[1][frame_index])
+        writer.close()
+
+    logger.info("Exported {} frames to {}".format(len(clip), output_file))
+    return (len(clip), (clip[0][0], clip[-1][0]))
+
+
+# Export the recorded frames from before seconds before to after seconds
+# after an event (see event_store.py). The recordings are looked up in the
+# directory of the event's recording file.
+def export_event_clip(event, before, after, output_file):
+
+    if event.recording_file is None:
+        raise FrameIndexException("The event has no recording")
+
+    base = os.path.splitext(os.path.basename(event.recording_file))[0]
+    return export_clip(os.path.dirname(event.recording_file),
+                       event.timestamp - before,
+                       event.timestamp + after,
+                       output_file,
+                       file_base=re.sub(r'\d+$', '', base))
@@ -0,0 +1,111 @@
+import logging
+from collections import namedtuple, deque
+from . import metrics
+
+
+# high_watermark - Step down (cheaper detection) if the average frame
+#                  processing time exceeds this fraction of the frame
+#                  budget (1 / fps).
+# low_watermark  - Step up (better detection) if the average frame
+#                  processing time is below this fraction of the frame
+#                  budget.
+# window         - The number of frames the processing time is averaged
+#                  over. The governor waits at least this many frames
+#                  after each step before the next step is taken.
+GovernorConfig = namedtuple('GovernorConfig',
+                            ['high_watermark',
+                             'low_watermark',
+                             'window'],
+                            verbose=False)
+
+
+# The governor adapts the detection parameters to the load of the host.
+#
+# Each detector has a parameter ladder: a list of parameter dicts with
+# increasingly cheaper settings. Level 0 is the configured parameters of
+# the detector, level n is the n:th entry of the ladder (entries are
+# cumulative, i.e. a parameter set in one step stays in effect for all
+# following steps unless overridden).
+# The governor keeps one level for all detectors. Detectors with shorter
+# ladders stay at their last step.
+class Governor:
+
+    def __init__(self, config, fps, detectors):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._budget = 1.0 / fps
+        self._high_watermark = config.high_watermark
+        self._low_watermark = config.low_watermark
+        self._window = config.window
+        self._frame_times = deque(maxlen=self._window)
+        self._level = 0
+
+        # Pre-compute the parameters of each level for all detectors
+        self._detector_levels = []
+        self._max_level = 0
+        for detector in detectors:
+            ladder = detector.get_parameter_ladder()
+            if len(ladder) == 0:
+                continue
+            levels = [detector.get_parameters()]
+            for step in ladder:
+                parameters = dict(levels[-1])
+                parameters.update(step)
+                levels.append(parameters)
+            self._detector_levels.append((detector, levels))
+            self._max_level = max(self._max_level, len(ladder))
+
+        self._logger.info("Governor: frame budget {:.1f} ms, {} levels".format(self._budget * 1e3,
+                                                                               self._max_level + 1))
+        metrics.set_gauge('governor_level', self._level)
+
+    # Report the processing time (in seconds) of one frame.
+    def add_frame_time(self, frame_time):
+
+        self._frame_times.append(frame_time)
+        if len(self._frame_times) < self._window:
+            return
+
+        avg_frame_time = sum(self._frame_times) / len(self._frame_times)
+        metrics.set_gauge('governor_avg_frame_time_ms', avg_frame_time * 1e3)
+
+        if (avg_frame_time > self._budget * self._high_watermark and
+            self._level < self._max_level):
+            self._set_level(self._level + 1, avg_frame_time)
+        elif (avg_frame_time < self._budget * self._low_watermark and
+              self._level > 0):
+            self._set_level(self._level - 1, avg_frame_time)
+
+    def get_level(self):
+
+        return self._level
+
+    # Restore the configured parameters (level 0) of all detectors.
+    def reset(self):
+
+        self._level = 0
+        for (detector, levels) in self._detector_levels:
+            detector.set_parameters(levels[0])
+        self._frame_times.clear()
+        metrics.set_gauge('governor_level', self._level)
+
+    def _set_level(self, level, avg_frame_time):
+
+        self._logger.info("Governor: average frame time {:.1f} ms (budget {:.1f} ms). "
+                          "Changing level {} -> {}".format(avg_frame_time * 1e3,
+                                                           self._budget * 1e3,
+                                                           self._level,
+                                                           level))
+        self._level = level
+        for (detector, levels) in self._detector_levels:
+            parameters = levels[min(level, len(levels) - 1)]
+            detector.set_parameters(parameters)
+            self._logger.info("Governor: {} parameters: {}".format(detector.get_name(),
+                                                                 parameters))
+
+        # Start a new measurement window so the effect of the change is
+        # measured before the next step.
+        self._frame_times.clear()
+        metrics.set_gauge('governor_level', self._level)
+        metrics.inc_counter('governor_level_changes')
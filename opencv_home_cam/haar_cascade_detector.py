@@ -1,15 +1,102 @@
 import cv2
+import numpy
 import logging
+import threading
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from .detector import Detector, DetectorException
 
 HaarCascadeDetectorConfig = namedtuple('HaarCascadeDetectorConfig',
                                        ['scale_factor',
                                         'min_neighbours',
                                         'min_size',
-                                        'cascade_file'],
+                                        'cascade_file',
+                                        'parameter_ladder'],
                                        verbose=False)
 
+# scale_factor - The scale step between two levels of the shared image
+#                pyramid (the scale_factor of the cascade configs is not
+#                used).
+# workers      - The number of threads the cascades are run by.
+# cascades     - A tuple of (name, HaarCascadeDetectorConfig) tuples. The
+#                rectangles of each cascade are reported under its name.
+MultiCascadeDetectorConfig = namedtuple('MultiCascadeDetectorConfig',
+                                        ['scale_factor',
+                                         'workers',
+                                         'cascades',
+                                         'parameter_ladder'],
+                                        verbose=False)
+
+# The eps value detectMultiScale groups rectangles with
+GROUP_EPS = 0.2
+
+# The interpolation detectMultiScale scales the frame with (older OpenCV
+# versions use INTER_LINEAR)
+PYRAMID_INTERPOLATION = getattr(cv2, 'INTER_LINEAR_EXACT', cv2.INTER_LINEAR)
+
+
+# Cache of loaded cascades.
+# Parsing a cascade file is slow (the bundled cascades are large XML
+# files), so each file is only parsed once and the classifier is shared by
+# all detectors using the same file.
+# Cascade classifiers are not thread safe. The shared classifier is
+# therefore owned by the first thread using it for detection, and other
+# threads (see TiledDetector) get their own copies.
+_cache_lock = threading.Lock()
+_cascades = {}
+_cascade_owners = {}
+_thread_cascades = threading.local()
+
+
+def _create_cascade(cascade_file):
+
+    cascade = cv2.CascadeClassifier(cascade_file)
+    if cascade.empty():
+        raise DetectorException("Bad cascade file: {}".format(cascade_file))
+    return cascade
+
+
+# Load a cascade into the cache (if it is not already loaded).
+# Can be called from any thread, e.g. in order to load several cascades in
+# parallel during startup.
+def preload_cascade(cascade_file):
+
+    with _cache_lock:
+        if cascade_file in _cascades:
+            return
+
+    cascade = _create_cascade(cascade_file)
+
+    with _cache_lock:
+        _cascades.setdefault(cascade_file, cascade)
+
+
+# Returns a classifier for cascade_file that may be used by the calling
+# thread.
+def get_cascade(cascade_file):
+
+    thread_cascades = getattr(_thread_cascades, 'cascades', None)
+    if thread_cascades is None:
+        thread_cascades = {}
+        _thread_cascades.cascades = thread_cascades
+
+    cascade = thread_cascades.get(cascade_file)
+    if cascade is not None:
+        return cascade
+
+    preload_cascade(cascade_file)
+    with _cache_lock:
+        owner = _cascade_owners.get(cascade_file)
+        if owner is None:
+            _cascade_owners[cascade_file] = threading.get_ident()
+            cascade = _cascades[cascade_file]
+
+    if cascade is None:
+        cascade = _create_cascade(cascade_file)
+
+    thread_cascades[cascade_file] = cascade
+    return cascade
+
 
 class HaarCascadeDetector(Detector):
 
@@ -21,15 +108,173 @@ class HaarCascadeDetector(Detector):
         self._scale_factor = config.scale_factor
         self._min_neighbours = config.min_neighbours
         self._min_size = config.min_size
+        self.set_parameter_ladder(config.parameter_ladder)
 
-        self._cascade = cv2.CascadeClassifier(config.cascade_file)
-        if self._cascade is None:
-            raise DetectorException("Bad cascade file")
+        self._cascade_file = config.cascade_file
+        preload_cascade(self._cascade_file)
 
     def detect(self, frame):
 
-        rects = self._cascade.detectMultiScale(frame,
-                                               scaleFactor=self._scale_factor,
-                                               minNeighbors=self._min_neighbours,
-                                               minSize=(self._min_size, self._min_size))
+        rects = get_cascade(self._cascade_file).detectMultiScale(self._resize_frame(frame),
+                                                                 scaleFactor=self._scale_factor,
+                                                                 minNeighbors=self._min_neighbours,
+                                                                 minSize=(self._min_size, self._min_size))
+        return self._rescale_rects(rects)
+
+    def get_parameters(self):
+
+        parameters = Detector.get_parameters(self)
+        parameters['scale_factor'] = self._scale_factor
+        parameters['min_neighbours'] = self._min_neighbours
+        parameters['min_size'] = self._min_size
+        return parameters
+
+    def set_parameters(self, parameters):
+
+        Detector.set_parameters(self, parameters)
+        if 'scale_factor' in parameters:
+            self._scale_factor = parameters['scale_factor']
+        if 'min_neighbours' in parameters:
+            self._min_neighbours = parameters['min_neighbours']
+        if 'min_size' in parameters:
+            self._min_size = parameters['min_size']
+
+    # Returns the (width, height) of the cascade window
+    def get_window_size(self):
+
+        with _cache_lock:
+            return tuple(_cascades[self._cascade_file].getOriginalWindowSize())
+
+    # Run the cascade on the levels of an image pyramid (see
+    # MultiCascadeDetector). levels is a list of (scale, image) tuples,
+    # sorted by scale.
+    # This is what detectMultiScale does internally: the cascade window
+    # is run (at its original size) on each level, and the raw detections
+    # of all levels are grouped.
+    # Returns a list of rectangles in the coordinates of the unscaled image.
+    def detect_pyramid(self, levels):
+
+        cascade = get_cascade(self._cascade_file)
+        (window_width, window_height) = cascade.getOriginalWindowSize()
+
+        rects = []
+        for (scale, image) in levels:
+            if image.shape[1] < window_width or image.shape[0] < window_height:
+                break
+            if window_width * scale < self._min_size or window_height * scale < self._min_size:
+                continue
+            # detectMultiScale moves the window 2 pixels at a time on the
+            # levels below scale 2, and 1 pixel at a time above. A single
+            # level is always scanned with 2 pixel steps, so above scale 2
+            # the level is scanned once for each of the 4 pixel offsets.
+            # (The result is close to, but not always identical with,
+            # detectMultiScale, which also skips the position after a
+            # window rejected by the first stage.)
+            if scale >= 2.0:
+                offsets = ((0, 0), (1, 0), (0, 1), (1, 1))
+            else:
+                offsets = ((0, 0),)
+            for (dx, dy) in offsets:
+                # minSize and maxSize limit detectMultiScale to this level
+                level_rects = cascade.detectMultiScale(image[dy:, dx:],
+                                                       scaleFactor=self._scale_factor,
+                                                       minNeighbors=0,
+                                                       minSize=(window_width, window_height),
+                                                       maxSize=(window_width, window_height))
+                for (x, y, w, h) in level_rects:
+                    rects.append([int(round((x + dx) * scale)), int(round((y + dy) * scale)),
+                                  int(round(w * scale)), int(round(h * scale))])
+
+        if self._min_neighbours > 0 and len(rects) > 0:
+            (rects, weights) = cv2.groupRectangles(rects, self._min_neighbours, GROUP_EPS)
         return rects
+
+
+# A multi cascade detector runs several Haar cascades on the same frame.
+# The image pyramid (the scaled copies of the frame) is built once per
+# frame and shared by all cascades, instead of once per cascade as with
+# separate haar detectors. The cascades are run in parallel by a thread
+# pool (OpenCV releases the GIL during detection).
+# The rectangles of each cascade are reported under the name of the
+# cascade (the haar detector section it was configured in), so actions,
+# non-maximum suppression and fusion work as with separate detectors.
+# The zones of the cascade sections only filter the rectangles (the frame
+# area processed is set by the zones of the multi detector section), and
+# the parameter ladder is the one of the multi detector section.
+class MultiCascadeDetector(Detector):
+
+    def __init__(self, name, config):
+
+        Detector.__init__(self,
+                          name=name)
+
+        self._scale_factor = config.scale_factor
+        self.set_parameter_ladder(config.parameter_ladder)
+
+        self._cascades = [HaarCascadeDetector(name=cascade_name, config=cascade_cfg)
+                          for (cascade_name, cascade_cfg) in config.cascades]
+        # The pyramid ends where the smallest window no longer fits
+        window_sizes = [cascade.get_window_size() for cascade in self._cascades]
+        self._min_window_size = (min(w for (w, h) in window_sizes),
+                                 min(h for (w, h) in window_sizes))
+        if config.workers > 1 and len(self._cascades) > 1:
+            self._executor = ThreadPoolExecutor(max_workers=config.workers)
+        else:
+            self._executor = None
+
+    def get_output_colors(self):
+
+        colors = {}
+        for cascade in self._cascades:
+            colors[cascade.get_name()] = cascade.get_rgb_tuple()
+        return colors
+
+    # Returns the rectangles of all cascades
+    def detect(self, frame):
+
+        rects = [r for (r, scores) in self.detect_named_with_scores(frame).values() if len(r) > 0]
+        if len(rects) == 0:
+            return []
+        return numpy.concatenate(rects)
+
+    def detect_named_with_scores(self, frame):
+
+        levels = self._build_pyramid(self._resize_frame(frame))
+        if self._executor is not None:
+            results = list(self._executor.map(lambda cascade: cascade.detect_pyramid(levels),
+                                              self._cascades))
+        else:
+            results = [cascade.detect_pyramid(levels) for cascade in self._cascades]
+
+        detections = {}
+        for (cascade, rects) in zip(self._cascades, results):
+            rects = self._rescale_rects(numpy.asarray(rects, dtype=numpy.int32).reshape(-1, 4))
+            detections[cascade.get_name()] = (rects, numpy.ones(len(rects)))
+        return detections
+
+    # Returns a list of (scale, image) tuples. Like in detectMultiScale,
+    # each level is scaled from the frame (not from the previous level).
+    def _build_pyramid(self, frame):
+
+        (height, width) = frame.shape[:2]
+        levels = [(1.0, frame)]
+        scale = self._scale_factor
+        while True:
+            size = (int(round(width / scale)), int(round(height / scale)))
+            if size[0] < self._min_window_size[0] or size[1] < self._min_window_size[1]:
+                break
+            levels.append((scale, cv2.resize(frame, size, interpolation=PYRAMID_INTERPOLATION)))
+            scale *= self._scale_factor
+        return levels
+
+    def get_parameters(self):
+
+        parameters = Detector.get_parameters(self)
+        parameters['scale_factor'] = self._scale_factor
+        return parameters
+
+    def set_parameters(self, parameters):
+
+        Detector.set_parameters(self, parameters)
+        if 'scale_factor' in parameters:
+            self._scale_factor = parameters['scale_factor']
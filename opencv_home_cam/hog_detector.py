@@ -1,4 +1,5 @@
 import cv2
+import numpy
 import logging
 from collections import namedtuple
 from .detector import Detector, DetectorException
@@ -6,7 +7,8 @@ from .detector import Detector, DetectorException
 HogPeopleDetectorConfig = namedtuple('HogPeopleDetectorConfig',
                                      ['scale_factor',
                                       'padding',
-                                      'win_stride'],
+                                      'win_stride',
+                                      'parameter_ladder'],
                                      verbose=False)
 
 
@@ -26,12 +28,36 @@ class HogPeopleDetector(Detector):
         self._scale_factor = config.scale_factor
         self._padding = config.padding
         self._win_stride = config.win_stride
+        self.set_parameter_ladder(config.parameter_ladder)
 
     def detect(self, frame):
 
+        return self.detect_with_scores(frame)[0]
+
+    def detect_with_scores(self, frame):
+
         # detect people in the image
-        (rects, weights) = self._hog.detectMultiScale(frame,
+        (rects, weights) = self._hog.detectMultiScale(self._resize_frame(frame),
                                                       winStride=self._win_stride,
                                                       padding=self._padding,
                                                       scale=self._scale_factor)
-        return rects
+        # The weights are the SVM decision values of the detections
+        return (self._rescale_rects(rects), numpy.asarray(weights).reshape(-1))
+
+    def get_parameters(self):
+
+        parameters = Detector.get_parameters(self)
+        parameters['scale_factor'] = self._scale_factor
+        parameters['padding'] = self._padding
+        parameters['win_stride'] = self._win_stride
+        return parameters
+
+    def set_parameters(self, parameters):
+
+        Detector.set_parameters(self, parameters)
+        if 'scale_factor' in parameters:
+            self._scale_factor = parameters['scale_factor']
+        if 'padding' in parameters:
+            self._padding = parameters['padding']
+        if 'win_stride' in parameters:
+            self._win_stride = parameters['win_stride']
@@ -1,52 +1,26 @@
 import threading
 import logging
-import configparser
 import time
-import ast
-from collections import namedtuple
-import re
+from concurrent.futures import ThreadPoolExecutor
 from .cam_controller import CamController, CamControllerException, DetectionData
-from .camera import Camera, CameraConfig, CameraException
-from .recorder import Recorder, RecorderConfig
-from .detector import Detector
-from .haar_cascade_detector import HaarCascadeDetector, HaarCascadeDetectorConfig
-from .hog_detector import HogPeopleDetector, HogPeopleDetectorConfig
-from .simple_motion_detector import SimpleMotionDetector, SimpleMotionDetectorConfig
-from .action import Action, ActionConfig
-
-
-def cast_string_to_float(s):
-    try:
-        return float(s)
-    except ValueError:
-        return None
-
-
-def cast_string_to_int(s):
-    try:
-        return int(s)
-    except ValueError:
-        return None
-
-
-def cast_string_to_bool(s):
-    if (s.lower() == 'true' or
-        s.lower() == '1' or
-        s.lower() == 'on'):
-        return True
-    elif (s.lower() == 'false' or
-          s.lower() == '0' or
-          s.lower() == 'off'):
-        return False
-    else:
-        return None
-
-
-def cast_string_to_tuple(s):
-    try:
-        return ast.literal_eval(s)
-    except ValueError:
-        return None
+from .camera import Camera, CameraException
+from .recorder import Recorder
+from .action import Action
+from .config import HomeCamConfig, ConfigException
+from .detector_factory import create_detector, DetectorFactoryException
+from .haar_cascade_detector import preload_cascade
+from .detector import DetectorException
+from .governor import Governor
+from .black_box import BlackBox, BlackBoxException
+from .publisher import Publisher, PublisherException
+from .event_store import EventStore, EventStoreException, Event
+from .idle_monitor import IdleMonitor
+from .illumination import IlluminationMonitor
+from .detection_cache import DetectionCache
+from .profiler import ProfilingSession
+from .scheduler import DetectionScheduler
+from .timelapse import Timelapse
+from .zones import create_detection_zones, DetectionZoneException
 
 
 class OpenCvHomeCamException(Exception):
@@ -60,13 +34,34 @@ class OpenCvHomeCam:
 
         self._logger = logging.getLogger(__name__)
 
-        self._cp = configparser.ConfigParser()
-        self._cp.read(config_file)
+        # Startup time of each step (in seconds). Logged when the startup
+        # is finished.
+        self._startup_times = []
+        startup_start = time.perf_counter()
+
+        self._config_file = config_file
 
-        self._read_cameras()
-        self._read_recorders()
-        self._read_detectors()
-        self._read_actions()
+        try:
+            self._config = self._timed("config", HomeCamConfig, config_file)
+        except ConfigException as err:
+            raise OpenCvHomeCamException(err)
+
+        self._cameras = self._config.get_cameras()
+        self._recorders = self._config.get_recorders()
+        self._detectors = self._config.get_detectors()
+        self._detector_zones = self._config.get_detector_zones()
+        self._event_store_cfg = self._config.get_event_store()
+        self._preview_cfg = self._config.get_preview()
+        self._governor_cfg = self._config.get_governor()
+        self._idle_monitor_cfg = self._config.get_idle_monitor()
+        self._illumination_cfg = self._config.get_illumination()
+        self._detection_cache_cfg = self._config.get_detection_cache()
+        self._watchdog_cfg = self._config.get_watchdog()
+        self._profiling_cfg = self._config.get_profiling()
+        self._scheduler_cfg = self._config.get_scheduler()
+
+        self._action_entries = self._create_actions(self._config.get_actions(), [])
+        self._actions = [action for (action_cfg, action) in self._action_entries]
 
         if len(self._cameras) == 0:
             # We need at least one camera!
@@ -74,7 +69,22 @@ class OpenCvHomeCam:
 
         # Currently, only one camera is supported.
         camera_cfg = self._cameras[0]
-        camera = Camera(camera_cfg.cam_id)
+
+        # The slow parts of the startup (opening the camera, parsing the
+        # cascade files and probing the recorder codec) are made in
+        # parallel. Each cascade file is only parsed once, even if it is
+        # used by several detectors.
+        executor = ThreadPoolExecutor(max_workers=4)
+        camera_future = executor.submit(self._timed, "camera",
+                                        Camera, camera_cfg.cam_id, camera_cfg.max_width,
+                                        self._watchdog_cfg)
+        cascade_futures = []
+        for cascade_file in set(self._get_cascade_files(camera_cfg, self._detectors)):
+            cascade_futures.append(executor.submit(self._timed,
+                                                   "cascade {}".format(cascade_file),
+                                                   preload_cascade, cascade_file))
+
+        camera = camera_future.result()
         # Get the resolution of the camera. We must use the same resolution
         # for the recorder.
         camera_resolution = camera.get_resolution()
@@ -82,429 +92,564 @@ class OpenCvHomeCam:
         # Find the recorder associated with the camera (if any) and create
         # a recorder object.
         if camera_cfg.recorder in self._recorders:
-            recorder_cfg = self._recorders[camera_cfg.recorder]
-            recorder = Recorder(config=recorder_cfg,
-                                fps=camera_cfg.fps,
-                                resolution=camera_resolution)
+            self._recorder_cfg = self._recorders[camera_cfg.recorder]
+            recorder_future = executor.submit(self._timed, "recorder",
+                                              Recorder,
+                                              config=self._recorder_cfg,
+                                              fps=camera_cfg.fps,
+                                              resolution=camera_resolution)
+        else:
+            self._recorder_cfg = None
+            recorder_future = None
+
+        self._timelapse_cfg = self._get_timelapse_cfg(camera_cfg, self._recorders)
+        if self._timelapse_cfg is not None:
+            timelapse_future = executor.submit(self._timed, "timelapse",
+                                               Timelapse,
+                                               config=self._timelapse_cfg[0],
+                                               interval=self._timelapse_cfg[1],
+                                               fps=camera_cfg.fps,
+                                               resolution=camera_resolution)
+        else:
+            timelapse_future = None
+
+        for cascade_future in cascade_futures:
+            try:
+                cascade_future.result()
+            except DetectorException as err:
+                raise OpenCvHomeCamException(err)
+
+        # The detectors are created sequentially (the cascades are already
+        # loaded), so the detector colors are the same on every startup.
+        self._detector_entries = self._timed("detectors", self._create_detectors,
+                                             camera_cfg, self._config, {})
+        detectors = [self._detector_entries[name][2] for name in camera_cfg.detectors]
+
+        if recorder_future is not None:
+            recorder = recorder_future.result()
         else:
             recorder = None
+        self._recorder = recorder
+        if timelapse_future is not None:
+            timelapse = timelapse_future.result()
+        else:
+            timelapse = None
+        self._timelapse = timelapse
+        executor.shutdown()
 
-        # Find all detectors associated with the camera and create an
-        # array of detector objects.
-        detectors = []
-        for camera_detector in camera_cfg.detectors:
-            detector_cfg = self._detectors[camera_detector]
-            # Check what type of detector this is and create an object of
-            # the corresponding class.
-            if type(detector_cfg).__name__ == 'HaarCascadeDetectorConfig':
-                detector = HaarCascadeDetector(name=camera_detector,
-                                               config=detector_cfg)
-            elif type(detector_cfg).__name__ == 'HogPeopleDetectorConfig':
-                detector = HogPeopleDetector(name=camera_detector,
-                                             config=detector_cfg)
-            elif type(detector_cfg).__name__ == 'SimpleMotionDetectorConfig':
-                detector = SimpleMotionDetector(name=camera_detector,
-                                                config=detector_cfg)
-            else:
-                raise OpenCvHomeCamException("Unknown detector type: {}".format(type(detector_cfg).__name__))
-            detectors.append(detector)
-
-        try:
-            self._cam_controller = CamController(camera=camera,
-                                                 detectors=detectors,
-                                                 recorder=recorder)
-        except CamControllerException as err:
-            raise OpenCvHomeCamException(err)
-
-        self._fps = camera_cfg.fps
-        self._running = False
-        self._latest_detector_status = None
-
-    def _read_cameras(self):
-
-        camera_nbr = 0
-        self._cameras = []
-
-        while True:
-            camera_section = 'camera' + str(camera_nbr)
-            if camera_section not in self._cp:
-                break
-
-            camera_cfg = self._read_camera_config(camera_section)
-            if camera_cfg is None:
-                break
-
-            self._cameras.append(camera_cfg)
-
-            camera_nbr += 1
-
-    def _read_recorders(self):
-
-        recorder_nbr = 0
-        self._recorders = {}
-
-        while True:
-            recorder_section = 'recorder' + str(recorder_nbr)
-            if recorder_section not in self._cp:
-                break
-
-            recorder_cfg = self._read_recorder_config(recorder_section)
-            if recorder_cfg is None:
-                break
-
-            self._recorders[recorder_section] = recorder_cfg
-
-            recorder_nbr += 1
-
-    def _read_actions(self):
-
-        action_nbr = 0
-        self._actions = []
-
-        while True:
-            action_section = 'action' + str(action_nbr)
-            if action_section not in self._cp:
-                break
-
-            action_cfg = self._read_action_config(action_section)
-            if action_cfg is None:
-                break
-
-            action = Action(config=action_cfg)
-            self._actions.append(action)
-
-            action_nbr += 1
-
-    def _read_detectors(self):
-
-        detector_nbr = 0
-        self._detectors = {}
+        if self._idle_monitor_cfg is not None:
+            self._idle_monitor = IdleMonitor(config=self._idle_monitor_cfg)
+        else:
+            self._idle_monitor = None
 
-        while True:
-            detector_section = 'detector' + str(detector_nbr)
-            if detector_section not in self._cp:
-                break
+        if self._illumination_cfg is not None:
+            self._illumination_monitor = IlluminationMonitor(config=self._illumination_cfg)
+        else:
+            self._illumination_monitor = None
 
-            detector_cfg = self._read_detector_config(detector_section)
-            if detector_cfg is None:
-                break
+        if self._detection_cache_cfg is not None:
+            self._detection_cache = DetectionCache(config=self._detection_cache_cfg)
+        else:
+            self._detection_cache = None
 
-            self._detectors[detector_section] = detector_cfg
+        zones = self._create_detection_zones(camera_cfg, camera_resolution,
+                                             self._detectors, self._detector_zones)
 
-            detector_nbr += 1
+        if self._scheduler_cfg is not None:
+            self._scheduler = DetectionScheduler(config=self._scheduler_cfg)
+        else:
+            self._scheduler = None
 
-    def _read_recorder_config(self, recorder_section):
+        # Currently, only one camera is supported, so the camera is always
+        # the first camera section.
+        self._camera_name = 'camera0'
 
-        rec_cfg = self._cp[recorder_section]
+        try:
+            self._cam_controller = CamController(camera=camera,
+                                                 detectors=detectors,
+                                                 recorder=recorder,
+                                                 annotate_frames=self._annotates_frames(self._actions),
+                                                 idle_monitor=self._idle_monitor,
+                                                 zones=zones,
+                                                 nms_thresholds=self._config.get_detector_nms_thresholds(),
+                                                 fusion=self._config.get_fusion(),
+                                                 priorities=self._get_priorities(camera_cfg, self._config),
+                                                 scheduler=self._scheduler,
+                                                 camera_name=self._camera_name,
+                                                 timelapse=timelapse,
+                                                 illumination_monitor=self._illumination_monitor,
+                                                 detection_cache=self._detection_cache,
+                                                 frame_budget=1 / camera_cfg.fps)
+        except CamControllerException as err:
+            raise OpenCvHomeCamException(err)
 
-        if 'file_limit' in rec_cfg:
-            file_limit = cast_string_to_int(rec_cfg['file_limit'])
-            if file_limit is None:
-                raise OpenCvHomeCamException("Config: bad file_limit value!")
+        if self._event_store_cfg is not None:
+            try:
+                self._event_store = self._timed("event store", EventStore,
+                                                config=self._event_store_cfg)
+            except EventStoreException as err:
+                raise OpenCvHomeCamException(err)
+            if recorder is not None:
+                recorder.add_file_removed_listener(self._event_store.remove_recording)
         else:
-            file_limit = 10
-            self._logger.info("Config: Missing file_limit value, using default")
-
-        if 'time_limit' in rec_cfg:
-            time_limit = cast_string_to_int(rec_cfg['time_limit'])
-            if time_limit is None:
-                raise OpenCvHomeCamException("Config: bad time_limit value!")
+            self._event_store = None
+
+        if self._preview_cfg is not None:
+            from .preview_server import PreviewServer, PreviewServerException
+            try:
+                self._preview = self._timed("preview", PreviewServer,
+                                            config=self._preview_cfg)
+            except PreviewServerException as err:
+                raise OpenCvHomeCamException(err)
         else:
-            time_limit = 60
-            self._logger.info("Config: Missing time_limit value, using default")
-
-        if 'recording_dir' in rec_cfg:
-            recording_dir = rec_cfg['recording_dir']
-            if recording_dir is None:
-                raise OpenCvHomeCamException("Config: Bad output directory path!")
+            self._preview = None
+
+        self._black_box_cfg = self._config.get_black_box()
+        if self._black_box_cfg is not None:
+            try:
+                self._black_box = BlackBox(config=self._black_box_cfg,
+                                           fps=camera_cfg.fps,
+                                           colors=self._cam_controller.get_colors())
+            except BlackBoxException as err:
+                raise OpenCvHomeCamException(err)
+            self._cam_controller.set_black_box(self._black_box)
+        else:
+            self._black_box = None
+
+        self._publisher_cfg = self._config.get_publisher()
+        if self._publisher_cfg is not None:
+            try:
+                self._publisher = Publisher(config=self._publisher_cfg)
+            except PublisherException as err:
+                raise OpenCvHomeCamException(err)
         else:
-            raise OpenCvHomeCamException("Config: Missing recording_dir value!")
+            self._publisher = None
 
-        if 'recording_file_base' in rec_cfg:
-            recording_file_base = rec_cfg['recording_file_base']
-            if recording_file_base is None:
-                raise OpenCvHomeCamException("Config: Bad output file base!")
+        if self._governor_cfg is not None:
+            self._governor = Governor(config=self._governor_cfg,
+                                      fps=camera_cfg.fps,
+                                      detectors=detectors)
         else:
-            raise OpenCvHomeCamException("Config: Missing recording_file_base value!")
+            self._governor = None
 
-        recorder_config = RecorderConfig(file_limit=file_limit,
-                                         time_limit=time_limit,
-                                         directory=recording_dir,
-                                         file_base=recording_file_base)
-        return recorder_config
+        self._camera_cfg = camera_cfg
+        self._camera_resolution = camera_resolution
+        self._fps = camera_cfg.fps
+        self._reload_lock = threading.Lock()
+        self._pending_reload_lock = threading.Lock()
+        self._pending_reload = None
+        # Incremented each time a reload is applied
+        self._reload_generation = 0
+        self._profiling_requested = False
+        self._profiling = None
+        self._running = False
+        self._latest_detector_status = None
+        self._object_detected = False
+        self._track_ids = {}
 
-    def _read_camera_config(self, camera_section):
+        self._startup_times.append(("total", time.perf_counter() - startup_start))
+        self._logger.info("Startup times: {}".format(", ".join(["{} {:.0f} ms".format(step, t * 1e3)
+                                                                for (step, t) in self._startup_times])))
 
-        camera_cfg = self._cp[camera_section]
+    # Call func and record its execution time in the startup times.
+    def _timed(self, step, func, *args, **kwargs):
 
-        if 'id' in camera_cfg:
-            cam_id = camera_cfg['id']
-            if cam_id is None:
-                raise OpenCvHomeCamException("Config: bad cam_id value!")
-        else:
-            cam_id = 0
-            self._logger.info("Config: Missing cam_id value, using default")
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self._startup_times.append((step, time.perf_counter() - start))
+        return result
 
-        if 'fps' in camera_cfg:
-            fps = cast_string_to_float(camera_cfg['fps'])
-            if fps is None:
-                raise OpenCvHomeCamException("Config: bad fps value!")
-        else:
-            fps = 20.0
-            self._logger.info("Config: Missing fps value, using default")
-
-        if 'recorder' in camera_cfg:
-            recorder = camera_cfg['recorder']
-            if recorder is None:
-                raise OpenCvHomeCamException("Config: bad recorder!")
-            if recorder not in self._cp:
-                raise OpenCvHomeCamException("Config: {}: Missing section for {} in config file!".format(camera_section, recorder))
-        else:
-            recorder = None
-            self._logger.info("Config: No recorders for {}".format(camera_section))
-
-        detectors = []
-        if 'detectors' in camera_cfg:
-            detectors_str = camera_cfg['detectors']
-            if detectors_str is None:
-                raise OpenCvHomeCamException("Config: bad detectors!")
-            detectors_str_a = detectors_str.split(",")
-            for detector in detectors_str_a:
-                # Make sure the detector exists in the config file
-                if detector not in self._cp:
-                    raise OpenCvHomeCamException("Config: {}: Missing section for detector {} in config file!".format(camera_section, detector))
-                detectors.append(detector)
-        else:
-            self._logger.info("Missing detectors for {}".format(camera_section))
-            self._logger.info("No object detection will be performed for this camera.")
-
-        camera_config = CameraConfig(cam_id=cam_id,
-                                     fps=fps,
-                                     recorder=recorder,
-                                     detectors=detectors)
-        return camera_config
-
-    def _read_detector_config(self, detector_section):
-
-        detection_cfg = self._cp[detector_section]
-
-        if 'detector_type' in detection_cfg:
-            detector_type = detection_cfg['detector_type']
-            if detector_type is None:
-                raise OpenCvHomeCamException("Config: bad detector_type value!")
-            if (detector_type.lower() == 'haar'):
-                return self._read_haar_cascade_detector_config(detector_section)
-            elif (detector_type.lower() == 'hog-people'):
-                return self._read_hog_people_detector_config(detector_section)
-            elif (detector_type.lower() == 'simple-motion'):
-                return self._read_simple_motion_detector_config(detector_section)
-            else:
-                raise OpenCvHomeCamException("Config: invalid detector_type: {}!".format(detector_type))
-        else:
-            raise OpenCvHomeCamException("Config: Missing detector_type for {}!".format(detector_section))
+    # Returns a (RecorderConfig, interval) tuple for the timelapse of a
+    # camera, or None if the camera has no timelapse.
+    def _get_timelapse_cfg(self, camera_cfg, recorders):
 
-    def _read_haar_cascade_detector_config(self, detector_section):
+        if camera_cfg.timelapse is None:
+            return None
+        if camera_cfg.timelapse not in recorders:
+            raise OpenCvHomeCamException("The timelapse of a camera must be a recorder section")
+        return (recorders[camera_cfg.timelapse], camera_cfg.timelapse_interval)
 
-        detection_cfg = self._cp[detector_section]
+    # Returns a dict with the scheduler priority class of each detector of
+    # a camera (the camera priority plus the detector priority).
+    def _get_priorities(self, camera_cfg, config):
 
-        if 'cascade' in detection_cfg:
-            cascade_str = detection_cfg['cascade']
-            if cascade_str is None:
-                raise OpenCvHomeCamException("Config: bad cascade!")
-        else:
-            raise OpenCvHomeCamException("Config: Missing cascade file!")
+        detector_priorities = config.get_detector_priorities()
+        return dict((name, camera_cfg.priority + detector_priorities.get(name, 0))
+                    for name in camera_cfg.detectors)
 
-        if 'scale_factor' in detection_cfg:
-            scale_factor = cast_string_to_float(detection_cfg['scale_factor'])
-            if scale_factor is None:
-                raise OpenCvHomeCamException("Config: bad scale_factor value!")
-        else:
-            scale_factor = 1.1
-            self._logger.info("Config: Missing scale_factor value, using default")
+    def _get_cascade_files(self, camera_cfg, detectors):
 
-        if 'min_neighbours' in detection_cfg:
-            min_neighbours = cast_string_to_int(detection_cfg['min_neighbours'])
-            if min_neighbours is None:
-                raise OpenCvHomeCamException("Config: bad min_neighbours value!")
-        else:
-            min_neighbours = 3
-            self._logger.info("Config: Missing min_neighbours value, using default")
+        cascade_files = []
+        for camera_detector in camera_cfg.detectors:
+            detector_cfg = detectors[camera_detector]
+            if type(detector_cfg).__name__ == 'HaarCascadeDetectorConfig':
+                cascade_files.append(detector_cfg.cascade_file)
+            elif type(detector_cfg).__name__ == 'MultiCascadeDetectorConfig':
+                cascade_files.extend(cascade_cfg.cascade_file for (name, cascade_cfg) in detector_cfg.cascades)
+        return cascade_files
 
-        if 'size' in detection_cfg:
-            min_size = cast_string_to_int(detection_cfg['size'])
-            if min_size is None:
-                raise OpenCvHomeCamException("Config: bad size value!")
-        else:
-            min_size = 3
-            self._logger.info("Config: Missing size value, using default")
+    # Returns the names of the detectors combined into the detectors of the
+    # camera (the cascades of haar-multi detectors).
+    def _get_combined_detectors(self, camera_cfg, detectors):
 
-        detector_config = HaarCascadeDetectorConfig(scale_factor=scale_factor,
-                                                    min_neighbours=min_neighbours,
-                                                    min_size=min_size,
-                                                    cascade_file=cascade_str)
-        return detector_config
+        combined_detectors = []
+        for camera_detector in camera_cfg.detectors:
+            detector_cfg = detectors[camera_detector]
+            if type(detector_cfg).__name__ == 'MultiCascadeDetectorConfig':
+                combined_detectors.extend(name for (name, cascade_cfg) in detector_cfg.cascades)
+        return combined_detectors
+
+    # Create the detectors of a camera.
+    # current is a dict with the (detector config, tiling config, detector)
+    # tuples of the running detectors (detector name is the dict key).
+    # Running detectors with unchanged configuration are reused (and keep
+    # their state), all other detectors are created.
+    # Returns a dict of the same format as current.
+    def _create_detectors(self, camera_cfg, config, current):
+
+        detectors = config.get_detectors()
+        detector_tilings = config.get_detector_tilings()
+
+        entries = {}
+        for camera_detector in camera_cfg.detectors:
+            detector_cfg = detectors[camera_detector]
+            tiling_cfg = detector_tilings.get(camera_detector)
+            entry = current.get(camera_detector)
+            if entry is not None and entry[0] == detector_cfg and entry[1] == tiling_cfg:
+                entries[camera_detector] = entry
+                continue
+            try:
+                detector = create_detector(name=camera_detector,
+                                           config=detector_cfg,
+                                           tiling_cfg=tiling_cfg)
+            except DetectorFactoryException as err:
+                raise OpenCvHomeCamException(err)
+            entries[camera_detector] = (detector_cfg, tiling_cfg, detector)
+        return entries
+
+    # Create the actions.
+    # current is a list of (action config, action) tuples of the running
+    # actions. Running actions with unchanged configuration are reused
+    # (and keep their cool-down state).
+    # Returns a list of the same format as current.
+    def _create_actions(self, action_cfgs, current):
+
+        unused = list(current)
+        entries = []
+        for action_cfg in action_cfgs:
+            for entry in unused:
+                if entry[0] == action_cfg:
+                    unused.remove(entry)
+                    break
+            else:
+                entry = (action_cfg, Action(config=action_cfg))
+            entries.append(entry)
+        return entries
 
-    def _read_hog_people_detector_config(self, detector_section):
+    # Annotated frames are only needed if some action is going to save
+    # the frame.
+    def _annotates_frames(self, actions):
 
-        detection_cfg = self._cp[detector_section]
+        for action in actions:
+            if action.saves_frame():
+                return True
+        return False
 
-        if 'scale_factor' in detection_cfg:
-            scale_factor = cast_string_to_float(detection_cfg['scale_factor'])
-            if scale_factor is None:
-                raise OpenCvHomeCamException("Config: bad scale_factor value!")
-        else:
-            scale_factor = 1.05
-            self._logger.info("Config: Missing scale_factor value, using default")
+    # Rasterize the zones of all detectors of a camera.
+    # Returns a dict of DetectionZones (detector name is the dict key).
+    def _create_detection_zones(self, camera_cfg, resolution, detectors, detector_zones):
 
-        if 'padding' in detection_cfg:
-            padding = cast_string_to_tuple(detection_cfg['padding'])
-            if padding is None:
-                raise OpenCvHomeCamException("Config: bad padding value!")
-        else:
-            padding = (8, 8)
-            self._logger.info("Config: Missing padding value, using default")
+        try:
+            zones = create_detection_zones(camera_cfg, resolution, detector_zones,
+                                           self._get_combined_detectors(camera_cfg, detectors))
+        except DetectionZoneException as err:
+            raise OpenCvHomeCamException(err)
 
-        if 'win_stride' in detection_cfg:
-            win_stride = cast_string_to_tuple(detection_cfg['win_stride'])
-            if win_stride is None:
-                raise OpenCvHomeCamException("Config: bad win_stride value!")
-        else:
-            win_stride = (4, 4)
-            self._logger.info("Config: Missing win_stride value, using default")
+        for detector_name, zone in zones.items():
+            self._logger.info("Detection zone of {}: bounding box {}, {:.0f} % of the frame".format(detector_name,
+                                                                                                   zone.get_bounding_box(),
+                                                                                                   zone.get_area_fraction() * 100))
+        return zones
 
-        detector_config = HogPeopleDetectorConfig(scale_factor=scale_factor,
-                                                  win_stride=win_stride,
-                                                  padding=padding)
-        return detector_config
+    # Reload the configuration file (e.g. on SIGHUP).
+    #
+    # The new configuration is parsed, and the changed detectors, actions
+    # and recorder are created, in a separate thread. Unchanged detectors
+    # and actions are reused. The frame processing thread then swaps in
+    # the new objects between two frames, so no frames are dropped and the
+    # camera is never reopened.
+    # If the new configuration is invalid, the current configuration is
+    # kept.
+    def reload(self):
 
-    def _read_simple_motion_detector_config(self, detector_section):
+        threading.Thread(target=self._prepare_reload).start()
 
-        detection_cfg = self._cp[detector_section]
+    # Start (or stop) a profiling window (e.g. on SIGUSR1).
+    # Only sets a flag, so it can be called from a signal handler. The
+    # frame processing thread starts the profiling before the next frame.
+    def toggle_profiling(self):
 
-        if 'diff_threshold' in detection_cfg:
-            diff_threshold = cast_string_to_float(detection_cfg['diff_threshold'])
-            if diff_threshold is None:
-                raise OpenCvHomeCamException("Config: bad diff_threshold value!")
-        else:
-            diff_threshold = 5.0
-            self._logger.info("Config: Missing scale_factor value, using default")
+        self._profiling_requested = True
 
-        if 'blurring_size' in detection_cfg:
-            blurring_size = cast_string_to_int(detection_cfg['blurring_size'])
-            if blurring_size is None:
-                raise OpenCvHomeCamException("Config: bad blurring_size value!")
-        else:
-            blurring_size = 21
-            self._logger.info("Config: Missing scale_factor value, using default")
+    def _toggle_profiling(self):
 
-        if 'object_min_area' in detection_cfg:
-            object_min_area = cast_string_to_int(detection_cfg['object_min_area'])
-            if object_min_area is None:
-                raise OpenCvHomeCamException("Config: bad object_min_area value!")
-        else:
-            object_min_area = 100
-            self._logger.info("Config: Missing scale_factor value, using default")
+        self._profiling_requested = False
+        if self._profiling is not None:
+            self._stop_profiling()
+            return
 
-        if 'pixel_intensity_threshold' in detection_cfg:
-            pixel_intensity_threshold = cast_string_to_int(detection_cfg['pixel_intensity_threshold'])
-            if pixel_intensity_threshold is None:
-                raise OpenCvHomeCamException("Config: bad pixel_intensity_threshold value!")
-        else:
-            pixel_intensity_threshold = 25
-            self._logger.info("Config: Missing pixel intensity value, using default")
+        self._profiling = ProfilingSession(self._profiling_cfg)
+        self._profiling.start(self._cam_controller.get_stage_times())
 
-        detector_config = SimpleMotionDetectorConfig(diff_threshold=diff_threshold,
-                                                     blurring_size=blurring_size,
-                                                     object_min_area=object_min_area,
-                                                     pixel_intensity_threshold=pixel_intensity_threshold)
-        return detector_config
+    def _stop_profiling(self):
 
-    def _read_action_config(self, action_section):
+        try:
+            self._profiling.stop(self._cam_controller.get_stage_times())
+        except IOError as err:
+            self._logger.error("Unable to write profiling report: {}".format(err))
+        self._profiling = None
+
+    # The new configuration is compared with the applied configuration. If
+    # a previous reload is applied while the new one is prepared, the new
+    # one is discarded and prepared again. A prepared reload that is
+    # superseded before it is applied is discarded.
+    def _prepare_reload(self):
+
+        with self._reload_lock:
+            start = time.perf_counter()
+            while True:
+                with self._pending_reload_lock:
+                    generation = self._reload_generation
+                try:
+                    config = HomeCamConfig(self._config_file)
+                    pending_reload = self._create_reload(config)
+                except (ConfigException, OpenCvHomeCamException) as err:
+                    self._logger.error("Reload failed: {}. Keeping the current configuration".format(err))
+                    return
+                with self._pending_reload_lock:
+                    if generation == self._reload_generation:
+                        superseded_reload = self._pending_reload
+                        self._pending_reload = pending_reload
+                        break
+                self._logger.info("Reload: the configuration changed while preparing, preparing again")
+                self._discard_reload(pending_reload)
+
+            if superseded_reload is not None:
+                self._logger.info("Reload: discarding the previous configuration (never applied)")
+                self._discard_reload(superseded_reload)
+            self._logger.info("Reload: new configuration prepared in {:.0f} ms".format((time.perf_counter() - start) * 1e3))
+
+    # Close the objects created for a reload that is not applied. Objects
+    # reused from the running configuration are left untouched.
+    def _discard_reload(self, pending_reload):
+
+        for obj in pending_reload['created']:
+            obj.close()
+
+    # Create all objects affected by a new configuration.
+    # The running objects are compared with the new configuration, and
+    # only changed objects are created. Nothing is changed in the running
+    # configuration.
+    # Returns a dict with the objects and configs to swap in (see
+    # _apply_reload). The created objects that must be closed if the reload
+    # is not applied are listed under 'created'.
+    def _create_reload(self, config):
+
+        cameras = config.get_cameras()
+        if len(cameras) == 0:
+            raise OpenCvHomeCamException("No cameras specified. Add at least one camera section")
+        camera_cfg = cameras[0]
+
+        # The camera is not reopened
+        if (camera_cfg.cam_id != self._camera_cfg.cam_id or
+            camera_cfg.max_width != self._camera_cfg.max_width):
+            self._logger.warning("Reload: camera id and max_width changes require a restart")
+            camera_cfg = camera_cfg._replace(cam_id=self._camera_cfg.cam_id,
+                                             max_width=self._camera_cfg.max_width)
+        if config.get_event_store() != self._event_store_cfg:
+            self._logger.warning("Reload: event_store changes require a restart")
+        if config.get_preview() != self._preview_cfg:
+            self._logger.warning("Reload: preview changes require a restart")
+        if config.get_black_box() != self._black_box_cfg:
+            self._logger.warning("Reload: black_box changes require a restart")
+        if config.get_publisher() != self._publisher_cfg:
+            self._logger.warning("Reload: publisher changes require a restart")
+        if config.get_watchdog() != self._watchdog_cfg:
+            self._logger.warning("Reload: watchdog changes require a restart")
+        if config.get_profiling() != self._profiling_cfg:
+            self._logger.warning("Reload: profiling changes require a restart")
+        if config.get_scheduler() != self._scheduler_cfg:
+            self._logger.warning("Reload: scheduler changes require a restart")
+
+        for cascade_file in set(self._get_cascade_files(camera_cfg, config.get_detectors())):
+            try:
+                preload_cascade(cascade_file)
+            except DetectorException as err:
+                raise OpenCvHomeCamException(err)
+
+        detector_entries = self._create_detectors(camera_cfg, config, self._detector_entries)
+        detectors = [detector_entries[name][2] for name in camera_cfg.detectors]
+        for name in camera_cfg.detectors:
+            if detector_entries[name] is not self._detector_entries.get(name):
+                self._logger.info("Reload: detector {} created".format(name))
+
+        created = []
+
+        recorder_cfg = config.get_recorders().get(camera_cfg.recorder)
+        recorder = self._recorder
+        if recorder_cfg != self._recorder_cfg or camera_cfg.fps != self._camera_cfg.fps:
+            self._logger.info("Reload: recorder changed")
+            if recorder_cfg is not None:
+                recorder = Recorder(config=recorder_cfg,
+                                    fps=camera_cfg.fps,
+                                    resolution=self._camera_resolution)
+                created.append(recorder)
+                if self._event_store is not None:
+                    recorder.add_file_removed_listener(self._event_store.remove_recording)
+            else:
+                recorder = None
+
+        timelapse_cfg = self._get_timelapse_cfg(camera_cfg, config.get_recorders())
+        timelapse = self._timelapse
+        if timelapse_cfg != self._timelapse_cfg or camera_cfg.fps != self._camera_cfg.fps:
+            self._logger.info("Reload: timelapse changed")
+            if timelapse_cfg is not None:
+                timelapse = Timelapse(config=timelapse_cfg[0],
+                                      interval=timelapse_cfg[1],
+                                      fps=camera_cfg.fps,
+                                      resolution=self._camera_resolution)
+                created.append(timelapse)
+            else:
+                timelapse = None
 
-        action_cfg = self._cp[action_section]
+        action_entries = self._create_actions(config.get_actions(), self._action_entries)
+        actions = [action for (action_cfg, action) in action_entries]
 
-        if 'command' in action_cfg:
-            command = action_cfg['command']
-            if command is None:
-                raise OpenCvHomeCamException("Bad command for section {}!".format(action_section))
-        else:
-            raise OpenCvHomeCamException("Missing command for section {}!".format(action_section))
-
-        detectors = []
-        if 'detectors' in action_cfg:
-            detectors_str = action_cfg['detectors']
-            if detectors_str is None:
-                raise OpenCvHomeCamException("Config: bad detectors!")
-            detectors_str_a = detectors_str.split(",")
-            for detector in detectors_str_a:
-                # Make sure the detector exists in the config file
-                if detector not in self._cp:
-                    raise OpenCvHomeCamException("Config: {}: Missing section for detector {} in config file!".format(action_section, detector))
-                detectors.append(detector)
-        else:
-            self._logger.info("Missing detectors for {}".format(action_section))
-            self._logger.info("Action will be invoked for all detectors.")
-
-        if 'triggers' in action_cfg:
-            triggers_str = action_cfg['triggers']
-            if triggers_str is None:
-                raise OpenCvHomeCamException("Config: bad trigger!")
-            trigger_detection = False
-            trigger_no_detection = False
-            triggers = triggers_str.split(",")
-            for trigger in triggers:
-                trigger.strip()
-                # We accept a few different string values for triggers.
-                # Detection triggers:
-                if (trigger.lower() == 'detect' or
-                    trigger.lower() == 'detection' or
-                    trigger.lower() == 'match'):
-                    trigger_detection = True
-                # Non-detection triggers:
-                elif (trigger.lower() == 'undetect' or
-                      trigger.lower() == 'no-detect' or
-                      trigger.lower() == 'no-match'):
-                    trigger_no_detection = True
-        else:
-            self._logger.info("Missing triggers for section {}".format(action_section))
-            self._logger.info("Using default triggers")
-            trigger_detection = True
-            trigger_no_detection = False
-
-        if 'save_frame' in action_cfg:
-            save_frame = cast_string_to_bool(action_cfg['save_frame'])
-            if save_frame is None:
-                raise OpenCvHomeCamException("Config: Bad save_frame option for section {}!".format(action_section))
-        else:
-            self._logger.info("Missing save_frame option for section {}".format(action_section))
-            self._logger.info("Skipping detection frame saving")
-            save_frame = False
-
-        if 'save_frame_dir' in action_cfg:
-            save_frame_dir = action_cfg['save_frame_dir']
-            if save_frame_dir is None:
-                raise OpenCvHomeCamException("Config: Bad save_frame_dir option for section {}!".format(action_section))
-        else:
-            save_frame_dir = "/tmp"
-            self._logger.info("Missing save_frame_dir option for section {}".format(action_section))
-            self._logger.info("Using default dir: {}".format(save_frame_dir))
-
-        if 'cool_down_time' in action_cfg:
-            cool_down_time = cast_string_to_float(action_cfg['cool_down_time'])
-            if cool_down_time is None:
-                raise OpenCvHomeCamException("Config: bad cool_down_time value!")
-        else:
-            cool_down_time = 0.0
-            self._logger.info("Config: Missing cool_down_time value, using default")
-
-        action_config = ActionConfig(command=command,
-                                     detectors=detectors,
-                                     trigger_detection=trigger_detection,
-                                     trigger_no_detection=trigger_no_detection,
-                                     save_frame=save_frame,
-                                     save_frame_dir=save_frame_dir,
-                                     cool_down_time=cool_down_time)
-        return action_config
+        idle_monitor_cfg = config.get_idle_monitor()
+        idle_monitor = self._idle_monitor
+        if idle_monitor_cfg != self._idle_monitor_cfg:
+            self._logger.info("Reload: idle monitor changed")
+            if idle_monitor_cfg is not None:
+                idle_monitor = IdleMonitor(config=idle_monitor_cfg)
+            else:
+                idle_monitor = None
+
+        illumination_cfg = config.get_illumination()
+        illumination_monitor = self._illumination_monitor
+        if illumination_cfg != self._illumination_cfg:
+            self._logger.info("Reload: illumination monitor changed")
+            if illumination_cfg is not None:
+                illumination_monitor = IlluminationMonitor(config=illumination_cfg)
+            else:
+                illumination_monitor = None
+
+        detection_cache_cfg = config.get_detection_cache()
+        detection_cache = self._detection_cache
+        if detection_cache_cfg != self._detection_cache_cfg:
+            self._logger.info("Reload: detection cache changed")
+            if detection_cache_cfg is not None:
+                detection_cache = DetectionCache(config=detection_cache_cfg)
+            else:
+                detection_cache = None
+
+        governor_cfg = config.get_governor()
+        governor_changed = (governor_cfg != self._governor_cfg or
+                            camera_cfg.fps != self._camera_cfg.fps or
+                            detector_entries != self._detector_entries)
+
+        zones = self._create_detection_zones(camera_cfg, self._camera_resolution,
+                                             config.get_detectors(), config.get_detector_zones())
+
+        return {'config': config,
+                'camera_cfg': camera_cfg,
+                'detector_entries': detector_entries,
+                'recorder_cfg': recorder_cfg,
+                'timelapse_cfg': timelapse_cfg,
+                'action_entries': action_entries,
+                'idle_monitor_cfg': idle_monitor_cfg,
+                'illumination_cfg': illumination_cfg,
+                'detection_cache_cfg': detection_cache_cfg,
+                'created': created,
+                'fps': camera_cfg.fps,
+                'detectors': detectors,
+                'recorder': recorder,
+                'timelapse': timelapse,
+                'actions': actions,
+                'idle_monitor': idle_monitor,
+                'illumination_monitor': illumination_monitor,
+                'detection_cache': detection_cache,
+                'zones': zones,
+                'nms_thresholds': config.get_detector_nms_thresholds(),
+                'fusion': config.get_fusion(),
+                'priorities': self._get_priorities(camera_cfg, config),
+                'governor_cfg': governor_cfg,
+                'governor_changed': governor_changed}
+
+    # Swap in the objects of a prepared reload.
+    # Called by the frame processing thread between two frames.
+    def _apply_reload(self):
+
+        with self._pending_reload_lock:
+            pending_reload = self._pending_reload
+            self._pending_reload = None
+
+        old_recorder = self._cam_controller.get_recorder()
+        old_timelapse = self._cam_controller.get_timelapse()
+        try:
+            self._cam_controller.reconfigure(detectors=pending_reload['detectors'],
+                                             recorder=pending_reload['recorder'],
+                                             annotate_frames=self._annotates_frames(pending_reload['actions']),
+                                             idle_monitor=pending_reload['idle_monitor'],
+                                             zones=pending_reload['zones'],
+                                             nms_thresholds=pending_reload['nms_thresholds'],
+                                             fusion=pending_reload['fusion'],
+                                             priorities=pending_reload['priorities'],
+                                             timelapse=pending_reload['timelapse'],
+                                             illumination_monitor=pending_reload['illumination_monitor'],
+                                             detection_cache=pending_reload['detection_cache'],
+                                             frame_budget=1 / pending_reload['fps'])
+        except CamControllerException as err:
+            self._logger.error("Reload failed: {}".format(err))
+            self._discard_reload(pending_reload)
+            return
+
+        if old_recorder is not None and old_recorder is not pending_reload['recorder']:
+            # Finalize the current recording of the old recorder
+            old_recorder.close()
+        if old_timelapse is not None and old_timelapse is not pending_reload['timelapse']:
+            old_timelapse.close()
+
+        if pending_reload['governor_changed']:
+            if self._governor is not None:
+                self._governor.reset()
+            if pending_reload['governor_cfg'] is not None:
+                self._governor = Governor(config=pending_reload['governor_cfg'],
+                                          fps=pending_reload['fps'],
+                                          detectors=pending_reload['detectors'])
+            else:
+                self._governor = None
+
+        # The applied configuration is the base for the next reload
+        with self._pending_reload_lock:
+            self._config = pending_reload['config']
+            self._camera_cfg = pending_reload['camera_cfg']
+            self._detector_entries = pending_reload['detector_entries']
+            self._recorder_cfg = pending_reload['recorder_cfg']
+            self._recorder = pending_reload['recorder']
+            self._timelapse_cfg = pending_reload['timelapse_cfg']
+            self._timelapse = pending_reload['timelapse']
+            self._action_entries = pending_reload['action_entries']
+            self._actions = pending_reload['actions']
+            self._idle_monitor_cfg = pending_reload['idle_monitor_cfg']
+            self._idle_monitor = pending_reload['idle_monitor']
+            self._illumination_cfg = pending_reload['illumination_cfg']
+            self._illumination_monitor = pending_reload['illumination_monitor']
+            self._detection_cache_cfg = pending_reload['detection_cache_cfg']
+            self._detection_cache = pending_reload['detection_cache']
+            self._governor_cfg = pending_reload['governor_cfg']
+            self._fps = pending_reload['fps']
+            self._reload_generation += 1
+        self._logger.info("Reload: new configuration applied")
 
     def start(self):
 
@@ -522,51 +667,162 @@ class OpenCvHomeCam:
 
     def _process_frames(self):
 
-        object_detected = False
-
         while self._running:
 
-            detection_data = self._cam_controller.read_and_process_frame()
-
-            if self._latest_detector_status is None:
-                # Special case: Initially we don't have any saved detector
-                # status, so we use the detectors from first processed frames
-                # for initialization.
-                self._latest_detector_status = {}
-                for detector_name in detection_data.detector_status:
-                    self._latest_detector_status[detector_name] = False
-
-            for detector_name, status in detection_data.detector_status.items():
-                if status != self._latest_detector_status[detector_name]:
-                    # The detection status of the current detector has changed
-                    if status:
-                        self._logger.info("Detector: {} has detected (an) object(s)".format(detector_name))
-                        self._logger.info("  Rectangles:")
-                        for rectangle in detection_data.rectangles[detector_name]:
-                            self._logger.info("    {}".format(rectangle))
-                    else:
-                        self._logger.info("Detector: {} no longer detects any object(s)".format(detector_name))
-
-                    for action in self._actions:
-                        action.invoke(status, detector_name, detection_data.frame)
-
-            self._latest_detector_status = detection_data.detector_status
-
-            object_detected_new = False
-            for detector_name, status in self._latest_detector_status.items():
+            loop_start = time.perf_counter()
+            loop_cpu_start = time.process_time()
+            idle = self.is_idle()
+
+            for (action, status, detector_name, frame) in self.process_frame():
+                action.invoke(status, detector_name, frame)
+
+            time.sleep(self.get_frame_interval())
+
+            self.add_loop_time(idle,
+                               time.process_time() - loop_cpu_start,
+                               time.perf_counter() - loop_start)
+
+        self.close()
+
+    # Process one frame: capture, detection, recording, event storage and
+    # publishing. Actions are not invoked, since the caller decides how
+    # they are run (see _process_frames and the asyncio orchestrator).
+    # Returns a list of (action, detection status, detector name, frame)
+    # tuples, one for each action to invoke.
+    def process_frame(self):
+
+        if self._pending_reload is not None:
+            self._apply_reload()
+
+        if self._profiling_requested:
+            self._toggle_profiling()
+        if self._profiling is not None:
+            self._profiling.add_frame()
+            if self._profiling.is_done():
+                self._stop_profiling()
+
+        triggers = []
+
+        frame_start = time.perf_counter()
+        detection_data = self._cam_controller.read_and_process_frame()
+        # Frames without detection (cached or idle) are cheap, and would
+        # make the governor step up the detectors
+        if self._governor is not None and detection_data.detectors_run:
+            self._governor.add_frame_time(time.perf_counter() - frame_start)
+
+        if self._latest_detector_status is None:
+            # Special case: Initially we don't have any saved detector
+            # status, so we use the detectors from first processed frames
+            # for initialization.
+            self._latest_detector_status = {}
+            for detector_name in detection_data.detector_status:
+                self._latest_detector_status[detector_name] = False
+
+        transitions = set()
+        for detector_name, status in detection_data.detector_status.items():
+            # Detectors added by a reload have no saved status
+            if status != self._latest_detector_status.get(detector_name, False):
+                # The detection status of the current detector has changed
+                transitions.add(detector_name)
                 if status:
-                    object_detected_new = True
-                    break
+                    self._track_ids[detector_name] = self._track_ids.get(detector_name, 0) + 1
+                    self._logger.info("Detector: {} has detected (an) object(s)".format(detector_name))
+                    self._logger.info("  Rectangles:")
+                    for rectangle in detection_data.rectangles[detector_name]:
+                        self._logger.info("    {}".format(rectangle))
+                else:
+                    self._logger.info("Detector: {} no longer detects any object(s)".format(detector_name))
+
+                for action in self._actions:
+                    triggers.append((action, status, detector_name, detection_data.frame))
+
+        self._latest_detector_status = detection_data.detector_status
+
+        if self._event_store is not None:
+            self._store_events(detection_data)
+
+        if self._publisher is not None and detection_data.frame is not None:
+            self._publisher.publish(self._camera_name, detection_data, transitions)
+
+        if self._preview is not None:
+            self._preview.publish_frame(detection_data.frame,
+                                        detection_data.rectangles,
+                                        self._cam_controller.get_colors())
+
+        object_detected_new = False
+        for detector_name, status in self._latest_detector_status.items():
+            if status:
+                object_detected_new = True
+                break
+
+        if object_detected_new and not self._object_detected:
+            self._logger.info("Enable frame saving")
+            self._cam_controller.enable_frame_saving()
+        elif not object_detected_new and self._object_detected:
+            self._logger.info("Disable frame saving")
+            self._cam_controller.disable_frame_saving()
+
+        self._object_detected = object_detected_new
+
+        return triggers
+
+    def is_idle(self):
+
+        return self._idle_monitor is not None and self._idle_monitor.is_idle()
+
+    # Returns the time (in seconds) between two frames.
+    def get_frame_interval(self):
+
+        if self.is_idle():
+            return self._idle_monitor.get_idle_interval()
+        return 1 / self._fps
 
-            if object_detected_new and not object_detected:
-                self._logger.info("Enable frame saving")
-                self._cam_controller.enable_frame_saving()
-            elif not object_detected_new and object_detected:
-                self._logger.info("Disable frame saving")
-                self._cam_controller.disable_frame_saving()
+    # Account the CPU and wall clock time of one loop iteration (see
+    # IdleMonitor.add_loop_time).
+    def add_loop_time(self, idle, cpu_time, wall_time):
 
-            object_detected = object_detected_new
+        if self._idle_monitor is not None:
+            self._idle_monitor.add_loop_time(idle, cpu_time, wall_time)
 
-            time.sleep(1 / self._fps)
+    # Close the camera, the recorder and all outputs (everything is
+    # flushed).
+    def close(self):
 
+        if self._profiling is not None:
+            self._stop_profiling()
         self._cam_controller.close()
+        if self._scheduler is not None:
+            self._logger.info("Scheduler stats: {}".format(self._scheduler.get_stats()))
+            self._scheduler.close()
+        if self._event_store is not None:
+            self._event_store.close()
+        if self._preview is not None:
+            self._preview.close()
+        if self._black_box is not None:
+            self._black_box.close()
+        if self._publisher is not None:
+            self._logger.info("Publisher stats: {}".format(self._publisher.get_stats()))
+            self._publisher.close()
+        if self._idle_monitor is not None:
+            self._logger.info("Idle monitor stats: {}".format(self._idle_monitor.get_stats()))
+        illumination_monitor = self._cam_controller.get_illumination_monitor()
+        if illumination_monitor is not None:
+            self._logger.info("Illumination monitor stats: {}".format(illumination_monitor.get_stats()))
+        detection_cache = self._cam_controller.get_detection_cache()
+        if detection_cache is not None:
+            self._logger.info("Detection cache stats: {}".format(detection_cache.get_stats()))
+
+    def _store_events(self, detection_data):
+
+        events = []
+        for detector_name, status in detection_data.detector_status.items():
+            if not status:
+                continue
+            events.append(Event(camera=self._camera_name,
+                                detector=detector_name,
+                                timestamp=detection_data.timestamp,
+                                rectangles=detection_data.rectangles[detector_name],
+                                track_id=self._track_ids.get(detector_name),
+                                recording_file=detection_data.recording_file,
+                                frame_index=detection_data.frame_index))
+        self._event_store.add_events(events)
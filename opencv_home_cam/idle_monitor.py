@@ -0,0 +1,158 @@
+import cv2
+import time
+import logging
+from collections import namedtuple
+from . import metrics
+
+
+# quiet_period     - Time in seconds without detections before idle mode is
+#                    entered.
+# idle_fps         - The capture rate in idle mode.
+# motion_threshold - Percentage of the thumbnail pixels that must change for
+#                    the scene to be considered to have motion.
+# pixel_threshold  - Pixel intensity diff for a thumbnail pixel to be
+#                    considered changed.
+# thumbnail_width  - Width in pixels of the thumbnails used for the motion
+#                    check.
+IdleMonitorConfig = namedtuple('IdleMonitorConfig',
+                               ['quiet_period',
+                                'idle_fps',
+                                'motion_threshold',
+                                'pixel_threshold',
+                                'thumbnail_width'],
+                               verbose=False)
+
+
+# The idle monitor lowers the capture rate and skips the detectors while
+# the scene is static.
+#
+# When no detector has detected anything for quiet_period seconds, the
+# monitor enters idle mode. In idle mode, only a cheap motion check (a diff
+# of two small grayscale thumbnails) is made on each frame. As soon as
+# motion is seen, the monitor leaves idle mode and the frame is passed on
+# to the detectors.
+class IdleMonitor:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._quiet_period = config.quiet_period
+        self._idle_interval = 1.0 / config.idle_fps
+        self._motion_threshold = config.motion_threshold
+        self._pixel_threshold = config.pixel_threshold
+        self._thumbnail_width = config.thumbnail_width
+
+        self._idle = False
+        self._last_detection_time = time.time()
+        self._prev_thumbnail = None
+        self._wake_time = None
+
+        # Statistics. The CPU time is accumulated separately for idle and
+        # active mode in order to estimate the savings of idle mode.
+        self._cpu_time = {True: 0.0, False: 0.0}
+        self._wall_time = {True: 0.0, False: 0.0}
+        self._nbr_of_wakeups = 0
+        self._wake_latency_sum = 0.0
+
+    def is_idle(self):
+
+        return self._idle
+
+    # Returns the time to sleep between frames.
+    def get_idle_interval(self):
+
+        return self._idle_interval
+
+    def _create_thumbnail(self, frame):
+
+        height = int(frame.shape[0] * self._thumbnail_width / frame.shape[1])
+        thumbnail = cv2.resize(frame, (self._thumbnail_width, max(1, height)),
+                               interpolation=cv2.INTER_AREA)
+        if len(thumbnail.shape) == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+        return thumbnail
+
+    # Check if there is motion in the frame (compared to the previous
+    # frame checked in idle mode).
+    # If there is motion, idle mode is left and True is returned.
+    def check_motion(self, frame):
+
+        thumbnail = self._create_thumbnail(frame)
+        prev_thumbnail = self._prev_thumbnail
+        self._prev_thumbnail = thumbnail
+        if prev_thumbnail is None:
+            return False
+
+        diff = cv2.absdiff(prev_thumbnail, thumbnail)
+        changed = cv2.countNonZero(cv2.threshold(diff, self._pixel_threshold,
+                                                 255, cv2.THRESH_BINARY)[1])
+        changed_percentage = changed * 100.0 / diff.size
+        if changed_percentage < self._motion_threshold:
+            return False
+
+        self._logger.info("Idle monitor: motion detected ({:.1f} % changed). "
+                          "Leaving idle mode".format(changed_percentage))
+        self._idle = False
+        self._wake_time = time.perf_counter()
+        self._last_detection_time = time.time()
+        self._nbr_of_wakeups += 1
+        metrics.set_gauge('idle_mode', 0)
+        metrics.inc_counter('idle_wakeups')
+        return True
+
+    # Make the frame the new reference of the motion check without checking
+    # it (e.g. after a lighting change).
+    def rebaseline(self, frame):
+
+        self._prev_thumbnail = self._create_thumbnail(frame)
+
+    # Update the monitor with the detection result of a fully processed
+    # frame.
+    def update(self, object_detected):
+
+        now = time.time()
+
+        if self._wake_time is not None:
+            # This is the first full detection since wake-up
+            wake_latency = time.perf_counter() - self._wake_time
+            self._wake_time = None
+            self._wake_latency_sum += wake_latency
+            metrics.set_gauge('idle_wake_latency_ms', wake_latency * 1e3)
+            self._logger.info("Idle monitor: wake-up to first full detection: "
+                              "{:.1f} ms".format(wake_latency * 1e3))
+
+        if object_detected:
+            self._last_detection_time = now
+        elif now - self._last_detection_time > self._quiet_period:
+            self._logger.info("Idle monitor: no detections for {} s. "
+                              "Entering idle mode".format(self._quiet_period))
+            self._idle = True
+            self._prev_thumbnail = None
+            metrics.set_gauge('idle_mode', 1)
+
+    # Account the CPU and wall clock time of one loop iteration (including
+    # the sleep) to the current mode.
+    def add_loop_time(self, idle, cpu_time, wall_time):
+
+        self._cpu_time[idle] += cpu_time
+        self._wall_time[idle] += wall_time
+
+    # Returns a dict of idle mode statistics.
+    # The CPU load is the fraction of one core used in each mode. The
+    # saving is the relative CPU load reduction in idle mode.
+    def get_stats(self):
+
+        stats = {}
+        for idle, mode in ((False, 'active'), (True, 'idle')):
+            stats[mode + '_time_s'] = self._wall_time[idle]
+            if self._wall_time[idle] > 0.0:
+                stats[mode + '_cpu_load'] = self._cpu_time[idle] / self._wall_time[idle]
+            else:
+                stats[mode + '_cpu_load'] = None
+        if stats['active_cpu_load'] and stats['idle_cpu_load'] is not None:
+            stats['idle_cpu_saving'] = 1.0 - stats['idle_cpu_load'] / stats['active_cpu_load']
+        stats['wakeups'] = self._nbr_of_wakeups
+        if self._nbr_of_wakeups > 0:
+            stats['avg_wake_latency_ms'] = self._wake_latency_sum * 1e3 / self._nbr_of_wakeups
+        return stats
@@ -0,0 +1,113 @@
+import cv2
+import time
+import logging
+from collections import namedtuple
+from . import metrics
+
+
+# thumbnail_width     - Width in pixels of the thumbnails the check is made
+#                       on.
+# mean_threshold      - A change of the mean intensity (0-255) larger than
+#                       this between two frames is a lighting change.
+# histogram_threshold - A histogram distance (Bhattacharyya, 0.0-1.0) larger
+#                       than this between two frames is a lighting change.
+# suppress_time       - The time (in seconds) motion detection is suppressed
+#                       after a lighting change.
+IlluminationMonitorConfig = namedtuple('IlluminationMonitorConfig',
+                                       ['thumbnail_width',
+                                        'mean_threshold',
+                                        'histogram_threshold',
+                                        'suppress_time'],
+                                       verbose=False)
+
+
+# The illumination monitor detects global lighting changes (lights switched
+# on or off, IR mode changes, clouds) that make frame diffing detectors
+# report the whole frame as motion.
+#
+# Each frame is reduced to a small grayscale thumbnail, and its mean
+# intensity and intensity histogram are compared with those of the
+# previous frame. A large shift of either starts a suppression window,
+# during which the motion detectors are skipped and re-baselined (see
+# CamController).
+class IlluminationMonitor:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._thumbnail_width = config.thumbnail_width
+        self._mean_threshold = config.mean_threshold
+        self._histogram_threshold = config.histogram_threshold
+        self._suppress_time = config.suppress_time
+
+        self._prev_mean = None
+        self._prev_histogram = None
+        self._suppress_until = None
+
+        # Statistics
+        self._nbr_of_checks = 0
+        self._check_time = 0.0
+        self._nbr_of_changes = 0
+        self._nbr_of_suppressed_frames = 0
+        self._saved_time = 0.0
+
+    # Check a frame for a lighting change.
+    # Returns True if the frame is within a suppression window.
+    def check(self, frame, timestamp):
+
+        start = time.perf_counter()
+
+        height = int(frame.shape[0] * self._thumbnail_width / frame.shape[1])
+        thumbnail = cv2.resize(frame, (self._thumbnail_width, max(1, height)),
+                               interpolation=cv2.INTER_AREA)
+        if len(thumbnail.shape) == 3:
+            thumbnail = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2GRAY)
+
+        mean = cv2.mean(thumbnail)[0]
+        histogram = cv2.calcHist([thumbnail], [0], None, [16], [0, 256])
+        cv2.normalize(histogram, histogram)
+
+        if self._prev_mean is not None:
+            mean_shift = abs(mean - self._prev_mean)
+            distance = cv2.compareHist(self._prev_histogram, histogram,
+                                       cv2.HISTCMP_BHATTACHARYYA)
+            if mean_shift > self._mean_threshold or distance > self._histogram_threshold:
+                if not self._is_suppressing(timestamp):
+                    self._nbr_of_changes += 1
+                    metrics.inc_counter('lighting_changes')
+                    self._logger.info("Illumination monitor: lighting change (mean shift {:.1f}, "
+                                      "histogram distance {:.2f}). Suppressing motion detection "
+                                      "for {} s".format(mean_shift, distance, self._suppress_time))
+                self._suppress_until = timestamp + self._suppress_time
+
+        self._prev_mean = mean
+        self._prev_histogram = histogram
+
+        suppressing = self._is_suppressing(timestamp)
+        if suppressing:
+            self._nbr_of_suppressed_frames += 1
+
+        self._nbr_of_checks += 1
+        self._check_time += time.perf_counter() - start
+        return suppressing
+
+    def _is_suppressing(self, timestamp):
+
+        return self._suppress_until is not None and timestamp < self._suppress_until
+
+    # Account the (estimated) processing time saved by a suppressed
+    # detector run.
+    def add_saved_time(self, saved_time):
+
+        self._saved_time += saved_time
+
+    # Returns a dict of statistics: the number of lighting changes and
+    # suppressed frames, the cost of the check (ms per frame) and the
+    # estimated detector time saved by the suppression.
+    def get_stats(self):
+
+        return {'lighting_changes': self._nbr_of_changes,
+                'suppressed_frames': self._nbr_of_suppressed_frames,
+                'check_ms_per_frame': round(self._check_time * 1e3 / max(1, self._nbr_of_checks), 3),
+                'saved_detector_ms': round(self._saved_time * 1e3, 1)}
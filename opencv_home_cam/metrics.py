@@ -0,0 +1,35 @@
+import threading
+
+
+# A minimal process wide metrics registry.
+# Components update counters and gauges by name, and the registry can be
+# dumped as text (e.g. by the preview server on /metrics) or logged.
+_lock = threading.Lock()
+_metrics = {}
+
+
+def set_gauge(name, value):
+
+    with _lock:
+        _metrics[name] = value
+
+
+def inc_counter(name, value=1):
+
+    with _lock:
+        _metrics[name] = _metrics.get(name, 0) + value
+
+
+def get_metrics():
+
+    with _lock:
+        return dict(_metrics)
+
+
+# Returns all metrics as text, one "name value" pair per line.
+def format_metrics():
+
+    lines = []
+    for name, value in sorted(get_metrics().items()):
+        lines.append("{} {}".format(name, value))
+    return "\n".join(lines) + "\n"
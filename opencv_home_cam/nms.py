@@ -0,0 +1,141 @@
+import numpy
+from collections import namedtuple
+
+
+# detectors     - The detectors (names) whose rectangles are fused. The
+#                 order is the priority order: a fused object is reported
+#                 by the first detector in the list that detected it.
+# iou_threshold - Rectangles from different detectors overlapping more than
+#                 this (intersection over union) are fused into one object.
+FusionConfig = namedtuple('FusionConfig',
+                          ['detectors',
+                           'iou_threshold'],
+                          verbose=False)
+
+
+# Non-maximum suppression of rectangles.
+#
+# rects is an array (or list) of (x, y, width, height) rectangles and scores
+# the confidence of each rectangle (None means all rectangles are equally
+# confident, and the larger rectangle is kept).
+# Rectangles overlapping a higher scoring rectangle with an intersection
+# over union above iou_threshold are discarded.
+#
+# Returns the indices of the kept rectangles (highest score first).
+def nms_indices(rects, scores=None, iou_threshold=0.5):
+
+    rects = numpy.asarray(rects, dtype=numpy.float64).reshape(-1, 4)
+    if len(rects) == 0:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    x1 = rects[:, 0]
+    y1 = rects[:, 1]
+    x2 = rects[:, 0] + rects[:, 2]
+    y2 = rects[:, 1] + rects[:, 3]
+    areas = rects[:, 2] * rects[:, 3]
+
+    if scores is None:
+        scores = areas
+    order = numpy.argsort(numpy.asarray(scores, dtype=numpy.float64).reshape(-1))[::-1]
+
+    keep = []
+    while len(order) > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        xx1 = numpy.maximum(x1[i], x1[rest])
+        yy1 = numpy.maximum(y1[i], y1[rest])
+        xx2 = numpy.minimum(x2[i], x2[rest])
+        yy2 = numpy.minimum(y2[i], y2[rest])
+        intersection = numpy.maximum(0.0, xx2 - xx1) * numpy.maximum(0.0, yy2 - yy1)
+        iou = intersection / (areas[i] + areas[rest] - intersection)
+
+        order = rest[iou <= iou_threshold]
+
+    return numpy.array(keep, dtype=numpy.int64)
+
+
+# Same as nms_indices, but returns the kept rectangles (as an int array).
+def nms(rects, scores=None, iou_threshold=0.5):
+
+    rects = numpy.asarray(rects).reshape(-1, 4)
+    return rects[nms_indices(rects, scores, iou_threshold)].astype(int)
+
+
+def _iou(rect, rects):
+
+    xx1 = numpy.maximum(rect[0], rects[:, 0])
+    yy1 = numpy.maximum(rect[1], rects[:, 1])
+    xx2 = numpy.minimum(rect[0] + rect[2], rects[:, 0] + rects[:, 2])
+    yy2 = numpy.minimum(rect[1] + rect[3], rects[:, 1] + rects[:, 3])
+    intersection = numpy.maximum(0.0, xx2 - xx1) * numpy.maximum(0.0, yy2 - yy1)
+    union = rect[2] * rect[3] + rects[:, 2] * rects[:, 3] - intersection
+    return intersection / numpy.maximum(union, 1e-9)
+
+
+# Fuse overlapping rectangles of several detectors into single objects.
+#
+# rectangles and scores are dicts with detector names as keys (as in
+# DetectionData). Rectangles of the detectors in config.detectors that
+# overlap are grouped into one object. The object rectangle is the score
+# weighted mean of the group, and it is reported by the detector with the
+# highest priority in the group (with the highest score of the group).
+# Detectors not in config.detectors are left untouched.
+#
+# Returns new (rectangles, scores) dicts.
+def fuse(rectangles, scores, config):
+
+    all_rects = []
+    all_scores = []
+    all_priorities = []
+    for priority, detector_name in enumerate(config.detectors):
+        rects = rectangles.get(detector_name)
+        if rects is None or len(rects) == 0:
+            continue
+        rects = numpy.asarray(rects, dtype=numpy.float64).reshape(-1, 4)
+        all_rects.append(rects)
+        detector_scores = scores.get(detector_name)
+        if detector_scores is None:
+            detector_scores = numpy.ones(len(rects))
+        all_scores.append(numpy.asarray(detector_scores, dtype=numpy.float64).reshape(-1))
+        all_priorities.append(numpy.full(len(rects), priority))
+
+    fused_rectangles = dict(rectangles)
+    fused_scores = dict(scores)
+    for detector_name in config.detectors:
+        if detector_name in fused_rectangles:
+            fused_rectangles[detector_name] = None
+            fused_scores[detector_name] = None
+
+    if len(all_rects) == 0:
+        return (fused_rectangles, fused_scores)
+
+    rects = numpy.concatenate(all_rects)
+    rect_scores = numpy.concatenate(all_scores)
+    priorities = numpy.concatenate(all_priorities)
+
+    # Process the rectangles in priority order (and score order within
+    # each detector), so the first rectangle of each group decides which
+    # detector reports the object.
+    order = numpy.lexsort((-rect_scores, priorities))
+    objects = {}
+    while len(order) > 0:
+        i = order[0]
+        members = order[(_iou(rects[i], rects[order]) > config.iou_threshold) |
+                        (order == i)]
+        order = numpy.setdiff1d(order, members, assume_unique=True)
+        order = order[numpy.lexsort((-rect_scores[order], priorities[order]))]
+
+        weights = numpy.maximum(rect_scores[members], 1e-9)
+        rect = (rects[members] * weights[:, None]).sum(axis=0) / weights.sum()
+        detector_name = config.detectors[priorities[i]]
+        objects.setdefault(detector_name, ([], []))
+        objects[detector_name][0].append(numpy.round(rect).astype(int))
+        objects[detector_name][1].append(rect_scores[members].max())
+
+    for detector_name, (object_rects, object_scores) in objects.items():
+        fused_rectangles[detector_name] = numpy.array(object_rects, dtype=int)
+        fused_scores[detector_name] = numpy.array(object_scores)
+
+    return (fused_rectangles, fused_scores)
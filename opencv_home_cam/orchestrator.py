@@ -0,0 +1,119 @@
+import time
+import signal
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+# The orchestrator runs an OpenCvHomeCam on an asyncio event loop (instead
+# of the frame processing thread started by OpenCvHomeCam.start).
+#
+# The event loop owns the frame timer, the signal handling and the action
+# commands (run as asyncio subprocesses, so a slow action never delays the
+# frame processing). The CPU heavy frame processing (capture, detection,
+# recording) is offloaded to a single thread executor, so the frames are
+# still processed one at a time and in order.
+#
+# On shutdown, the running frame is finished, the running action commands
+# get shutdown_timeout seconds to complete (after that they are killed),
+# and finally the camera, the recorder and all outputs are closed (also
+# bounded by shutdown_timeout).
+class Orchestrator:
+
+    def __init__(self, home_cam, shutdown_timeout=10.0):
+
+        self._logger = logging.getLogger(__name__)
+        self._home_cam = home_cam
+        self._shutdown_timeout = shutdown_timeout
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._action_tasks = set()
+        self._stop_event = None
+        self._loop = None
+
+    # Run the orchestrator until stop() is called (or SIGINT/SIGTERM is
+    # received). Must be called from the main thread (signal handlers).
+    def run(self):
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+            self._executor.shutdown(wait=False)
+
+    def stop(self):
+
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def _run(self):
+
+        self._stop_event = asyncio.Event()
+        self._loop.add_signal_handler(signal.SIGINT, self._stop_event.set)
+        self._loop.add_signal_handler(signal.SIGTERM, self._stop_event.set)
+        self._loop.add_signal_handler(signal.SIGHUP, self._home_cam.reload)
+        self._loop.add_signal_handler(signal.SIGUSR1, self._home_cam.toggle_profiling)
+
+        try:
+            await self._process_frames()
+        finally:
+            for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP, signal.SIGUSR1):
+                self._loop.remove_signal_handler(sig)
+            await self._shutdown()
+
+    async def _process_frames(self):
+
+        next_frame_time = self._loop.time()
+        while not self._stop_event.is_set():
+
+            loop_start = time.perf_counter()
+            loop_cpu_start = time.process_time()
+            idle = self._home_cam.is_idle()
+
+            triggers = await self._loop.run_in_executor(self._executor,
+                                                        self._home_cam.process_frame)
+            for (action, status, detector_name, frame) in triggers:
+                task = asyncio.ensure_future(action.invoke_async(status, detector_name, frame))
+                self._action_tasks.add(task)
+                task.add_done_callback(self._action_tasks.discard)
+
+            # Fixed rate frame timer. If the processing is late, the next
+            # frame is processed immediately (and the schedule is reset).
+            next_frame_time += self._home_cam.get_frame_interval()
+            delay = next_frame_time - self._loop.time()
+            if delay < 0.0:
+                next_frame_time = self._loop.time()
+                delay = 0.0
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+            self._home_cam.add_loop_time(idle,
+                                         time.process_time() - loop_cpu_start,
+                                         time.perf_counter() - loop_start)
+
+    async def _shutdown(self):
+
+        self._logger.info("Orchestrator: shutting down")
+        start = time.perf_counter()
+
+        if len(self._action_tasks) > 0:
+            self._logger.info("Orchestrator: waiting for {} action(s)".format(len(self._action_tasks)))
+            (done, pending) = await asyncio.wait(list(self._action_tasks),
+                                                 timeout=self._shutdown_timeout)
+            for task in pending:
+                task.cancel()
+            if len(pending) > 0:
+                self._logger.warning("Orchestrator: {} action(s) killed".format(len(pending)))
+                await asyncio.wait(pending)
+
+        try:
+            await asyncio.wait_for(self._loop.run_in_executor(self._executor,
+                                                              self._home_cam.close),
+                                   timeout=self._shutdown_timeout)
+        except asyncio.TimeoutError:
+            self._logger.error("Orchestrator: close timed out after {} s".format(self._shutdown_timeout))
+
+        self._logger.info("Orchestrator: shutdown done in {:.2f} s".format(time.perf_counter() - start))
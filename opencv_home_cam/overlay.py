@@ -0,0 +1,142 @@
+import cv2
+import json
+import os
+import logging
+from .detector import COLORS
+
+
+# Recordings made without rectangles drawn into the frames have a sidecar
+# file with the same base name as the recording and this extension.
+# The sidecar is a JSON-lines file. The first line is a header mapping
+# each detector name to its BGR color:
+#
+#   {"colors": {"detector0": [0, 0, 255], ...}}
+#
+# Each following line holds the rectangles of one recorded frame that had
+# at least one detection:
+#
+#   {"frame": 17, "rects": {"detector0": [[x, y, w, h], ...], ...}}
+SIDECAR_EXT = '.jsonl'
+
+
+class OverlayException(Exception):
+
+    pass
+
+
+def get_sidecar_name(recording_file):
+
+    return os.path.splitext(recording_file)[0] + SIDECAR_EXT
+
+
+# Draw the rectangles of all detectors onto frame.
+# rectangles is a dict with detector names as keys and lists of
+# (x, y, width, height) tuples (or None) as values.
+# colors is a dict with detector names as keys and BGR tuples as values.
+def draw_rectangles(frame, rectangles, colors):
+
+    for detector_name, rects in rectangles.items():
+        if rects is None:
+            continue
+        color = colors.get(detector_name, COLORS[0])
+        for (x, y, w, h) in rects:
+            cv2.rectangle(frame, (int(x), int(y)),
+                          (int(x + w), int(y + h)),
+                          color,
+                          2)
+
+
+class SidecarWriter:
+
+    def __init__(self, recording_file, colors):
+
+        self._file = open(get_sidecar_name(recording_file), 'w')
+        # The header is written on the first write, since the colors might
+        # not be known when the recording file is opened.
+        self._colors = colors
+        self._header_written = False
+
+    def _write_header(self):
+
+        header = {'colors': {name: list(color) for name, color in self._colors.items()}}
+        self._file.write(json.dumps(header) + '\n')
+        self._header_written = True
+
+    def write(self, frame_index, rectangles):
+
+        if not self._header_written:
+            self._write_header()
+
+        rects = {}
+        for detector_name, detector_rects in rectangles.items():
+            if detector_rects is None or len(detector_rects) == 0:
+                continue
+            rects[detector_name] = [list(map(int, r)) for r in detector_rects]
+
+        if len(rects) == 0:
+            return
+
+        self._file.write(json.dumps({'frame': frame_index, 'rects': rects},
+                                    separators=(',', ':')) + '\n')
+
+    def close(self):
+
+        if not self._header_written:
+            self._write_header()
+        self._file.close()
+
+
+# Read a sidecar file.
+# Returns a (colors, rectangles) tuple where colors is a dict of detector
+# BGR tuples and rectangles is a dict with frame indices as keys and
+# rectangle dicts (see draw_rectangles) as values.
+def read_sidecar(sidecar_file):
+
+    colors = {}
+    rectangles = {}
+    with open(sidecar_file) as f:
+        for line in f:
+            entry = json.loads(line)
+            if 'colors' in entry:
+                colors = {name: tuple(color) for name, color in entry['colors'].items()}
+            else:
+                rectangles[entry['frame']] = entry['rects']
+
+    return (colors, rectangles)
+
+
+# Create a copy of a recording with the rectangles from its sidecar file
+# drawn into the frames.
+def annotate_recording(recording_file, output_file):
+
+    logger = logging.getLogger(__name__)
+
+    sidecar_file = get_sidecar_name(recording_file)
+    if not os.path.exists(sidecar_file):
+        raise OverlayException("Missing sidecar file {}".format(sidecar_file))
+
+    (colors, rectangles) = read_sidecar(sidecar_file)
+
+    video_capture = cv2.VideoCapture(recording_file)
+    if not video_capture.isOpened():
+        raise OverlayException("Unable to open {}".format(recording_file))
+
+    fps = video_capture.get(cv2.CAP_PROP_FPS)
+    width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    fourcc = cv2.VideoWriter_fourcc(*'mjpa')
+    outfile = cv2.VideoWriter(output_file, fourcc, fps, (width, height))
+
+    logger.info("Annotating {} into {}".format(recording_file, output_file))
+    frame_index = 0
+    while True:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        if frame_index in rectangles:
+            draw_rectangles(frame, rectangles[frame_index], colors)
+        outfile.write(frame)
+        frame_index += 1
+
+    video_capture.release()
+    outfile.release()
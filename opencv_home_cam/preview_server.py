@@ -0,0 +1,234 @@
+import cv2
+import threading
+import time
+import logging
+import socket
+from collections import namedtuple
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from .overlay import draw_rectangles
+from . import metrics
+
+
+PreviewServerConfig = namedtuple('PreviewServerConfig',
+                                 ['address',
+                                  'port',
+                                  'fps',
+                                  'jpeg_quality',
+                                  'client_timeout'],
+                                 verbose=False)
+
+_BOUNDARY = 'opencv-home-cam-frame'
+
+
+class PreviewServerException(Exception):
+
+    pass
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class _PreviewRequestHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        preview = self.server.preview
+
+        if self.path == '/':
+            body = b'<html><body><img src="/stream.mjpg"/></body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if self.path == '/metrics':
+            body = metrics.format_metrics().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if self.path != '/stream.mjpg':
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Type',
+                         'multipart/x-mixed-replace; boundary=' + _BOUNDARY)
+        self.end_headers()
+
+        # A client that is unable to receive a frame within the timeout is
+        # disconnected.
+        self.connection.settimeout(preview.get_client_timeout())
+
+        preview.add_client()
+        try:
+            seq = 0
+            while preview.is_running():
+                (seq, jpeg) = preview.wait_for_frame(seq)
+                if jpeg is None:
+                    continue
+                self.wfile.write(b'--' + _BOUNDARY.encode() + b'\r\n')
+                self.wfile.write(b'Content-Type: image/jpeg\r\n')
+                self.wfile.write('Content-Length: {}\r\n\r\n'.format(len(jpeg)).encode())
+                self.wfile.write(jpeg)
+                self.wfile.write(b'\r\n')
+        except (socket.timeout, ConnectionError):
+            preview.log_client_dropped(self.client_address)
+        finally:
+            preview.remove_client()
+
+    def log_message(self, format, *args):
+
+        logging.getLogger(__name__).debug(format, *args)
+
+
+# The preview server streams the frames processed by the cam controller
+# as multipart MJPEG over HTTP.
+#
+# Each published frame is JPEG encoded at most once (limited to the preview
+# fps), no matter how many clients are connected. All clients are served
+# the latest encoded frame. A client that is slower than the preview rate
+# simply skips frames, so the frame processing thread is never blocked by
+# the clients. If no clients are connected, no encoding is done at all.
+class PreviewServer:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._interval = 1.0 / config.fps
+        self._encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), config.jpeg_quality]
+        self._client_timeout = config.client_timeout
+
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._nbr_of_clients = 0
+        self._last_encode_time = 0.0
+        self._running = True
+
+        # Statistics
+        self._nbr_of_published_frames = 0
+        self._nbr_of_encoded_frames = 0
+        self._nbr_of_idle_frames = 0
+        self._idle_publish_time = 0.0
+        self._encode_time = 0.0
+
+        try:
+            self._server = _ThreadingHTTPServer((config.address, config.port),
+                                                _PreviewRequestHandler)
+        except OSError as err:
+            raise PreviewServerException("Unable to start preview server: {}".format(err))
+        self._server.preview = self
+        self._server_thread = threading.Thread(target=self._server.serve_forever)
+        self._server_thread.daemon = True
+        self._server_thread.start()
+        self._logger.info("Preview server listening on http://{}:{}/".format(config.address,
+                                                                            config.port))
+
+    def is_running(self):
+
+        return self._running
+
+    def get_client_timeout(self):
+
+        return self._client_timeout
+
+    def add_client(self):
+
+        with self._cond:
+            self._nbr_of_clients += 1
+            self._logger.info("Preview client connected ({} clients)".format(self._nbr_of_clients))
+
+    def remove_client(self):
+
+        with self._cond:
+            self._nbr_of_clients -= 1
+            self._logger.info("Preview client disconnected ({} clients)".format(self._nbr_of_clients))
+
+    def log_client_dropped(self, client_address):
+
+        self._logger.info("Dropping slow preview client {}".format(client_address))
+
+    # Wait for a frame newer than seq.
+    # Returns a (seq, jpeg) tuple. jpeg is None if no new frame arrived
+    # within a second.
+    def wait_for_frame(self, seq):
+
+        with self._cond:
+            if self._seq == seq:
+                self._cond.wait(timeout=1.0)
+            if self._seq == seq:
+                return (seq, None)
+            return (self._seq, self._jpeg)
+
+    # Publish a frame to the connected clients.
+    # This function is called from the frame processing thread.
+    # rectangles and colors are used to annotate the frame (see
+    # overlay.draw_rectangles).
+    def publish_frame(self, frame, rectangles, colors):
+
+        start = time.perf_counter()
+        self._nbr_of_published_frames += 1
+
+        if frame is None or self._nbr_of_clients == 0:
+            self._nbr_of_idle_frames += 1
+            self._idle_publish_time += time.perf_counter() - start
+            return
+
+        now = time.time()
+        if now - self._last_encode_time < self._interval:
+            return
+        self._last_encode_time = now
+
+        preview_frame = frame.copy()
+        draw_rectangles(preview_frame, rectangles, colors)
+        ret, jpeg = cv2.imencode('.jpg', preview_frame, self._encode_params)
+        if not ret:
+            return
+
+        with self._cond:
+            self._jpeg = jpeg.tobytes()
+            self._seq += 1
+            self._cond.notify_all()
+
+        self._nbr_of_encoded_frames += 1
+        self._encode_time += time.perf_counter() - start
+
+    # Returns a dict of preview statistics.
+    # idle_overhead_us is the average time (in microseconds) spent in
+    # publish_frame for frames published while no client was connected.
+    def get_stats(self):
+
+        nbr_of_idle_frames = self._nbr_of_idle_frames
+        stats = {}
+        stats['published_frames'] = self._nbr_of_published_frames
+        stats['encoded_frames'] = self._nbr_of_encoded_frames
+        stats['clients'] = self._nbr_of_clients
+        if nbr_of_idle_frames > 0:
+            stats['idle_overhead_us'] = self._idle_publish_time * 1e6 / nbr_of_idle_frames
+        else:
+            stats['idle_overhead_us'] = 0.0
+        if self._nbr_of_encoded_frames > 0:
+            stats['encode_time_ms'] = self._encode_time * 1e3 / self._nbr_of_encoded_frames
+        else:
+            stats['encode_time_ms'] = 0.0
+        return stats
+
+    def close(self):
+
+        self._logger.info("Closing preview server. Stats: {}".format(self.get_stats()))
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
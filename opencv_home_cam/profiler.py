@@ -0,0 +1,106 @@
+import io
+import os
+import time
+import pstats
+import cProfile
+import logging
+import datetime
+import tracemalloc
+from collections import namedtuple
+
+
+# report_dir - The directory the reports are written to.
+# duration   - The length (in seconds) of a profiling window. A window can
+#              be ended earlier by toggling the profiling again.
+# top        - The number of functions and allocation sites listed in the
+#              report.
+ProfilingConfig = namedtuple('ProfilingConfig',
+                             ['report_dir',
+                              'duration',
+                              'top'],
+                             verbose=False)
+
+
+# A profiling window of the frame processing thread.
+# start and stop must be called from the thread to profile (cProfile only
+# profiles the thread it is enabled in). Memory allocations are traced in
+# all threads while the window is open.
+# Nothing is installed before start or after stop, so a closed profiler
+# costs nothing.
+class ProfilingSession:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+        self._config = config
+        self._profile = cProfile.Profile()
+        self._start_time = None
+        self._start_stage_times = None
+        self._nbr_of_frames = 0
+        self._tracing_memory = False
+
+    # stage_times is a dict of accumulated stage times (see
+    # CamController.get_stage_times).
+    def start(self, stage_times):
+
+        self._start_stage_times = stage_times
+        self._start_time = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing_memory = True
+        self._profile.enable()
+        self._logger.info("Profiling started ({} s)".format(self._config.duration))
+
+    def add_frame(self):
+
+        self._nbr_of_frames += 1
+
+    def is_done(self):
+
+        return time.perf_counter() - self._start_time >= self._config.duration
+
+    # Stop profiling and write the report.
+    # Returns the report file name.
+    def stop(self, stage_times):
+
+        self._profile.disable()
+        elapsed = time.perf_counter() - self._start_time
+        snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        if self._tracing_memory:
+            tracemalloc.stop()
+
+        base = os.path.join(self._config.report_dir,
+                            "profile-{}".format(datetime.datetime.now().strftime("%Y%m%d-%H%M%S")))
+        report_file = base + ".txt"
+        with open(report_file, 'w') as f:
+            f.write(self._format_report(elapsed, stage_times, snapshot))
+        # The raw stats can be loaded with pstats (or e.g. snakeviz)
+        self._profile.dump_stats(base + ".prof")
+
+        self._logger.info("Profiling stopped after {:.1f} s. Report: {}".format(elapsed, report_file))
+        return report_file
+
+    def _format_report(self, elapsed, stage_times, snapshot):
+
+        nbr_of_frames = max(1, self._nbr_of_frames)
+        out = io.StringIO()
+        out.write("Profiling window: {:.1f} s, {} frames ({:.1f} fps)\n\n".format(elapsed,
+                                                                                self._nbr_of_frames,
+                                                                                self._nbr_of_frames / elapsed))
+
+        out.write("Stage times (ms per frame):\n")
+        for stage in sorted(stage_times):
+            stage_time = stage_times[stage] - self._start_stage_times.get(stage, 0.0)
+            out.write("  {:<24} {:>8.2f}\n".format(stage, stage_time * 1e3 / nbr_of_frames))
+
+        out.write("\nFrame thread functions (top {} by cumulative time):\n".format(self._config.top))
+        stats = pstats.Stats(self._profile, stream=out)
+        stats.sort_stats('cumulative').print_stats(self._config.top)
+
+        if snapshot is not None:
+            out.write("Memory allocations (top {} by size):\n".format(self._config.top))
+            snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+            for stat in snapshot.statistics('lineno')[:self._config.top]:
+                out.write("  {}\n".format(stat))
+
+        return out.getvalue()
@@ -0,0 +1,404 @@
+import os
+import json
+import time
+import numpy
+import socket
+import struct
+import logging
+import selectors
+import threading
+from collections import namedtuple
+from . import metrics
+
+
+# socket_path - The Unix domain socket the subscribers connect to.
+# max_buffer  - The maximum number of unsent bytes per subscriber.
+#               Subscribers that are slower than this are disconnected.
+PublisherConfig = namedtuple('PublisherConfig',
+                             ['socket_path',
+                              'max_buffer'],
+                             verbose=False)
+
+
+# Message format (all integers little endian):
+#
+#   length    - uint32, the length of the rest of the message.
+#   timestamp - float64, capture time (seconds since the epoch).
+#   camera    - uint16 length + UTF-8 camera name.
+#   detectors - uint16 number of detectors, and for each detector:
+#                 name  - uint16 length + UTF-8 detector name.
+#                 flags - uint8, bit 0: detection status, bit 1: the status
+#                         changed in this frame (transition).
+#                 rects - uint16 number of rectangles + int32 (x, y, width,
+#                         height) for each rectangle.
+#
+# Subscribers must send one JSON line with a filter directly after
+# connecting: {"cameras": [...], "detectors": [...]}. Missing (or null)
+# lists mean no filtering ({} subscribes to everything). No messages are
+# sent before the filter has been received. Frames without any of the
+# filtered detectors are not sent.
+LENGTH_FORMAT = '<I'
+LENGTH_SIZE = struct.calcsize(LENGTH_FORMAT)
+FLAG_STATUS = 1
+FLAG_TRANSITION = 2
+
+
+class PublisherException(Exception):
+
+    pass
+
+
+def _pack_string(s):
+
+    b = s.encode()
+    return struct.pack('<H', len(b)) + b
+
+
+# Encode a message.
+# detectors is a list of (name, status, transition, rectangles) tuples.
+def encode_message(camera, timestamp, detectors):
+
+    parts = [struct.pack('<d', timestamp), _pack_string(camera),
+             struct.pack('<H', len(detectors))]
+    for (name, status, transition, rects) in detectors:
+        flags = (FLAG_STATUS if status else 0) | (FLAG_TRANSITION if transition else 0)
+        if rects is None or len(rects) == 0:
+            rects = numpy.zeros((0, 4), '<i4')
+        else:
+            rects = numpy.asarray(rects).reshape(-1, 4).astype('<i4')
+        parts.append(_pack_string(name))
+        parts.append(struct.pack('<BH', flags, len(rects)))
+        parts.append(rects.tobytes())
+    payload = b''.join(parts)
+    return struct.pack(LENGTH_FORMAT, len(payload)) + payload
+
+
+# Decode a message payload (without the length field).
+# Returns a dict with camera, timestamp and detectors (a list of dicts
+# with name, status, transition and rectangles).
+def decode_message(payload):
+
+    (timestamp,) = struct.unpack_from('<d', payload, 0)
+    offset = 8
+
+    def unpack_string(offset):
+        (length,) = struct.unpack_from('<H', payload, offset)
+        offset += 2
+        return (payload[offset:offset + length].decode(), offset + length)
+
+    (camera, offset) = unpack_string(offset)
+    (nbr_of_detectors,) = struct.unpack_from('<H', payload, offset)
+    offset += 2
+    detectors = []
+    for i in range(nbr_of_detectors):
+        (name, offset) = unpack_string(offset)
+        (flags, nbr_of_rects) = struct.unpack_from('<BH', payload, offset)
+        offset += 3
+        rects = numpy.frombuffer(payload, '<i4', nbr_of_rects * 4, offset).reshape(-1, 4)
+        offset += nbr_of_rects * 16
+        detectors.append({'name': name,
+                          'status': bool(flags & FLAG_STATUS),
+                          'transition': bool(flags & FLAG_TRANSITION),
+                          'rectangles': rects.tolist()})
+    return {'camera': camera, 'timestamp': timestamp, 'detectors': detectors}
+
+
+class _Subscription:
+
+    def __init__(self, sock):
+
+        self.sock = sock
+        self.buffer = bytearray()
+        # The received part of the filter line. None when the filter has
+        # been received.
+        self.request = b''
+        # None means no filtering
+        self.cameras = None
+        self.detectors = None
+
+
+# The publisher sends the detection data of every processed frame to all
+# subscribers connected to a Unix domain socket.
+#
+# A background thread accepts subscribers and reads their filters. The
+# messages are sent (non-blocking) directly by publish(). Data that can't
+# be sent immediately is buffered, and subscribers with more than
+# max_buffer unsent bytes are disconnected, so a slow subscriber never
+# slows down the frame processing.
+class Publisher:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+
+        self._socket_path = config.socket_path
+        self._max_buffer = config.max_buffer
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+        self._nbr_of_messages = 0
+        self._nbr_of_disconnects = 0
+
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+        try:
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(self._socket_path)
+            self._server.listen(16)
+        except OSError as err:
+            raise PublisherException("Unable to create publisher socket {}: {}".format(self._socket_path, err))
+        self._server.setblocking(False)
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+        self._logger.info("Publisher: listening on {}".format(self._socket_path))
+
+    def _serve(self):
+
+        while self._running:
+            for (key, events) in self._selector.select(timeout=0.5):
+                if key.fileobj is self._server:
+                    self._accept()
+                else:
+                    self._read_request(key.fileobj)
+
+    def _accept(self):
+
+        try:
+            (sock, address) = self._server.accept()
+        except OSError:
+            return
+        sock.setblocking(False)
+        with self._lock:
+            self._subscriptions[sock] = _Subscription(sock)
+        self._selector.register(sock, selectors.EVENT_READ)
+        metrics.set_gauge('publisher_subscribers', len(self._subscriptions))
+
+    # Read the filter of a subscriber.
+    # Anything read after the filter line is ignored, and an empty read
+    # means that the subscriber has disconnected.
+    def _read_request(self, sock):
+
+        try:
+            data = sock.recv(4096)
+        except OSError:
+            data = b''
+        if len(data) == 0:
+            self._remove(sock)
+            return
+
+        with self._lock:
+            subscription = self._subscriptions.get(sock)
+            if subscription is None or subscription.request is None:
+                return
+            subscription.request += data
+            if b'\n' not in subscription.request:
+                return
+            line = subscription.request.split(b'\n', 1)[0]
+            subscription.request = None
+            try:
+                request = json.loads(line.decode())
+                if request.get('cameras') is not None:
+                    subscription.cameras = set(request['cameras'])
+                if request.get('detectors') is not None:
+                    subscription.detectors = set(request['detectors'])
+            except (ValueError, AttributeError, TypeError):
+                self._logger.warning("Publisher: bad subscriber filter: {}".format(line))
+
+    def _remove(self, sock):
+
+        with self._lock:
+            subscription = self._subscriptions.pop(sock, None)
+        if subscription is None:
+            return
+        try:
+            self._selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        sock.close()
+        metrics.set_gauge('publisher_subscribers', len(self._subscriptions))
+
+    # Publish the detection data of one frame.
+    # transitions is a set of the detectors whose status changed in this
+    # frame.
+    def publish(self, camera, detection_data, transitions):
+
+        if len(self._subscriptions) == 0:
+            return
+
+        detectors = []
+        for detector_name, status in detection_data.detector_status.items():
+            detectors.append((detector_name, status,
+                              detector_name in transitions,
+                              detection_data.rectangles.get(detector_name)))
+        message = None
+
+        slow_subscribers = []
+        with self._lock:
+            for subscription in self._subscriptions.values():
+                if subscription.request is not None:
+                    # No filter received yet
+                    continue
+                if subscription.cameras is not None and camera not in subscription.cameras:
+                    continue
+                if subscription.detectors is not None:
+                    filtered = [d for d in detectors if d[0] in subscription.detectors]
+                    if len(filtered) == 0:
+                        continue
+                    data = encode_message(camera, detection_data.timestamp, filtered)
+                else:
+                    if message is None:
+                        message = encode_message(camera, detection_data.timestamp, detectors)
+                    data = message
+
+                if not self._send(subscription, data):
+                    slow_subscribers.append(subscription.sock)
+            self._nbr_of_messages += 1
+
+        for sock in slow_subscribers:
+            self._nbr_of_disconnects += 1
+            metrics.inc_counter('publisher_slow_disconnects')
+            self._logger.warning("Publisher: disconnecting slow subscriber")
+            self._remove(sock)
+
+    # Send data (after any buffered data) without blocking.
+    # Returns False if the subscriber is too slow (or gone).
+    def _send(self, subscription, data):
+
+        if len(subscription.buffer) > 0:
+            subscription.buffer += data
+            data = subscription.buffer
+        try:
+            sent = subscription.sock.send(data)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            return False
+
+        if sent < len(data):
+            subscription.buffer = bytearray(data[sent:])
+        elif len(subscription.buffer) > 0:
+            subscription.buffer = bytearray()
+        return len(subscription.buffer) <= self._max_buffer
+
+    def get_stats(self):
+
+        return {'messages': self._nbr_of_messages,
+                'subscribers': len(self._subscriptions),
+                'slow_disconnects': self._nbr_of_disconnects}
+
+    def close(self):
+
+        self._running = False
+        self._thread.join()
+        for sock in list(self._subscriptions):
+            self._remove(sock)
+        self._selector.close()
+        self._server.close()
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+
+# A subscriber of the detection stream.
+# cameras and detectors are (optional) lists used to filter the stream.
+class Subscriber:
+
+    def __init__(self, socket_path, cameras=None, detectors=None):
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(socket_path)
+        except OSError as err:
+            raise PublisherException("Unable to connect to {}: {}".format(socket_path, err))
+        request = {'cameras': cameras, 'detectors': detectors}
+        self._sock.sendall((json.dumps(request) + '\n').encode())
+        self._buffer = bytearray()
+
+    # Returns the payload of the next message (see decode_message) or None
+    # if the publisher has closed the connection.
+    def receive_raw(self):
+
+        while True:
+            if len(self._buffer) >= LENGTH_SIZE:
+                (length,) = struct.unpack_from(LENGTH_FORMAT, self._buffer, 0)
+                if len(self._buffer) >= LENGTH_SIZE + length:
+                    payload = bytes(self._buffer[LENGTH_SIZE:LENGTH_SIZE + length])
+                    del self._buffer[:LENGTH_SIZE + length]
+                    return payload
+            data = self._sock.recv(65536)
+            if len(data) == 0:
+                return None
+            self._buffer += data
+
+    # Returns the next decoded message or None if the publisher has closed
+    # the connection.
+    def receive(self):
+
+        payload = self.receive_raw()
+        if payload is None:
+            return None
+        return decode_message(payload)
+
+    def close(self):
+
+        self._sock.close()
+
+
+# Measure the publisher throughput.
+# nbr_of_messages messages (with nbr_of_detectors detectors and one
+# rectangle each) are published to nbr_of_subscribers subscribers.
+# Returns a dict with the publish rate and the rate at which all
+# subscribers have received all messages (messages per second).
+def benchmark_publisher(socket_path, nbr_of_messages=100000,
+                        nbr_of_subscribers=2, nbr_of_detectors=3):
+
+    from .cam_controller import DetectionData
+
+    publisher = Publisher(PublisherConfig(socket_path=socket_path,
+                                          max_buffer=64 * 1024 * 1024))
+
+    received = [0] * nbr_of_subscribers
+
+    def receive(index, subscriber):
+        while subscriber.receive_raw() is not None:
+            received[index] += 1
+            if received[index] == nbr_of_messages:
+                break
+        subscriber.close()
+
+    threads = []
+    for i in range(nbr_of_subscribers):
+        subscriber = Subscriber(socket_path)
+        threads.append(threading.Thread(target=receive, args=(i, subscriber)))
+        threads[-1].start()
+    # Wait until the publisher has received the filters of all subscribers
+    while len([s for s in publisher._subscriptions.values() if s.request is None]) < nbr_of_subscribers:
+        time.sleep(0.01)
+
+    names = ['detector{}'.format(i) for i in range(nbr_of_detectors)]
+    detection_data = DetectionData(frame=None,
+                                   detector_status={name: True for name in names},
+                                   rectangles={name: [(10, 20, 30, 40)] for name in names},
+                                   scores={name: None for name in names},
+                                   timestamp=time.time(),
+                                   recording_file=None,
+                                   frame_index=None,
+                                   detectors_run=True)
+
+    start = time.perf_counter()
+    for i in range(nbr_of_messages):
+        publisher.publish('camera0', detection_data, set())
+    publish_time = time.perf_counter() - start
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start
+    stats = publisher.get_stats()
+    publisher.close()
+
+    return {'publish_rate': nbr_of_messages / publish_time,
+            'receive_rate': nbr_of_messages / total_time,
+            'received': received,
+            'slow_disconnects': stats['slow_disconnects']}
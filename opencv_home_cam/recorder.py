@@ -1,33 +1,60 @@
-import cv2
 from collections import namedtuple
 import logging
 import re
 import os
+import time
+from .overlay import SidecarWriter, get_sidecar_name
+from .frame_index import FrameIndexWriter, get_index_name, is_indexable
+from .video_codec import select_codec, open_video_writer
 
 
 RecorderConfig = namedtuple('RecorderConfig',
                             ['file_limit',
                              'time_limit',
                              'directory',
-                             'file_base'],
+                             'file_base',
+                             'draw_rectangles',
+                             'fourcc',
+                             'container',
+                             'quality'],
                             verbose=False)
 
 
 class Recorder:
 
-    def __init__(self, config, fps, resolution):
+    # fps         - The frame rate of the recorded video files.
+    # capture_fps - The rate frames are recorded at, if it differs from fps
+    #               (e.g. for timelapse recordings). The time_limit of the
+    #               config is the capture time covered by each file.
+    def __init__(self, config, fps, resolution, capture_fps=None):
 
         self._logger = logging.getLogger(__name__)
 
+        if capture_fps is None:
+            capture_fps = fps
         self._file_limit = config.file_limit
         self._directory = config.directory
         self._file_base = config.file_base
-        self._frame_limit = config.time_limit * fps
+        self._frame_limit = config.time_limit * capture_fps
         self._resolution = resolution
         self._fps = fps
-        self._ext = '.avi'
+        (self._fourcc, container) = select_codec(config.fourcc,
+                                                 config.container,
+                                                 fps,
+                                                 resolution)
+        self._ext = '.' + container
+        # MJPEG recordings get a frame index, so clips can be exported
+        # without re-encoding (see frame_index.py)
+        self._indexed = is_indexable(self._fourcc, container)
+        self._index = None
+        self._quality = config.quality
+        self._draw_rectangles = config.draw_rectangles
+        self._detector_colors = {}
+        self._sidecar = None
+        self._file_removed_listeners = []
         self._scan_video_files()
-        self._open_new_video_file()
+        # The first output file is opened when the first frame is recorded
+        self._outfile = None
 
     def _scan_video_files(self):
 
@@ -79,11 +106,17 @@ class Recorder:
 
         new_file_name = directory + '/' + base + str(self._cur_outfile_index) + ext
         self._logger.info("Opening new output file: %s", new_file_name)
-        fourcc = cv2.VideoWriter_fourcc(*'mjpa')
+        self._cur_outfile_name = new_file_name
         self._logger.info("recording resoluton: {}".format(self._resolution))
-        self._outfile = cv2.VideoWriter(new_file_name, fourcc,
-                                        self._fps,
-                                        self._resolution)
+        self._outfile = open_video_writer(new_file_name,
+                                          self._fourcc,
+                                          self._fps,
+                                          self._resolution,
+                                          self._quality)
+        if not self._draw_rectangles:
+            self._sidecar = SidecarWriter(new_file_name, self._detector_colors)
+        if self._indexed:
+            self._index = FrameIndexWriter(new_file_name, self._fps, self._resolution)
         self._nbr_of_outfiles += 1
         self._cur_nbr_of_recorded_frames = 0
 
@@ -96,25 +129,84 @@ class Recorder:
         oldest_filename = directory + '/' + base + str(self._cur_outfile_lowest_index) + ext
         self._logger.info("Removing old output file: %s", oldest_filename)
         os.remove(oldest_filename)
+        oldest_sidecar = get_sidecar_name(oldest_filename)
+        if os.path.exists(oldest_sidecar):
+            os.remove(oldest_sidecar)
+        oldest_index = get_index_name(oldest_filename)
+        if os.path.exists(oldest_index):
+            os.remove(oldest_index)
+        for listener in self._file_removed_listeners:
+            listener(oldest_filename)
         # Update oldest and current index by rescanning all outfiles
         self._scan_video_files()
 
-    def record_frame(self, frame):
+    # Register a callable that will be called with the file name of each
+    # recording that is removed due to the file limit.
+    def add_file_removed_listener(self, listener):
 
-        if self._cur_nbr_of_recorded_frames > self._frame_limit:
+        self._file_removed_listeners.append(listener)
+
+    # Returns True if the rectangles of the detections should be drawn into
+    # the recorded frames. If False, the rectangles are written to a
+    # sidecar file instead (see overlay.py).
+    def draws_rectangles(self):
+
+        return self._draw_rectangles
+
+    # Set the colors (a dict of BGR tuples with detector names as keys)
+    # written to the header of the sidecar files.
+    def set_detector_colors(self, colors):
+
+        self._detector_colors.update(colors)
+
+    # Record one frame.
+    # rectangles is the rectangles dict of the frame's detection data. It
+    # is written to the sidecar file if the recorder does not draw
+    # rectangles into the frames.
+    # timestamp is the capture time of the frame (written to the frame
+    # index). If None, the current time is used.
+    # Returns a (file name, frame index) tuple telling where in the
+    # recordings the frame was written.
+    def record_frame(self, frame, rectangles=None, timestamp=None):
+
+        if self._outfile is None:
+            self._open_new_video_file()
+        elif self._cur_nbr_of_recorded_frames > self._frame_limit:
             self._logger.info("Switching output file")
-            self._outfile.release()
+            self._close_video_file()
             self._cur_outfile_index += 1
             self._open_new_video_file()
 
         self._outfile.write(frame)
+        if self._sidecar is not None and rectangles is not None:
+            self._sidecar.write(self._cur_nbr_of_recorded_frames, rectangles)
+        if self._index is not None:
+            if timestamp is None:
+                timestamp = time.time()
+            self._index.add(self._cur_nbr_of_recorded_frames, timestamp)
+        frame_location = (self._cur_outfile_name, self._cur_nbr_of_recorded_frames)
 
         self._cur_nbr_of_recorded_frames += 1
         if self._nbr_of_outfiles > self._file_limit:
             self._remove_old_video_file()
 
+        return frame_location
+
+    def _close_video_file(self):
+
+        self._outfile.release()
+        if self._sidecar is not None:
+            self._sidecar.close()
+            self._sidecar = None
+        if self._index is not None:
+            # The offsets can only be indexed once the file is released (by a
+            # worker thread, see frame_index.py)
+            self._index.close()
+            self._index = None
+
     def close(self):
 
         if self._outfile is not None:
             self._logger.info("Closing video output file")
-            self._outfile.release()
+            self._close_video_file()
+            self._outfile = None
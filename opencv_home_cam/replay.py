@@ -0,0 +1,135 @@
+import json
+import time
+from .config import HomeCamConfig
+from .analyzer import create_cam_controller
+from .frame_archive import FrameArchive, ArchiveCamera
+
+
+class ReplayException(Exception):
+
+    pass
+
+
+# Replay a frame archive through a CamController with the detectors of the
+# first camera in config_file.
+# The replay is deterministic: the frames are processed one by one in
+# archive order, and there is no idle monitor or governor.
+# Returns a dict (JSON serializable, used as baseline) with:
+#   frames      - The number of replayed frames.
+#   rectangles  - A list of [frame index, detector, rectangles] entries for
+#                 all frames with detections.
+#   transitions - A list of [frame index, detector, status] entries for all
+#                 detection status changes.
+#   stage_ms    - The average processing time (ms per frame) of each
+#                 processing stage (see CamController.get_stage_times).
+#   total_ms    - The average total processing time (ms per frame).
+def replay_archive(config_file, archive_file):
+
+    config = HomeCamConfig(config_file)
+    archive = FrameArchive(archive_file)
+    cam_controller = create_cam_controller(config, ArchiveCamera(archive))
+
+    rectangles = []
+    transitions = []
+    prev_status = {}
+    nbr_of_frames = 0
+    start = time.perf_counter()
+    while True:
+        detection_data = cam_controller.read_and_process_frame()
+        if detection_data.frame is None:
+            break
+        for detector_name in sorted(detection_data.detector_status):
+            status = detection_data.detector_status[detector_name]
+            if status:
+                rectangles.append([nbr_of_frames, detector_name,
+                                   [[int(v) for v in rect] for rect in detection_data.rectangles[detector_name]]])
+            if status != prev_status.get(detector_name, False):
+                transitions.append([nbr_of_frames, detector_name, status])
+            prev_status[detector_name] = status
+        nbr_of_frames += 1
+    elapsed = time.perf_counter() - start
+    cam_controller.close()
+
+    stage_ms = {}
+    for stage, stage_time in cam_controller.get_stage_times().items():
+        stage_ms[stage] = stage_time * 1e3 / max(1, nbr_of_frames)
+
+    return {'frames': nbr_of_frames,
+            'rectangles': rectangles,
+            'transitions': transitions,
+            'stage_ms': stage_ms,
+            'total_ms': elapsed * 1e3 / max(1, nbr_of_frames)}
+
+
+def save_baseline(result, file_name):
+
+    with open(file_name, 'w') as f:
+        json.dump(result, f, indent=1)
+
+
+def load_baseline(file_name):
+
+    try:
+        with open(file_name) as f:
+            return json.load(f)
+    except (IOError, ValueError) as err:
+        raise ReplayException("Unable to load baseline {}: {}".format(file_name, err))
+
+
+# Compare a replay result with a baseline (both as returned by
+# replay_archive).
+# Returns a dict with:
+#   rectangle_diffs  - The (frame index, detector) pairs with different
+#                      rectangles.
+#   transition_diffs - The transitions only found in either the baseline
+#                      or the result.
+#   stage_deltas     - A dict with a (baseline ms, result ms, relative
+#                      change) tuple for each stage (stage name is the dict
+#                      key). The total processing time has the key 'total'.
+#   slow_stages      - The stages that are more than max_slowdown (relative
+#                      change) slower than in the baseline. Only checked if
+#                      max_slowdown is not None.
+#   regression       - True if the detections differ or any stage is too
+#                      slow.
+def compare_replay(baseline, result, max_slowdown=None):
+
+    if baseline['frames'] != result['frames']:
+        raise ReplayException("The baseline has {} frames, the replay {} frames".format(baseline['frames'],
+                                                                                        result['frames']))
+
+    baseline_rects = dict(((frame, detector), rects) for (frame, detector, rects) in baseline['rectangles'])
+    result_rects = dict(((frame, detector), rects) for (frame, detector, rects) in result['rectangles'])
+    rectangle_diffs = []
+    for key in sorted(set(baseline_rects) | set(result_rects)):
+        if baseline_rects.get(key) != result_rects.get(key):
+            rectangle_diffs.append(key)
+
+    baseline_transitions = set(tuple(t) for t in baseline['transitions'])
+    result_transitions = set(tuple(t) for t in result['transitions'])
+    transition_diffs = sorted(baseline_transitions ^ result_transitions)
+
+    stage_deltas = {}
+    baseline_stages = dict(baseline['stage_ms'], total=baseline['total_ms'])
+    result_stages = dict(result['stage_ms'], total=result['total_ms'])
+    for stage in sorted(set(baseline_stages) | set(result_stages)):
+        baseline_ms = baseline_stages.get(stage, 0.0)
+        result_ms = result_stages.get(stage, 0.0)
+        if baseline_ms > 0.0:
+            delta = (result_ms - baseline_ms) / baseline_ms
+        else:
+            delta = None
+        stage_deltas[stage] = (baseline_ms, result_ms, delta)
+
+    slow_stages = []
+    if max_slowdown is not None:
+        for stage, (baseline_ms, result_ms, delta) in stage_deltas.items():
+            if delta is not None and delta > max_slowdown:
+                slow_stages.append(stage)
+
+    return {'rectangle_diffs': rectangle_diffs,
+            'transition_diffs': transition_diffs,
+            'stage_deltas': stage_deltas,
+            'slow_stages': sorted(slow_stages),
+            'regression': (len(rectangle_diffs) > 0 or
+                           len(transition_diffs) > 0 or
+                           len(slow_stages) > 0)}
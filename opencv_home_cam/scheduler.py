@@ -0,0 +1,177 @@
+import heapq
+import logging
+import threading
+import time
+from collections import namedtuple
+from . import metrics
+
+
+# workers        - The number of detection worker threads (shared by all
+#                  cameras and detectors).
+# max_queue_time - Jobs of the lower priority classes (priority > 0) that
+#                  have waited longer than this (in seconds), and whose
+#                  frame is already late (see DetectionScheduler.submit),
+#                  are shed (skipped) instead of run. Jobs of priority
+#                  class 0 are never shed.
+SchedulerConfig = namedtuple('SchedulerConfig',
+                             ['workers',
+                              'max_queue_time'],
+                             verbose=False)
+
+
+class DetectionJob:
+
+    def __init__(self, camera, priority, deadline, func, args):
+
+        self.camera = camera
+        self.priority = priority
+        self.deadline = deadline
+        self._func = func
+        self._args = args
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+        self.shed = False
+        self.submit_time = time.perf_counter()
+        # The time (in seconds) the job ran. None if the job was shed.
+        self.run_time = None
+
+    def run(self):
+
+        start = time.perf_counter()
+        try:
+            self._result = self._func(*self._args)
+        except Exception as err:
+            self._error = err
+        self.run_time = time.perf_counter() - start
+        self._done.set()
+
+    def skip(self):
+
+        self.shed = True
+        self._done.set()
+
+    # Wait for the job to finish.
+    # Returns the result of the job function (None if the job was shed).
+    def result(self):
+
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+# The detection scheduler runs the detection jobs of all cameras on a
+# shared pool of worker threads (OpenCV releases the GIL during detection).
+#
+# Jobs are queued by priority class (0 is the highest priority). Within a
+# class the cameras are served round robin, so a camera submitting many
+# jobs can't starve the other cameras of the same class. Under overload,
+# the high priority jobs are always run first, and jobs of the lower
+# priority classes that have waited longer than max_queue_time are shed
+# if their frame has missed its deadline, i.e. the low priority work is
+# skipped before the high priority work is delayed. A job that waits
+# behind a slow job, but still finishes within the frame budget, is not
+# shed.
+#
+# The queue latency (time from submit to start) of each priority class is
+# exported as the detection_queue_latency_ms_p<class> gauge (a moving
+# average), and shed jobs are counted in detection_shed_jobs_p<class>.
+class DetectionScheduler:
+
+    def __init__(self, config):
+
+        self._logger = logging.getLogger(__name__)
+        self._max_queue_time = config.max_queue_time
+        self._cond = threading.Condition()
+        self._queue = []
+        self._sequence = 0
+        # Round robin state: the last round of each (priority, camera) and
+        # the round currently served for each priority.
+        self._camera_rounds = {}
+        self._served_rounds = {}
+        self._stats = {}
+        self._closing = False
+
+        self._workers = []
+        for i in range(config.workers):
+            worker = threading.Thread(target=self._work,
+                                      name="detection-worker-{}".format(i),
+                                      daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    # Submit func(*args) as a job of the given priority class.
+    # deadline is the time (time.perf_counter()) the frame of the job
+    # should be processed by (the capture time plus the frame budget).
+    # Jobs without a deadline are never shed.
+    # Returns a DetectionJob.
+    def submit(self, camera, priority, deadline, func, *args):
+
+        job = DetectionJob(camera, priority, deadline, func, args)
+        with self._cond:
+            key = (priority, camera)
+            served_round = self._served_rounds.get(priority, 0)
+            job_round = max(self._camera_rounds.get(key, 0) + 1, served_round)
+            self._camera_rounds[key] = job_round
+            self._sequence += 1
+            heapq.heappush(self._queue, (priority, job_round, self._sequence, job))
+            self._cond.notify()
+        return job
+
+    def _work(self):
+
+        while True:
+            with self._cond:
+                while len(self._queue) == 0 and not self._closing:
+                    self._cond.wait()
+                if len(self._queue) == 0:
+                    return
+                (priority, job_round, sequence, job) = heapq.heappop(self._queue)
+                self._served_rounds[priority] = job_round
+                now = time.perf_counter()
+                queue_time = now - job.submit_time
+                shed = (priority > 0 and
+                        queue_time > self._max_queue_time and
+                        job.deadline is not None and
+                        now > job.deadline)
+                self._update_stats(priority, queue_time, shed)
+
+            if shed:
+                job.skip()
+            else:
+                job.run()
+
+    # Must be called with the lock held
+    def _update_stats(self, priority, queue_time, shed):
+
+        stats = self._stats.get(priority)
+        if stats is None:
+            stats = {'jobs': 0, 'shed': 0, 'avg_queue_ms': 0.0, 'max_queue_ms': 0.0}
+            self._stats[priority] = stats
+
+        queue_ms = queue_time * 1e3
+        stats['jobs'] += 1
+        stats['avg_queue_ms'] += (queue_ms - stats['avg_queue_ms']) / min(stats['jobs'], 100)
+        stats['max_queue_ms'] = max(stats['max_queue_ms'], queue_ms)
+        metrics.set_gauge('detection_queue_latency_ms_p{}'.format(priority), round(stats['avg_queue_ms'], 2))
+        if shed:
+            stats['shed'] += 1
+            metrics.inc_counter('detection_shed_jobs_p{}'.format(priority))
+
+    # Returns a dict with a dict of statistics (jobs, shed jobs, average
+    # and max queue latency) for each priority class (the priority is the
+    # dict key).
+    def get_stats(self):
+
+        with self._cond:
+            return dict((priority, dict(stats)) for priority, stats in self._stats.items())
+
+    # Stop the workers (queued jobs are still run).
+    def close(self):
+
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
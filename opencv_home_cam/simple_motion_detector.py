@@ -37,6 +37,13 @@ class SimpleMotionDetector(Detector):
         self._object_min_area = config.object_min_area
         self._pixel_intensity_threshold = config.pixel_intensity_threshold
 
+    def is_motion_detector(self):
+        return True
+
+    # The next frame becomes the new previous frame
+    def reset(self):
+        self._prev_frame = None
+
     def detect(self, frame):
 
         if self._prev_frame is None:
@@ -0,0 +1,150 @@
+import numpy
+import logging
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from .detector import Detector
+from .nms import nms_indices
+
+
+# tile_size     - (width, height) of the tiles in pixels.
+# overlap       - The overlap in pixels between adjacent tiles. Objects
+#                 smaller than the overlap are always completely inside at
+#                 least one tile.
+# workers       - The number of threads the tiles are processed by.
+# iou_threshold - Overlap threshold used when merging the rectangles of
+#                 adjacent tiles.
+TilingConfig = namedtuple('TilingConfig',
+                          ['tile_size',
+                           'overlap',
+                           'workers',
+                           'iou_threshold'],
+                          verbose=False)
+
+
+# Returns a list of (x, y, width, height) tiles covering a frame of the
+# given (width, height) size.
+def compute_tiles(frame_size, tile_size, overlap):
+
+    tiles = []
+    (frame_width, frame_height) = frame_size
+    (tile_width, tile_height) = tile_size
+
+    def positions(frame_len, tile_len):
+        if frame_len <= tile_len:
+            return [0]
+        step = max(1, tile_len - overlap)
+        pos = list(range(0, frame_len - tile_len, step))
+        # The last tile is aligned with the frame edge
+        pos.append(frame_len - tile_len)
+        return pos
+
+    for y in positions(frame_height, tile_height):
+        for x in positions(frame_width, tile_width):
+            tiles.append((x, y,
+                          min(tile_width, frame_width - x),
+                          min(tile_height, frame_height - y)))
+    return tiles
+
+
+# A tiled detector wraps another (stateless) detector.
+# The frame is split into overlapping tiles that are processed in parallel
+# by a thread pool (OpenCV releases the GIL during detection). The
+# rectangles of all tiles are merged with non-maximum suppression in order
+# to remove duplicates on the tile borders.
+class TiledDetector(Detector):
+
+    def __init__(self, detector, config):
+
+        # Detector.__init__ is not called, the name and color of the
+        # wrapped detector are used.
+        self._logger = logging.getLogger(__name__)
+        self._detector = detector
+        self._tile_size = config.tile_size
+        self._overlap = config.overlap
+        self._iou_threshold = config.iou_threshold
+        self._executor = ThreadPoolExecutor(max_workers=config.workers)
+        self._tiles = None
+        self._frame_size = None
+
+    def get_name(self):
+        return self._detector.get_name()
+
+    def get_rgb_tuple(self):
+        return self._detector.get_rgb_tuple()
+
+    def uses_color_frames(self):
+        return self._detector.uses_color_frames()
+
+    def get_parameters(self):
+        return self._detector.get_parameters()
+
+    def set_parameters(self, parameters):
+        self._detector.set_parameters(parameters)
+
+    def set_parameter_ladder(self, ladder):
+        self._detector.set_parameter_ladder(ladder)
+
+    def get_parameter_ladder(self):
+        return self._detector.get_parameter_ladder()
+
+    def _detect_tile(self, frame, tile):
+
+        (x, y, w, h) = tile
+        (rects, scores) = self._detector.detect_with_scores(frame[y:y + h, x:x + w])
+        if len(rects) == 0:
+            return None
+        rects = numpy.array(rects, dtype=numpy.int32).reshape(-1, 4)
+        rects[:, 0] += x
+        rects[:, 1] += y
+        return (rects, numpy.asarray(scores).reshape(-1))
+
+    def detect(self, frame):
+
+        return self.detect_with_scores(frame)[0]
+
+    def detect_with_scores(self, frame):
+
+        frame_size = (frame.shape[1], frame.shape[0])
+        if frame_size != self._frame_size:
+            self._frame_size = frame_size
+            self._tiles = compute_tiles(frame_size, self._tile_size, self._overlap)
+            self._logger.info("{}: {} tiles for frame size {}".format(self.get_name(),
+                                                                     len(self._tiles),
+                                                                     frame_size))
+
+        if len(self._tiles) == 1:
+            return self._detector.detect_with_scores(frame)
+
+        results = self._executor.map(lambda tile: self._detect_tile(frame, tile),
+                                     self._tiles)
+        results = [r for r in results if r is not None]
+        if len(results) == 0:
+            return ([], numpy.zeros(0))
+
+        rects = numpy.concatenate([r[0] for r in results])
+        scores = numpy.concatenate([r[1] for r in results])
+        keep = nms_indices(rects, scores, self._iou_threshold)
+        return (rects[keep], scores[keep])
+
+
+# Compare single call detection with tiled detection.
+# detector is the plain detector and tiled_detector the tiled version of
+# the same detector. frames is a list of grayscale frames.
+# Returns a dict with the average detection time (ms) and the average
+# number of rectangles per frame for both variants.
+def benchmark_tiling(detector, tiled_detector, frames):
+
+    results = {}
+    for (variant, d) in (('single', detector), ('tiled', tiled_detector)):
+        # Warm up (thread pool creation, tile computation etc.)
+        d.detect(frames[0])
+        nbr_of_rects = 0
+        start = time.perf_counter()
+        for frame in frames:
+            nbr_of_rects += len(d.detect(frame))
+        elapsed = time.perf_counter() - start
+        results[variant + '_ms'] = elapsed * 1e3 / len(frames)
+        results[variant + '_rects'] = nbr_of_rects / float(len(frames))
+    results['speedup'] = results['single_ms'] / results['tiled_ms']
+    return results
@@ -0,0 +1,104 @@
+import os
+import time
+import logging
+from . import metrics
+from .recorder import Recorder
+
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+# A timelapse records one frame every interval seconds to its own recorder
+# (with its own directory, file limit and codec), independent of the event
+# recording.
+# The captured frames are written as they are (before any rectangles are
+# drawn), without copying.
+# The encoding time and the written bytes are measured, and the cost per
+# day (CPU seconds and MB) is estimated from them.
+class Timelapse:
+
+    # config   - The RecorderConfig of the timelapse recording.
+    # interval - The time (in seconds) between two recorded frames.
+    # fps      - The frame rate of the timelapse video files.
+    def __init__(self, config, interval, fps, resolution):
+
+        self._logger = logging.getLogger(__name__)
+
+        # The timelapse frames never have rectangles, so no sidecar files
+        # are needed.
+        self._recorder = Recorder(config=config._replace(draw_rectangles=True),
+                                  fps=fps,
+                                  resolution=resolution,
+                                  capture_fps=1.0 / interval)
+        self._interval = interval
+        self._next_frame_time = None
+        self._nbr_of_frames = 0
+        self._encode_time = 0.0
+        self._closed_file_bytes = 0
+        self._closed_file_frames = 0
+        self._current_file = None
+        self._current_file_frames = 0
+
+    def get_interval(self):
+
+        return self._interval
+
+    # Record the frame if interval seconds have passed since the last
+    # recorded frame.
+    def add_frame(self, frame, timestamp):
+
+        if self._next_frame_time is not None and timestamp < self._next_frame_time:
+            return
+
+        if self._next_frame_time is None:
+            self._next_frame_time = timestamp
+        # Keep the schedule (no drift), but don't catch up on missed frames
+        self._next_frame_time = max(self._next_frame_time + self._interval, timestamp)
+
+        start = time.perf_counter()
+        (recording_file, frame_index) = self._recorder.record_frame(frame, timestamp=timestamp)
+        self._encode_time += time.perf_counter() - start
+        self._nbr_of_frames += 1
+
+        if recording_file != self._current_file:
+            # The video writer buffers the file until it is released, so
+            # the disk usage is measured on the closed files.
+            if self._current_file is not None:
+                self._add_closed_file()
+                self._log_cost()
+            self._current_file = recording_file
+            self._current_file_frames = 0
+        self._current_file_frames += 1
+
+    def _add_closed_file(self):
+
+        try:
+            self._closed_file_bytes += os.path.getsize(self._current_file)
+            self._closed_file_frames += self._current_file_frames
+        except OSError:
+            # Already removed due to the file limit
+            pass
+
+    # Returns a dict with the number of recorded frames and the estimated
+    # CPU time (seconds) and disk usage (MB) per day.
+    def get_cost(self):
+
+        frames_per_day = SECONDS_PER_DAY / self._interval
+        cost = {'frames': self._nbr_of_frames,
+                'cpu_s_per_day': round(self._encode_time / max(1, self._nbr_of_frames) * frames_per_day, 1),
+                'mb_per_day': round(self._closed_file_bytes / max(1, self._closed_file_frames) * frames_per_day / 1e6, 1)}
+        metrics.set_gauge('timelapse_cpu_s_per_day', cost['cpu_s_per_day'])
+        metrics.set_gauge('timelapse_mb_per_day', cost['mb_per_day'])
+        return cost
+
+    def _log_cost(self):
+
+        self._logger.info("Timelapse cost: {}".format(self.get_cost()))
+
+    def close(self):
+
+        self._recorder.close()
+        if self._current_file is not None:
+            self._add_closed_file()
+            self._current_file = None
+            self._log_cost()
@@ -0,0 +1,160 @@
+import cv2
+import numpy
+import os
+import tempfile
+import time
+import logging
+
+
+# The codec used if the configured codec is not supported by the local
+# OpenCV build. MJPEG in an AVI container is supported by all builds since
+# OpenCV has a built-in MJPEG encoder.
+FALLBACK_FOURCC = 'mjpa'
+FALLBACK_CONTAINER = 'avi'
+
+# Codecs (fourcc and container) tried by the benchmark.
+BENCHMARK_CODECS = [('MJPG', 'avi'),
+                    ('XVID', 'avi'),
+                    ('mp4v', 'mp4'),
+                    ('avc1', 'mp4'),
+                    ('H264', 'mkv')]
+
+
+def open_video_writer(file_name, fourcc, fps, resolution, quality=None):
+
+    writer = cv2.VideoWriter(file_name,
+                             cv2.VideoWriter_fourcc(*fourcc),
+                             fps,
+                             resolution)
+    if writer.isOpened() and quality is not None:
+        # Not all backends/codecs support the quality property, so the
+        # return value is ignored.
+        writer.set(cv2.VIDEOWRITER_PROP_QUALITY, quality)
+    return writer
+
+
+# Check if the local OpenCV build is able to encode video with the
+# given fourcc into the given container.
+# A few frames are written to a temporary file, since some backends will
+# open the writer successfully but fail on the first write.
+def is_codec_supported(fourcc, container, fps=10.0, resolution=(320, 240)):
+
+    (fd, file_name) = tempfile.mkstemp(suffix='.' + container,
+                                       prefix='opencv-home-cam-codec-')
+    os.close(fd)
+    try:
+        writer = open_video_writer(file_name, fourcc, fps, resolution)
+        if not writer.isOpened():
+            return False
+        frame = numpy.zeros((resolution[1], resolution[0], 3), numpy.uint8)
+        for i in range(3):
+            writer.write(frame)
+        writer.release()
+        return os.path.getsize(file_name) > 0
+    except cv2.error:
+        return False
+    finally:
+        os.remove(file_name)
+
+
+# Select the codec used for recording.
+# Returns a (fourcc, container) tuple. If the configured codec is not
+# supported, the fallback codec is returned.
+def select_codec(fourcc, container, fps, resolution):
+
+    logger = logging.getLogger(__name__)
+
+    if is_codec_supported(fourcc, container, fps, resolution):
+        logger.info("Using codec {} with container {}".format(fourcc, container))
+        return (fourcc, container)
+
+    logger.warning("Codec {} with container {} is not supported by this "
+                   "OpenCV build. Falling back to {} with container {}".format(fourcc,
+                                                                              container,
+                                                                              FALLBACK_FOURCC,
+                                                                              FALLBACK_CONTAINER))
+    return (FALLBACK_FOURCC, FALLBACK_CONTAINER)
+
+
+# Create synthetic test frames: a static textured background with a
+# moving rectangle and some sensor noise. This is a reasonable
+# approximation of a fixed home camera.
+def _create_test_frames(nbr_of_frames, resolution):
+
+    (width, height) = resolution
+    rng = numpy.random.RandomState(0)
+    background = rng.randint(0, 256, (height // 8, width // 8, 3)).astype(numpy.uint8)
+    background = cv2.resize(background, (width, height), interpolation=cv2.INTER_LINEAR)
+    background = cv2.GaussianBlur(background, (5, 5), 0)
+
+    frames = []
+    for i in range(nbr_of_frames):
+        frame = background.copy()
+        x = (i * 4) % max(1, width - width // 5)
+        y = height // 3
+        cv2.rectangle(frame, (x, y), (x + width // 5, y + height // 3),
+                      (40, 80, 160), -1)
+        noise = rng.randint(-4, 5, frame.shape)
+        frame = numpy.clip(frame.astype(numpy.int16) + noise, 0, 255).astype(numpy.uint8)
+        frames.append(frame)
+
+    return frames
+
+
+def _read_test_frames(input_file, nbr_of_frames):
+
+    video_capture = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < nbr_of_frames:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    video_capture.release()
+
+    return frames
+
+
+# Benchmark all codecs in BENCHMARK_CODECS (or the codecs given in the
+# codecs argument) on this host.
+# Returns a list of (fourcc, container, supported, encode fps,
+# bytes per minute) tuples. bytes per minute is the size of one minute of
+# video recorded at the given fps.
+def benchmark_codecs(fps, resolution, nbr_of_frames=200, input_file=None,
+                     codecs=None, quality=None):
+
+    if codecs is None:
+        codecs = BENCHMARK_CODECS
+
+    if input_file is not None:
+        frames = _read_test_frames(input_file, nbr_of_frames)
+        if len(frames) > 0:
+            resolution = (frames[0].shape[1], frames[0].shape[0])
+    else:
+        frames = _create_test_frames(nbr_of_frames, resolution)
+
+    results = []
+    for (fourcc, container) in codecs:
+        if len(frames) == 0 or not is_codec_supported(fourcc, container, fps, resolution):
+            results.append((fourcc, container, False, None, None))
+            continue
+
+        (fd, file_name) = tempfile.mkstemp(suffix='.' + container,
+                                           prefix='opencv-home-cam-bench-')
+        os.close(fd)
+        try:
+            writer = open_video_writer(file_name, fourcc, fps, resolution, quality)
+            start = time.perf_counter()
+            for frame in frames:
+                writer.write(frame)
+            writer.release()
+            elapsed = time.perf_counter() - start
+            file_size = os.path.getsize(file_name)
+        finally:
+            os.remove(file_name)
+
+        encode_fps = len(frames) / elapsed
+        bytes_per_minute = file_size * 60.0 * fps / len(frames)
+        results.append((fourcc, container, True, encode_fps, bytes_per_minute))
+
+    return results
@@ -0,0 +1,146 @@
+import cv2
+import numpy
+
+
+class DetectionZoneException(Exception):
+
+    pass
+
+
+# A detection zone limits the area of the frame processed by a detector.
+#
+# The zone is defined by include and exclude polygons. Each polygon is a
+# list of (x, y) points where x and y are fractions (0.0 - 1.0) of the
+# frame width and height. If there are no include polygons, the whole frame
+# is included. Exclude polygons are removed from the included area.
+#
+# The polygons are rasterized into a mask once (when the zone is created).
+# Detection is then made on the frame cropped to the bounding box of the
+# mask, and all rectangles with their center outside the mask are
+# discarded.
+class DetectionZone:
+
+    def __init__(self, resolution, include_polygons, exclude_polygons):
+
+        (width, height) = resolution
+
+        if len(include_polygons) > 0:
+            mask = numpy.zeros((height, width), numpy.uint8)
+            cv2.fillPoly(mask, self._to_pixels(include_polygons, resolution), 255)
+        else:
+            mask = numpy.full((height, width), 255, numpy.uint8)
+
+        if len(exclude_polygons) > 0:
+            cv2.fillPoly(mask, self._to_pixels(exclude_polygons, resolution), 0)
+
+        (x, y, w, h) = cv2.boundingRect(mask)
+        if w == 0 or h == 0:
+            raise DetectionZoneException("Detection zone is empty")
+
+        self._mask = mask
+        self._bounding_box = (x, y, w, h)
+        self._area_fraction = cv2.countNonZero(mask) / float(width * height)
+
+    @staticmethod
+    def _to_pixels(polygons, resolution):
+
+        (width, height) = resolution
+        pixel_polygons = []
+        for polygon in polygons:
+            points = numpy.array(polygon, numpy.float64) * (width - 1, height - 1)
+            pixel_polygons.append(numpy.round(points).astype(numpy.int32))
+        return pixel_polygons
+
+    # Returns a new zone covering the intersection of this zone and
+    # another zone.
+    def intersect(self, other):
+
+        zone = DetectionZone.__new__(DetectionZone)
+        zone._mask = cv2.bitwise_and(self._mask, other._mask)
+        (x, y, w, h) = cv2.boundingRect(zone._mask)
+        if w == 0 or h == 0:
+            raise DetectionZoneException("Detection zone is empty")
+        zone._bounding_box = (x, y, w, h)
+        zone._area_fraction = cv2.countNonZero(zone._mask) / float(zone._mask.size)
+        return zone
+
+    def get_bounding_box(self):
+
+        return self._bounding_box
+
+    # Returns the fraction of the frame area covered by the zone.
+    def get_area_fraction(self):
+
+        return self._area_fraction
+
+    # Crop the frame to the bounding box of the zone.
+    # The returned frame is a view (no copy is made).
+    def crop(self, frame):
+
+        (x, y, w, h) = self._bounding_box
+        return frame[y:y + h, x:x + w]
+
+    # Translate rectangles detected in a cropped frame back to full frame
+    # coordinates and discard all rectangles with their center outside the
+    # zone.
+    # Returns a (rects, scores) tuple with the remaining rectangles and
+    # their scores.
+    def filter_rects(self, rects, scores):
+
+        if len(rects) == 0:
+            return (rects, scores)
+
+        (x, y, w, h) = self._bounding_box
+        rects = numpy.array(rects, dtype=numpy.int32).reshape(-1, 4)
+        rects[:, 0] += x
+        rects[:, 1] += y
+
+        return self.filter_frame_rects(rects, scores)
+
+    # Discard all rectangles (in full frame coordinates) with their center
+    # outside the zone.
+    # Returns a (rects, scores) tuple with the remaining rectangles and
+    # their scores.
+    def filter_frame_rects(self, rects, scores):
+
+        if len(rects) == 0:
+            return (rects, scores)
+
+        rects = numpy.asarray(rects, dtype=numpy.int32).reshape(-1, 4)
+        (height, width) = self._mask.shape
+        center_x = numpy.clip(rects[:, 0] + rects[:, 2] // 2, 0, width - 1)
+        center_y = numpy.clip(rects[:, 1] + rects[:, 3] // 2, 0, height - 1)
+        inside = self._mask[center_y, center_x] > 0
+
+        return (rects[inside], numpy.asarray(scores).reshape(-1)[inside])
+
+
+# Rasterize the zones of all detectors of a camera.
+# detector_zones is a dict of (include polygons, exclude polygons) tuples
+# (detector name is the dict key). The camera zone (if any) is intersected
+# with the zone of each detector.
+# combined_detectors is a list of the names of the detectors combined into
+# the camera's detectors (the cascades of haar-multi detectors). They get
+# zones as well (see CamController._detect).
+# Returns a dict of DetectionZones (detector name is the dict key).
+# Detectors covering the whole frame have no zone.
+def create_detection_zones(camera_cfg, resolution, detector_zones, combined_detectors=()):
+
+    zones = {}
+    camera_zone = None
+    if len(camera_cfg.include_zones) > 0 or len(camera_cfg.exclude_zones) > 0:
+        camera_zone = DetectionZone(resolution,
+                                    camera_cfg.include_zones,
+                                    camera_cfg.exclude_zones)
+
+    for camera_detector in list(camera_cfg.detectors) + list(combined_detectors):
+        (include_zones, exclude_zones) = detector_zones.get(camera_detector, ([], []))
+        zone = camera_zone
+        if len(include_zones) > 0 or len(exclude_zones) > 0:
+            zone = DetectionZone(resolution, include_zones, exclude_zones)
+            if camera_zone is not None:
+                zone = zone.intersect(camera_zone)
+        if zone is not None:
+            zones[camera_detector] = zone
+
+    return zones
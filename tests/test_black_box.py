@@ -0,0 +1,100 @@
+import os
+import cv2
+import numpy
+from opencv_home_cam.black_box import BlackBox, BlackBoxConfig, QUEUE_SIZE, read_black_box, export_black_box
+
+
+def _config(path, duration=1.0, slot_size=65536):
+
+    return BlackBoxConfig(path=path,
+                          duration=duration,
+                          slot_size=slot_size,
+                          jpeg_quality=90,
+                          sync_interval=0)
+
+
+def _frame(i):
+
+    return numpy.full((48, 64, 3), i * 20, numpy.uint8)
+
+
+def _mean(jpeg):
+
+    return cv2.imdecode(numpy.frombuffer(jpeg, numpy.uint8), cv2.IMREAD_COLOR).mean()
+
+
+def test_ring_wraparound(tmpdir):
+
+    path = os.path.join(str(tmpdir), 'ring')
+    # 4 slots, fewer frames than QUEUE_SIZE so none are dropped
+    black_box = BlackBox(_config(path), 4, {'d': (0, 0, 255)})
+    nbr_of_frames = 6
+    assert nbr_of_frames <= QUEUE_SIZE
+    for i in range(nbr_of_frames):
+        black_box.add_frame(_frame(i), 100.0 + i, {'d': [(i, i, 10, 10)], 'e': None})
+    black_box.close()
+
+    (fps, colors, frames) = read_black_box(path)
+    assert fps == 4
+    assert colors == {'d': [0, 0, 255]}
+    # The oldest frames have been overwritten, the rest are in capture order
+    assert [timestamp for (timestamp, jpeg, rects) in frames] == [102.0, 103.0, 104.0, 105.0]
+    assert [rects for (timestamp, jpeg, rects) in frames] == [{'d': [[i, i, 10, 10]]} for i in range(2, 6)]
+    for (i, (timestamp, jpeg, rects)) in zip(range(2, 6), frames):
+        assert abs(_mean(jpeg) - i * 20) < 2
+
+
+def test_frame_is_copied(tmpdir):
+
+    path = os.path.join(str(tmpdir), 'ring')
+    black_box = BlackBox(_config(path), 4, {})
+    frame = _frame(0)
+    black_box.add_frame(frame, 100.0, {})
+    # E.g. rectangles drawn into the frame after it has been added
+    frame[:] = 255
+    black_box.close()
+
+    (fps, colors, frames) = read_black_box(path)
+    assert len(frames) == 1
+    assert _mean(frames[0][1]) < 2
+
+
+def test_large_frames_dropped(tmpdir):
+
+    path = os.path.join(str(tmpdir), 'ring')
+    black_box = BlackBox(_config(path, slot_size=100), 4, {})
+    black_box.add_frame(numpy.random.randint(0, 255, (48, 64, 3), numpy.uint8), 100.0, {})
+    black_box.close()
+
+    (fps, colors, frames) = read_black_box(path)
+    assert frames == []
+
+
+def test_previous_ring_kept(tmpdir):
+
+    path = os.path.join(str(tmpdir), 'ring')
+    black_box = BlackBox(_config(path), 4, {})
+    black_box.add_frame(_frame(1), 100.0, {})
+    black_box.close()
+    black_box = BlackBox(_config(path), 4, {})
+    black_box.close()
+
+    assert read_black_box(path)[2] == []
+    assert [timestamp for (timestamp, jpeg, rects) in read_black_box(path + '.prev')[2]] == [100.0]
+
+
+def test_export_black_box(tmpdir):
+
+    path = os.path.join(str(tmpdir), 'ring')
+    black_box = BlackBox(_config(path), 4, {'d': (0, 255, 0)})
+    for i in range(3):
+        black_box.add_frame(_frame(i), 100.0 + i, {'d': [(1, 2, 3, 4)]})
+    black_box.close()
+
+    output_file = os.path.join(str(tmpdir), 'incident.avi')
+    assert export_black_box(path, output_file) == (3, (100.0, 102.0))
+    capture = cv2.VideoCapture(output_file)
+    nbr_of_frames = 0
+    while capture.read()[0]:
+        nbr_of_frames += 1
+    assert nbr_of_frames == 3
@@ -0,0 +1,123 @@
+import os
+import cv2
+import numpy
+import pytest
+from opencv_home_cam.frame_index import (FrameIndexWriter, FrameIndexException, scan_avi_frames,
+                                         read_frame_index, export_clip, get_index_name)
+
+
+RESOLUTION = (64, 48)
+
+
+def _frame(i):
+
+    return numpy.full((RESOLUTION[1], RESOLUTION[0], 3), i * 10, numpy.uint8)
+
+
+# Record an indexed MJPEG AVI like the recorder does.
+# Returns the recording file.
+def _record(directory, name, timestamps, close_index=True):
+
+    recording_file = os.path.join(str(directory), name)
+    writer = cv2.VideoWriter(recording_file, cv2.VideoWriter_fourcc(*'MJPG'), 10.0, RESOLUTION)
+    index = FrameIndexWriter(recording_file, 10.0, RESOLUTION)
+    for (i, timestamp) in enumerate(timestamps):
+        writer.write(_frame(i))
+        index.add(i, timestamp)
+    writer.release()
+    if close_index:
+        index.close().result()
+    return recording_file
+
+
+def _read_frames(video_file):
+
+    capture = cv2.VideoCapture(video_file)
+    frames = []
+    while True:
+        (ret, frame) = capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    capture.release()
+    return frames
+
+
+def _read_jpeg(video_file, frame_index):
+
+    (offset, size) = scan_avi_frames(video_file)[frame_index]
+    with open(video_file, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def test_scan_avi_frames(tmpdir):
+
+    recording_file = _record(tmpdir, 'cam0.avi', [100.0 + i for i in range(5)])
+
+    assert len(scan_avi_frames(recording_file)) == 5
+    for i in range(5):
+        jpeg = _read_jpeg(recording_file, i)
+        frame = cv2.imdecode(numpy.frombuffer(jpeg, numpy.uint8), cv2.IMREAD_COLOR)
+        assert abs(frame.mean() - i * 10) < 2
+
+
+def test_scan_avi_frames_truncated(tmpdir):
+
+    recording_file = _record(tmpdir, 'cam0.avi', [100.0 + i for i in range(5)])
+    offsets = scan_avi_frames(recording_file)
+    (offset, size) = offsets[3]
+    with open(recording_file, 'r+b') as f:
+        f.truncate(offset + size // 2)
+
+    assert scan_avi_frames(recording_file) == offsets[:3]
+
+
+def test_read_frame_index(tmpdir):
+
+    timestamps = [100.0 + i * 0.1 for i in range(5)]
+    recording_file = _record(tmpdir, 'cam0.avi', timestamps)
+    (header, frames) = read_frame_index(get_index_name(recording_file))
+
+    assert header['file'] == 'cam0.avi'
+    assert header['resolution'] == list(RESOLUTION)
+    assert [timestamp for (timestamp, offset, size) in frames] == timestamps
+    assert [(offset, size) for (timestamp, offset, size) in frames] == scan_avi_frames(recording_file)
+
+
+def test_read_frame_index_without_offsets(tmpdir):
+
+    # An index that was never closed (e.g. after a crash)
+    timestamps = [100.0 + i * 0.1 for i in range(5)]
+    recording_file = _record(tmpdir, 'cam0.avi', timestamps, close_index=False)
+    (header, frames) = read_frame_index(get_index_name(recording_file))
+
+    assert [timestamp for (timestamp, offset, size) in frames] == timestamps
+    assert [(offset, size) for (timestamp, offset, size) in frames] == scan_avi_frames(recording_file)
+
+
+def test_export_clip(tmpdir):
+
+    cam0 = _record(tmpdir, 'cam0.avi', [100.0 + i for i in range(5)])
+    cam1 = _record(tmpdir, 'cam1.avi', [105.0 + i for i in range(5)])
+    _record(tmpdir, 'other0.avi', [100.0 + i for i in range(10)])
+    output_file = os.path.join(str(tmpdir), 'clip.avi')
+
+    (nbr_of_frames, (first, last)) = export_clip(str(tmpdir), 103.0, 106.0, output_file, file_base='cam')
+
+    # The clip spans both recordings of the cam file base
+    assert nbr_of_frames == 4
+    assert (first, last) == (103.0, 106.0)
+    assert len(_read_frames(output_file)) == 4
+
+    # The frames are copied, not re-encoded
+    expected = [_read_jpeg(cam0, 3), _read_jpeg(cam0, 4), _read_jpeg(cam1, 0), _read_jpeg(cam1, 1)]
+    assert [_read_jpeg(output_file, i) for i in range(4)] == expected
+
+
+def test_export_clip_without_frames(tmpdir):
+
+    _record(tmpdir, 'cam0.avi', [100.0 + i for i in range(5)])
+
+    with pytest.raises(FrameIndexException):
+        export_clip(str(tmpdir), 200.0, 300.0, os.path.join(str(tmpdir), 'clip.avi'))
@@ -0,0 +1,70 @@
+import numpy
+from opencv_home_cam.nms import nms_indices, nms, fuse, FusionConfig
+
+
+def test_nms_indices_empty():
+
+    assert len(nms_indices([])) == 0
+
+
+def test_nms_indices_keeps_highest_score():
+
+    rects = [(0, 0, 10, 10), (1, 1, 10, 10), (50, 50, 10, 10)]
+    scores = [0.5, 0.9, 0.7]
+    assert list(nms_indices(rects, scores, 0.5)) == [1, 2]
+
+
+def test_nms_indices_threshold():
+
+    # IoU of the two rectangles is 50 / 150
+    rects = [(0, 0, 10, 10), (5, 0, 10, 10)]
+    scores = [0.9, 0.8]
+    assert list(nms_indices(rects, scores, 0.3)) == [0]
+    assert list(nms_indices(rects, scores, 0.4)) == [0, 1]
+
+
+def test_nms_indices_without_scores_keeps_larger():
+
+    rects = [(0, 0, 10, 10), (0, 0, 12, 12)]
+    assert list(nms_indices(rects, None, 0.5)) == [1]
+
+
+def test_nms_returns_rectangles():
+
+    rects = numpy.array([(0, 0, 10, 10), (1, 1, 10, 10)])
+    kept = nms(rects, [0.1, 0.2], 0.5)
+    assert kept.tolist() == [[1, 1, 10, 10]]
+
+
+def test_fuse_overlapping_detectors():
+
+    config = FusionConfig(detectors=['a', 'b'], iou_threshold=0.5)
+    rectangles = {'a': [(0, 0, 10, 10)], 'b': [(0, 0, 10, 10), (100, 100, 10, 10)], 'c': [(1, 2, 3, 4)]}
+    scores = {'a': [0.5], 'b': [0.9, 0.8], 'c': None}
+    (fused_rects, fused_scores) = fuse(rectangles, scores, config)
+
+    # The overlapping object is reported by the first detector with the
+    # highest score of the group
+    assert fused_rects['a'].tolist() == [[0, 0, 10, 10]]
+    assert fused_scores['a'].tolist() == [0.9]
+    assert fused_rects['b'].tolist() == [[100, 100, 10, 10]]
+    # Detectors not fused are left untouched
+    assert fused_rects['c'] == [(1, 2, 3, 4)]
+
+
+def test_fuse_weighted_mean():
+
+    config = FusionConfig(detectors=['a', 'b'], iou_threshold=0.4)
+    rectangles = {'a': [(0, 0, 10, 10)], 'b': [(4, 0, 10, 10)]}
+    scores = {'a': [1.0], 'b': [3.0]}
+    (fused_rects, fused_scores) = fuse(rectangles, scores, config)
+
+    assert fused_rects['a'].tolist() == [[3, 0, 10, 10]]
+    assert fused_rects['b'] is None
+
+
+def test_fuse_without_detections():
+
+    config = FusionConfig(detectors=['a', 'b'], iou_threshold=0.5)
+    (fused_rects, fused_scores) = fuse({'a': None, 'b': []}, {'a': None, 'b': None}, config)
+    assert fused_rects == {'a': None, 'b': None}
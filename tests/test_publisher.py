@@ -0,0 +1,110 @@
+import os
+import time
+import struct
+import pytest
+from opencv_home_cam.cam_controller import DetectionData
+from opencv_home_cam.publisher import (Publisher, PublisherConfig, Subscriber, encode_message,
+                                       decode_message, LENGTH_FORMAT, LENGTH_SIZE)
+
+
+def _detection_data(timestamp, status, rectangles):
+
+    return DetectionData(frame=None,
+                         detector_status=status,
+                         rectangles=rectangles,
+                         scores={name: None for name in status},
+                         timestamp=timestamp,
+                         recording_file=None,
+                         frame_index=None,
+                         detectors_run=True)
+
+
+# Wait until the publisher has received the filters of all subscribers
+def _wait_for_filters(publisher, nbr_of_subscribers):
+
+    deadline = time.time() + 5.0
+    while len([s for s in publisher._subscriptions.values() if s.request is None]) < nbr_of_subscribers:
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def publisher(tmpdir):
+
+    publisher = Publisher(PublisherConfig(socket_path=os.path.join(str(tmpdir), 'pub.sock'),
+                                          max_buffer=4096))
+    yield publisher
+    publisher.close()
+
+
+def test_message_round_trip():
+
+    message = encode_message('camera0', 123.5, [('a', True, True, [(1, 2, 3, 4), (5, 6, 7, 8)]),
+                                                ('b', False, False, None)])
+    (length,) = struct.unpack_from(LENGTH_FORMAT, message, 0)
+    assert length == len(message) - LENGTH_SIZE
+
+    decoded = decode_message(message[LENGTH_SIZE:])
+    assert decoded == {'camera': 'camera0',
+                       'timestamp': 123.5,
+                       'detectors': [{'name': 'a', 'status': True, 'transition': True,
+                                      'rectangles': [[1, 2, 3, 4], [5, 6, 7, 8]]},
+                                     {'name': 'b', 'status': False, 'transition': False,
+                                      'rectangles': []}]}
+
+
+def test_framing(publisher, tmpdir):
+
+    subscriber = Subscriber(os.path.join(str(tmpdir), 'pub.sock'))
+    _wait_for_filters(publisher, 1)
+    for i in range(3):
+        publisher.publish('camera0', _detection_data(100.0 + i, {'a': True}, {'a': [(i, i, 1, 1)]}), {'a'})
+
+    # The messages arrive in one stream and are split by the length field
+    for i in range(3):
+        message = subscriber.receive()
+        assert message['timestamp'] == 100.0 + i
+        assert message['detectors'][0]['rectangles'] == [[i, i, 1, 1]]
+    subscriber.close()
+
+
+def test_filters(publisher, tmpdir):
+
+    socket_path = os.path.join(str(tmpdir), 'pub.sock')
+    detector_subscriber = Subscriber(socket_path, detectors=['b'])
+    camera_subscriber = Subscriber(socket_path, cameras=['camera1'])
+    _wait_for_filters(publisher, 2)
+    detection_data = _detection_data(100.0, {'a': True, 'b': False}, {'a': [(1, 1, 1, 1)], 'b': None})
+    publisher.publish('camera0', detection_data, set())
+    publisher.publish('camera1', detection_data, set())
+
+    message = detector_subscriber.receive()
+    assert message['camera'] == 'camera0'
+    assert [d['name'] for d in message['detectors']] == ['b']
+    assert camera_subscriber.receive()['camera'] == 'camera1'
+    detector_subscriber.close()
+    camera_subscriber.close()
+
+
+def test_slow_subscriber_disconnected(publisher, tmpdir):
+
+    socket_path = os.path.join(str(tmpdir), 'pub.sock')
+    slow_subscriber = Subscriber(socket_path)
+    _wait_for_filters(publisher, 1)
+    detection_data = _detection_data(100.0, {'a': True}, {'a': [(1, 2, 3, 4)] * 100})
+
+    # The slow subscriber doesn't read, so the socket buffer and then the
+    # publisher's buffer fill up. publish() must never block.
+    for i in range(10000):
+        publisher.publish('camera0', detection_data, set())
+        if publisher.get_stats()['slow_disconnects'] > 0:
+            break
+    assert publisher.get_stats()['slow_disconnects'] == 1
+    assert publisher.get_stats()['subscribers'] == 0
+
+    # The messages sent before the disconnect are still received complete
+    nbr_of_messages = 0
+    while slow_subscriber.receive() is not None:
+        nbr_of_messages += 1
+    assert 0 < nbr_of_messages < i + 1
+    slow_subscriber.close()
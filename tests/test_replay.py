@@ -0,0 +1,114 @@
+import os
+import numpy
+import pytest
+from opencv_home_cam.frame_archive import FrameArchiveWriter, FrameArchive
+from opencv_home_cam.replay import replay_archive, compare_replay, save_baseline, load_baseline, ReplayException
+
+
+CONFIG = """
+[camera0]
+id=0
+fps=10
+detectors=detector0
+
+[detector0]
+detector_type=simple-motion
+"""
+
+
+# Write a frame archive with a white square that moves for a while and
+# then stops.
+def _write_archive(archive_file):
+
+    writer = FrameArchiveWriter(archive_file)
+    for i in range(20):
+        frame = numpy.zeros((120, 160, 3), numpy.uint8)
+        x = 10 + 5 * min(i, 10)
+        frame[40:80, x:x + 40] = 255
+        writer.add_frame(frame, 100.0 + i * 0.1)
+    writer.close()
+
+
+@pytest.fixture
+def replay_files(tmpdir):
+
+    config_file = os.path.join(str(tmpdir), 'config.ini')
+    with open(config_file, 'w') as f:
+        f.write(CONFIG)
+    archive_file = os.path.join(str(tmpdir), 'frames.archive')
+    _write_archive(archive_file)
+    return (config_file, archive_file)
+
+
+def test_archive_round_trip(replay_files):
+
+    (config_file, archive_file) = replay_files
+    archive = FrameArchive(archive_file)
+
+    assert len(archive) == 20
+    assert archive.get_resolution() == (160, 120)
+    assert list(archive.get_timestamps()) == [100.0 + i * 0.1 for i in range(20)]
+    assert archive.get_frames()[3][40, 25:65].min() == 255
+
+
+def test_replay_is_deterministic(replay_files, tmpdir):
+
+    (config_file, archive_file) = replay_files
+    baseline = replay_archive(config_file, archive_file)
+    result = replay_archive(config_file, archive_file)
+
+    assert baseline['frames'] == 20
+    # The square moves in frames 1-10, then the motion stops
+    assert [t[2] for t in baseline['transitions'] if t[1] == 'detector0'] == [True, False]
+    assert result['rectangles'] == baseline['rectangles']
+    assert result['transitions'] == baseline['transitions']
+
+    # Also after a round trip through a baseline file
+    baseline_file = os.path.join(str(tmpdir), 'baseline.json')
+    save_baseline(baseline, baseline_file)
+    comparison = compare_replay(load_baseline(baseline_file), result)
+    assert comparison['rectangle_diffs'] == []
+    assert comparison['transition_diffs'] == []
+    assert not comparison['regression']
+
+
+def _result(rectangles, transitions, stage_ms, total_ms):
+
+    return {'frames': 2,
+            'rectangles': rectangles,
+            'transitions': transitions,
+            'stage_ms': stage_ms,
+            'total_ms': total_ms}
+
+
+def test_compare_replay_detection_diffs():
+
+    baseline = _result([[0, 'a', [[1, 2, 3, 4]]]], [[0, 'a', True]], {'a': 1.0}, 2.0)
+    result = _result([[0, 'a', [[1, 2, 3, 5]]], [1, 'b', [[0, 0, 1, 1]]]],
+                     [[0, 'a', True], [1, 'b', True]], {'a': 1.0}, 2.0)
+    comparison = compare_replay(baseline, result)
+
+    assert comparison['rectangle_diffs'] == [(0, 'a'), (1, 'b')]
+    assert comparison['transition_diffs'] == [(1, 'b', True)]
+    assert comparison['regression']
+
+
+def test_compare_replay_slow_stages():
+
+    baseline = _result([], [], {'a': 1.0, 'b': 2.0}, 3.0)
+    result = _result([], [], {'a': 1.5, 'b': 2.1}, 3.6)
+
+    assert not compare_replay(baseline, result)['regression']
+    comparison = compare_replay(baseline, result, max_slowdown=0.25)
+    assert comparison['slow_stages'] == ['a']
+    assert comparison['stage_deltas']['a'] == (1.0, 1.5, 0.5)
+    assert comparison['regression']
+
+
+def test_compare_replay_frame_count_mismatch():
+
+    baseline = _result([], [], {}, 1.0)
+    result = dict(baseline, frames=3)
+
+    with pytest.raises(ReplayException):
+        compare_replay(baseline, result)
@@ -0,0 +1,99 @@
+import threading
+import time
+import pytest
+from opencv_home_cam.scheduler import DetectionScheduler, SchedulerConfig
+
+
+# Returns a scheduler with one worker, blocked by a job until the returned
+# event is set, so the order of the jobs queued meanwhile can be checked.
+def _blocked_scheduler(max_queue_time=0.0):
+
+    scheduler = DetectionScheduler(SchedulerConfig(workers=1, max_queue_time=max_queue_time))
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    scheduler.submit('camera0', 0, None, block)
+    started.wait()
+    return (scheduler, release)
+
+
+def test_priority_order():
+
+    (scheduler, release) = _blocked_scheduler()
+    order = []
+    jobs = [scheduler.submit('camera0', 2, None, order.append, 'p2'),
+            scheduler.submit('camera0', 1, None, order.append, 'p1'),
+            scheduler.submit('camera0', 0, None, order.append, 'p0')]
+    release.set()
+    for job in jobs:
+        job.result()
+    scheduler.close()
+
+    assert order == ['p0', 'p1', 'p2']
+
+
+def test_round_robin_within_class():
+
+    (scheduler, release) = _blocked_scheduler()
+    order = []
+    jobs = [scheduler.submit('a', 1, None, order.append, 'a1'),
+            scheduler.submit('a', 1, None, order.append, 'a2'),
+            scheduler.submit('a', 1, None, order.append, 'a3'),
+            scheduler.submit('b', 1, None, order.append, 'b1')]
+    release.set()
+    for job in jobs:
+        job.result()
+    scheduler.close()
+
+    assert order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_shedding():
+
+    (scheduler, release) = _blocked_scheduler(max_queue_time=0.01)
+    order = []
+    late = time.perf_counter()
+    in_time = time.perf_counter() + 60.0
+    late_p0 = scheduler.submit('camera0', 0, late, order.append, 'late p0')
+    late_p1 = scheduler.submit('camera0', 1, late, order.append, 'late p1')
+    in_time_p1 = scheduler.submit('camera0', 1, in_time, order.append, 'in time p1')
+    no_deadline_p1 = scheduler.submit('camera0', 1, None, order.append, 'no deadline p1')
+    time.sleep(0.05)
+    release.set()
+    for job in (late_p0, late_p1, in_time_p1, no_deadline_p1):
+        job.result()
+    stats = scheduler.get_stats()
+    scheduler.close()
+
+    # Only late lower priority jobs are shed, priority 0 always runs first
+    assert order == ['late p0', 'in time p1', 'no deadline p1']
+    assert not late_p0.shed
+    assert late_p1.shed and late_p1.run_time is None
+    assert not in_time_p1.shed
+    assert stats[1]['shed'] == 1
+    assert stats[0]['shed'] == 0
+
+
+def test_not_shed_within_max_queue_time():
+
+    (scheduler, release) = _blocked_scheduler(max_queue_time=60.0)
+    job = scheduler.submit('camera0', 1, time.perf_counter(), lambda: 'done')
+    release.set()
+    result = job.result()
+    scheduler.close()
+
+    assert result == 'done'
+    assert not job.shed
+
+
+def test_job_error_is_raised():
+
+    scheduler = DetectionScheduler(SchedulerConfig(workers=1, max_queue_time=0.0))
+    job = scheduler.submit('camera0', 0, None, int, 'not a number')
+    with pytest.raises(ValueError):
+        job.result()
+    scheduler.close()
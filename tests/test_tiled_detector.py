@@ -0,0 +1,50 @@
+from opencv_home_cam.tiled_detector import compute_tiles
+
+
+def _covers(tiles, frame_size):
+
+    (frame_width, frame_height) = frame_size
+    covered = [[False] * frame_width for i in range(frame_height)]
+    for (x, y, w, h) in tiles:
+        for row in range(y, y + h):
+            for col in range(x, x + w):
+                covered[row][col] = True
+    return all(all(row) for row in covered)
+
+
+def test_frame_smaller_than_tile():
+
+    assert compute_tiles((100, 50), (200, 200), 20) == [(0, 0, 100, 50)]
+
+
+def test_tiles_cover_the_frame():
+
+    frame_size = (130, 70)
+    tiles = compute_tiles(frame_size, (50, 40), 10)
+    assert _covers(tiles, frame_size)
+    for (x, y, w, h) in tiles:
+        assert (w, h) == (50, 40)
+        assert x + w <= 130 and y + h <= 70
+
+
+def test_last_tile_aligned_with_edge():
+
+    tiles = compute_tiles((100, 40), (40, 40), 10)
+    assert [x for (x, y, w, h) in tiles] == [0, 30, 60]
+
+
+def test_tiles_overlap():
+
+    # Objects up to the overlap in size are inside at least one tile
+    overlap = 16
+    tiles = compute_tiles((200, 40), (64, 40), overlap)
+    xs = [x for (x, y, w, h) in tiles]
+    for (prev_x, x) in zip(xs, xs[1:]):
+        assert prev_x + 64 - x >= overlap
+
+
+def test_overlap_larger_than_tile():
+
+    tiles = compute_tiles((10, 4), (4, 4), 8)
+    assert _covers(tiles, (10, 4))
+    assert [x for (x, y, w, h) in tiles] == list(range(0, 6)) + [6]